@@ -1,8 +1,13 @@
 from fastapi import APIRouter, Depends
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
 
 from admin.auth import verify_admin
 from analytics.reader import usage_summary, top_questions, recent_logs
+from admin.usage_store import export_csv
+from admin.log_writer import get_log_writer
+from backend.cache import get_answer_cache
+from backend.rag import get_batcher_stats, get_faq_stats, get_query_cache_stats
+from backend.metrics import get_metrics
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -18,10 +23,31 @@ def get_top_questions(admin=Depends(verify_admin)):
 def get_recent_logs(limit: int = 10, admin=Depends(verify_admin)):
     return {"recent_logs": recent_logs(limit)}
 
+@router.get("/cache-stats")
+def get_cache_stats(admin=Depends(verify_admin)):
+    return {"answer_cache": get_answer_cache().stats(), **get_query_cache_stats()}
+
+@router.get("/log-writer-stats")
+def get_log_writer_stats(admin=Depends(verify_admin)):
+    return get_log_writer().stats()
+
+@router.get("/batcher-stats")
+def get_query_batcher_stats(admin=Depends(verify_admin)):
+    return get_batcher_stats()
+
+@router.get("/faq-stats")
+def get_faq_router_stats(admin=Depends(verify_admin)):
+    return get_faq_stats()
+
+@router.get("/metrics-summary")
+def get_metrics_summary(admin=Depends(verify_admin)):
+    return get_metrics().summary()
+
 @router.get("/download-csv")
 def download_csv(admin=Depends(verify_admin)):
-    return FileResponse(
-        path="data/usage_logs.csv",   # ✅ FIXED PATH
-        filename="usage_logs.csv",
-        media_type="text/csv"
+    # Streamed export from the SQLite usage store
+    return StreamingResponse(
+        export_csv(),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="usage_logs.csv"'},
     )
@@ -0,0 +1,152 @@
+import os
+import queue
+import threading
+import time
+
+from admin import usage_store
+
+# CONFIGURATION
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "100"))
+LOG_FLUSH_INTERVAL_SECONDS = float(os.getenv("LOG_FLUSH_INTERVAL_SECONDS", "0.5"))
+# A batch that fails to commit (e.g. "database is locked") is retried this many
+# times in total, waiting LOG_RETRY_BACKOFF_SECONDS, then twice as long, ...
+LOG_WRITE_ATTEMPTS = int(os.getenv("LOG_WRITE_ATTEMPTS", "5"))
+LOG_RETRY_BACKOFF_SECONDS = float(os.getenv("LOG_RETRY_BACKOFF_SECONDS", "0.1"))
+
+_STOP = object()
+
+
+class UsageLogWriter:
+    """
+    Background writer for the usage store.
+
+    Requests enqueue usage rows and feedback updates and return immediately;
+    a single daemon thread drains the queue and group-commits them through
+    `usage_store.apply_batch`, flushing when `batch_size` operations are
+    pending or `flush_interval` seconds have passed. Usage and feedback share
+    one queue, so a feedback update is never applied before its usage row.
+    A batch that fails to commit is retried with exponential backoff and
+    only dropped (and counted) after `max_attempts`. When the queue is full
+    new events are dropped and counted.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = LOG_BATCH_SIZE,
+        flush_interval: float = LOG_FLUSH_INTERVAL_SECONDS,
+        max_queue: int = LOG_QUEUE_SIZE,
+        max_attempts: int = LOG_WRITE_ATTEMPTS,
+        retry_backoff: float = LOG_RETRY_BACKOFF_SECONDS,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max(1, max_attempts)
+        self.retry_backoff = retry_backoff
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.errors = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        usage_store.init_store()
+        self._thread = threading.Thread(target=self._run, name="usage-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Flush everything queued so far, then stop the writer thread."""
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit_usage(self, row: tuple) -> bool:
+        return self._submit(("usage", row))
+
+    def submit_feedback(self, response_id: str, feedback: str) -> bool:
+        return self._submit(("feedback", (response_id, feedback)))
+
+    def _submit(self, op) -> bool:
+        try:
+            self._queue.put_nowait(op)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def _run(self):
+        while True:
+            op = self._queue.get()
+            if op is _STOP:
+                return
+
+            # Collect more events until the batch is full or the flush interval elapses
+            batch = [op]
+            stopping = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    op = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if op is _STOP:
+                    stopping = True
+                    break
+                batch.append(op)
+
+            self._flush(batch)
+            if stopping:
+                return
+
+    def _flush(self, batch: list):
+        # apply_batch is one transaction: a failed attempt wrote nothing, so retrying is safe
+        for attempt in range(self.max_attempts):
+            try:
+                usage_store.apply_batch(batch)
+                self.written += len(batch)
+                self.batches += 1
+                return
+            except Exception as e:
+                error = e
+            if attempt + 1 < self.max_attempts:
+                self.retries += 1
+                time.sleep(self.retry_backoff * 2 ** attempt)
+        self.errors += 1
+        self.failed += len(batch)
+        print(f"⚠️ Failed to write {len(batch)} usage log events after {self.max_attempts} attempts: {error}")
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "retries": self.retries,
+            "errors": self.errors,
+            "failed": self.failed,
+            "running": self.running,
+        }
+
+
+_writer = None
+
+
+def get_log_writer() -> UsageLogWriter:
+    global _writer
+    if _writer is None:
+        _writer = UsageLogWriter()
+    return _writer
@@ -0,0 +1,252 @@
+import csv
+import io
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+
+DATA_DIR = "data"
+DB_FILE = os.path.join(DATA_DIR, "usage_logs.db")
+# Legacy CSV log; imported once into the SQLite store and then left untouched
+LEGACY_CSV_FILE = os.path.join(DATA_DIR, "usage_logs.csv")
+
+# Column order used for inserts and the CSV export
+COLUMNS = ["timestamp", "question", "product", "ip", "feedback", "response_id", "confidence_score"]
+
+# Title-case headers used by the CSV export, compatible with the old CSV log
+HEADERS = [
+    "Date and Time",
+    "User Query",
+    "Product",
+    "IP Address",
+    "feedback",
+    "response_id",
+    "confidence_score"
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    question TEXT NOT NULL,
+    product TEXT,
+    ip TEXT,
+    feedback TEXT NOT NULL DEFAULT '',
+    response_id TEXT UNIQUE,
+    confidence_score REAL
+);
+CREATE INDEX IF NOT EXISTS idx_usage_logs_timestamp ON usage_logs (timestamp);
+-- Append-only record of feedback changes, consumed incrementally by analytics
+CREATE TABLE IF NOT EXISTS feedback_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    response_id TEXT NOT NULL,
+    old_feedback TEXT NOT NULL,
+    new_feedback TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def get_connection() -> sqlite3.Connection:
+    """Per-thread connection to the usage store (sqlite connections are not thread-safe)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(DATA_DIR, exist_ok=True)
+        conn = sqlite3.connect(DB_FILE, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+    return conn
+
+
+def init_store():
+    """
+    Create tables/indexes and import the legacy CSV the first time the store is used.
+    Safe to call repeatedly; only the first call per process touches the disk.
+    """
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        conn = get_connection()
+        had_feedback_events = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'feedback_events'"
+        ).fetchone()
+        conn.executescript(SCHEMA)
+        _migrate_legacy_csv(conn)
+        if not had_feedback_events:
+            _backfill_feedback_events(conn)
+        # Identifies this database file, e.g. for checkpoints of derived state
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('store_id', ?)", (uuid.uuid4().hex,))
+        _initialized = True
+
+
+def store_id() -> str:
+    """Random id created with the store; a replaced or re-created database gets a new one."""
+    return query("SELECT value FROM meta WHERE key = 'store_id'")[0]["value"]
+
+
+def _normalize_legacy_row(row: dict) -> tuple:
+    """Map a row from any historical CSV header layout onto COLUMNS."""
+    confidence = row.get("confidence_score") or row.get("Confidence Score") or ""
+    try:
+        confidence = float(confidence) if confidence else None
+    except ValueError:
+        confidence = None
+    return (
+        row.get("Date and Time") or row.get("Date") or row.get("datetime") or "",
+        row.get("User Query") or row.get("question") or "",
+        row.get("Product") or row.get("product") or "Unknown",
+        row.get("IP Address") or row.get("ip") or row.get("ip_address") or "",
+        row.get("feedback") or row.get("👍👎") or "",
+        row.get("response_id") or None,
+        confidence,
+    )
+
+
+def _migrate_legacy_csv(conn: sqlite3.Connection):
+    # BEGIN IMMEDIATE serializes concurrent workers so only one of them imports
+    with _transaction(conn):
+        done = conn.execute("SELECT value FROM meta WHERE key = 'csv_migrated'").fetchone()
+        if done is not None:
+            return
+        if os.path.exists(LEGACY_CSV_FILE):
+            with open(LEGACY_CSV_FILE, newline="", encoding="utf-8") as f:
+                rows = [_normalize_legacy_row(row) for row in csv.DictReader(f)]
+            conn.executemany(
+                f"INSERT OR IGNORE INTO usage_logs ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            print(f"📦 Migrated {len(rows)} rows from {LEGACY_CSV_FILE} into {DB_FILE}")
+        conn.execute("INSERT INTO meta (key, value) VALUES ('csv_migrated', '1')")
+
+
+def _backfill_feedback_events(conn: sqlite3.Connection):
+    # Rows that already carry feedback (legacy CSV import) get a synthetic event each
+    with _transaction(conn):
+        conn.execute(
+            "INSERT INTO feedback_events (response_id, old_feedback, new_feedback) "
+            "SELECT COALESCE(response_id, ''), '', feedback FROM usage_logs "
+            "WHERE feedback != '' AND NOT EXISTS (SELECT 1 FROM feedback_events) ORDER BY id"
+        )
+
+
+def _set_feedback(conn: sqlite3.Connection, response_id: str, feedback: str) -> bool:
+    row = conn.execute(
+        "SELECT feedback FROM usage_logs WHERE response_id = ?", (response_id,)
+    ).fetchone()
+    if row is None:
+        return False
+    if row["feedback"] != feedback:
+        conn.execute(
+            "UPDATE usage_logs SET feedback = ? WHERE response_id = ?",
+            (feedback, response_id),
+        )
+        conn.execute(
+            "INSERT INTO feedback_events (response_id, old_feedback, new_feedback) VALUES (?, ?, ?)",
+            (response_id, row["feedback"], feedback),
+        )
+    return True
+
+
+def append_rows(rows: list):
+    """Insert usage rows (tuples in COLUMNS order) in a single transaction."""
+    init_store()
+    conn = get_connection()
+    with _transaction(conn):
+        conn.executemany(
+            f"INSERT INTO usage_logs ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+
+def update_feedback(response_id: str, feedback: str) -> bool:
+    """Set feedback on the row with this response_id (indexed lookup). Returns True if a row matched."""
+    init_store()
+    conn = get_connection()
+    with _transaction(conn):
+        return _set_feedback(conn, response_id, feedback)
+
+
+def apply_batch(ops: list):
+    """
+    Apply a batch of ("usage", row) / ("feedback", (response_id, feedback))
+    operations in order, in one transaction (group commit).
+    """
+    init_store()
+    conn = get_connection()
+    with _transaction(conn):
+        pending = []
+        for kind, payload in ops:
+            if kind == "usage":
+                pending.append(payload)
+                continue
+            if pending:
+                conn.executemany(
+                    f"INSERT INTO usage_logs ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    pending,
+                )
+                pending = []
+            response_id, feedback = payload
+            _set_feedback(conn, response_id, feedback)
+        if pending:
+            conn.executemany(
+                f"INSERT INTO usage_logs ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                pending,
+            )
+
+
+def query(sql: str, params: tuple = ()) -> list:
+    init_store()
+    return get_connection().execute(sql, params).fetchall()
+
+
+def export_csv(batch_size: int = 1000):
+    """Yield the whole log as CSV text in chunks, without loading it into memory."""
+    init_store()
+    conn = get_connection()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADERS)
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT id, {', '.join(COLUMNS)} FROM usage_logs WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, batch_size),
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            writer.writerow([
+                "" if row[col] is None else row[col] for col in COLUMNS
+            ])
+        last_id = rows[-1]["id"]
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@contextmanager
+def _transaction(conn: sqlite3.Connection):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
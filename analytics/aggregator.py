@@ -0,0 +1,231 @@
+import heapq
+import json
+import os
+import threading
+from collections import Counter
+
+from admin import usage_store
+
+CHECKPOINT_FILE = os.path.join(usage_store.DATA_DIR, "analytics_checkpoint.json")
+CHECKPOINT_VERSION = 2
+
+# Distinct questions tracked by the top-K structure
+TOP_QUESTIONS_CAPACITY = int(os.getenv("TOP_QUESTIONS_CAPACITY", "1000"))
+# Rows pulled from the store per query while catching up
+REFRESH_BATCH_SIZE = 5000
+
+CONFIDENCE_BUCKETS = [f"{i / 10:.1f}-{(i + 1) / 10:.1f}" for i in range(10)]
+
+
+def normalize_product(product: str) -> str:
+
+    if not product:
+        return "Unknown"
+    product_lower = product.lower()
+    if "hyworks" in product_lower:
+        return "HyWorks"
+    elif "hysecure" in product_lower:
+        return "HySecure"
+    return product
+
+
+def confidence_bucket(score) -> str:
+    if score is None:
+        return "unknown"
+    index = min(max(int(float(score) * 10), 0), 9)
+    return CONFIDENCE_BUCKETS[index]
+
+
+class TopK:
+    """
+    Space-Saving heavy-hitters counter: tracks at most `capacity` distinct
+    questions. When full, a new question replaces the current minimum and
+    inherits its count, so frequent questions are never lost while memory
+    stays bounded. Counts are exact until capacity is reached.
+
+    The minimum is found through a lazy min-heap of (count, question):
+    every count change pushes a new pair and outdated pairs are skipped when
+    popped, so an insert costs O(log K) instead of a scan of all K entries.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.entries = {}  # question -> {"count": int, "products": Counter}
+        self._heap = []
+
+    def add(self, question: str, product: str, n: int = 1):
+        entry = self.entries.get(question)
+        if entry is None:
+            count = 0
+            if len(self.entries) >= self.capacity:
+                count = self.entries.pop(self._pop_min())["count"]
+            entry = self.entries[question] = {"count": count, "products": Counter()}
+        entry["count"] += n
+        entry["products"][product] += n
+        heapq.heappush(self._heap, (entry["count"], question))
+        if len(self._heap) > 4 * max(self.capacity, 16):
+            self._rebuild_heap()
+
+    def _pop_min(self) -> str:
+        while True:
+            count, question = heapq.heappop(self._heap)
+            entry = self.entries.get(question)
+            if entry is not None and entry["count"] == count:
+                return question
+
+    def _rebuild_heap(self):
+        self._heap = [(e["count"], q) for q, e in self.entries.items()]
+        heapq.heapify(self._heap)
+
+    def most_common(self, limit: int) -> list:
+        return heapq.nlargest(limit, self.entries.items(), key=lambda kv: kv[1]["count"])
+
+    def to_dict(self) -> dict:
+        return {q: {"count": e["count"], "products": dict(e["products"])} for q, e in self.entries.items()}
+
+    @classmethod
+    def from_dict(cls, capacity: int, data: dict) -> "TopK":
+        topk = cls(capacity)
+        topk.entries = {
+            q: {"count": e["count"], "products": Counter(e["products"])} for q, e in data.items()
+        }
+        topk._rebuild_heap()
+        return topk
+
+
+class UsageAggregator:
+    """
+    Running analytics over the usage store.
+
+    Keeps totals, per-product counts, top questions, feedback tallies and a
+    confidence histogram, and on `refresh()` folds in only the usage rows and
+    feedback events added since the last refresh (tracked by row id). State is
+    checkpointed to CHECKPOINT_FILE so a restart resumes from the saved offsets
+    instead of re-reading history. The checkpoint records which store it was
+    taken from; if the store was replaced, or truncated below the saved
+    offsets, the aggregates are rebuilt from scratch.
+    """
+
+    def __init__(self, checkpoint_file: str = CHECKPOINT_FILE):
+        self.checkpoint_file = checkpoint_file
+        self._lock = threading.Lock()
+        self._reset()
+        self._load_checkpoint()
+
+    def _reset(self):
+        self.store_id = None
+        self.last_usage_id = 0
+        self.last_feedback_id = 0
+        self.total = 0
+        self.by_product = Counter()
+        self.questions = TopK(TOP_QUESTIONS_CAPACITY)
+        self.feedback = Counter()
+        self.confidence = Counter()
+
+    def refresh(self):
+        with self._lock:
+            rebuilt = self._check_store()
+            changed = self._consume_usage() | self._consume_feedback()
+            if changed or rebuilt:
+                self._save_checkpoint()
+
+    def _check_store(self) -> bool:
+        """Start over if the offsets belong to another (or a truncated) store; True if reset."""
+        store_id = usage_store.store_id()
+        last_usage_id, last_feedback_id = usage_store.query(
+            "SELECT (SELECT COALESCE(MAX(id), 0) FROM usage_logs), (SELECT COALESCE(MAX(id), 0) FROM feedback_events)"
+        )[0]
+        if (
+            self.store_id == store_id
+            and self.last_usage_id <= last_usage_id
+            and self.last_feedback_id <= last_feedback_id
+        ):
+            return False
+        if self.store_id is not None:
+            print("⚠️ Usage store changed since the analytics checkpoint; rebuilding aggregates")
+        self._reset()
+        self.store_id = store_id
+        return True
+
+    def _consume_usage(self) -> bool:
+        changed = False
+        while True:
+            rows = usage_store.query(
+                "SELECT id, question, product, confidence_score FROM usage_logs "
+                "WHERE id > ? ORDER BY id LIMIT ?",
+                (self.last_usage_id, REFRESH_BATCH_SIZE),
+            )
+            if not rows:
+                return changed
+            for row in rows:
+                self.total += 1
+                self.by_product[normalize_product(row["product"])] += 1
+                if row["question"]:
+                    self.questions.add(row["question"], row["product"] or "Unknown")
+                self.confidence[confidence_bucket(row["confidence_score"])] += 1
+            self.last_usage_id = rows[-1]["id"]
+            changed = True
+
+    def _consume_feedback(self) -> bool:
+        changed = False
+        while True:
+            rows = usage_store.query(
+                "SELECT id, old_feedback, new_feedback FROM feedback_events "
+                "WHERE id > ? ORDER BY id LIMIT ?",
+                (self.last_feedback_id, REFRESH_BATCH_SIZE),
+            )
+            if not rows:
+                return changed
+            for row in rows:
+                if row["old_feedback"]:
+                    self.feedback[row["old_feedback"]] -= 1
+                self.feedback[row["new_feedback"]] += 1
+            self.last_feedback_id = rows[-1]["id"]
+            changed = True
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_file):
+            return
+        try:
+            with open(self.checkpoint_file, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != CHECKPOINT_VERSION:
+                return
+            self.store_id = data["store_id"]
+            self.last_usage_id = data["last_usage_id"]
+            self.last_feedback_id = data["last_feedback_id"]
+            self.total = data["total"]
+            self.by_product = Counter(data["by_product"])
+            self.questions = TopK.from_dict(TOP_QUESTIONS_CAPACITY, data["questions"])
+            self.feedback = Counter(data["feedback"])
+            self.confidence = Counter(data["confidence"])
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable analytics checkpoint {self.checkpoint_file}: {e}")
+            self._reset()
+
+    def _save_checkpoint(self):
+        data = {
+            "version": CHECKPOINT_VERSION,
+            "store_id": self.store_id,
+            "last_usage_id": self.last_usage_id,
+            "last_feedback_id": self.last_feedback_id,
+            "total": self.total,
+            "by_product": dict(self.by_product),
+            "questions": self.questions.to_dict(),
+            "feedback": dict(self.feedback),
+            "confidence": dict(self.confidence),
+        }
+        tmp_file = f"{self.checkpoint_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_file, self.checkpoint_file)
+
+
+_aggregator = None
+
+
+def get_aggregator() -> UsageAggregator:
+    global _aggregator
+    if _aggregator is None:
+        _aggregator = UsageAggregator()
+    return _aggregator
@@ -0,0 +1,141 @@
+import math
+import os
+
+import numpy as np
+
+
+# Optional approximate-nearest-neighbour index written next to the vectors of
+# a generation (ann.faiss). Index ids are store rows, so a product search
+# limits the ANN search to the product's row range. "flat" means no ANN index:
+# search stays an exact scan over the memory-mapped vectors.
+ANN_FILE = "ann.faiss"
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+# Build/search parameters each type uses, with their defaults
+INDEX_PARAMS = {
+    "flat": {},
+    "hnsw": {"m": 32, "ef_construction": 200, "ef_search": 64},
+    "ivf_flat": {"nlist": 0, "nprobe": 16},
+    # refine: PQ distances are approximate, so refine * k candidates are re-ranked exactly
+    "ivf_pq": {"nlist": 0, "nprobe": 16, "pq_m": 48, "pq_bits": 8, "refine": 4},
+}
+# k-means wants at least this many training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+MAX_TRAINING_POINTS_PER_LIST = 256
+TRAINING_SEED = 1234
+
+
+def _faiss():
+    try:
+        import faiss
+    except ImportError as e:
+        raise RuntimeError("ANN index types need faiss-cpu: `pip install faiss-cpu`") from e
+    return faiss
+
+
+def normalize_config(config: dict) -> dict:
+    """`config` reduced to its type and that type's parameters, defaults filled in."""
+    index_type = (config or {}).get("type", "flat")
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}' (expected one of {', '.join(INDEX_TYPES)})")
+    params = INDEX_PARAMS[index_type]
+    return {"type": index_type, **params, **{k: v for k, v in (config or {}).items() if k in params}}
+
+
+def resolve_config(config: dict, count: int, dim: int) -> dict:
+    """
+    Build configuration for `count` vectors of `dim` dimensions: defaults
+    filled in, nlist / pq_m fitted to the corpus. Falls back to a simpler
+    type (with a warning) when there are too few vectors to train.
+    `requested` keeps the normalized input, to detect configuration changes.
+    """
+    params = normalize_config(config)
+    index_type = params["type"]
+    resolved = {**params, "requested": params}
+
+    if index_type in ("ivf_flat", "ivf_pq"):
+        nlist = params["nlist"] or int(4 * math.sqrt(count))
+        resolved["nlist"] = max(1, min(nlist, count // MIN_POINTS_PER_CENTROID))
+        if count < MIN_POINTS_PER_CENTROID:
+            print(f"⚠️ {count} vectors are too few to train {index_type}; using a flat (exact) index")
+            return {"type": "flat", "requested": resolved["requested"]}
+
+    if index_type == "ivf_pq":
+        # Sub-quantizers must split the vector evenly
+        resolved["pq_m"] = max(m for m in range(1, min(params["pq_m"], dim) + 1) if dim % m == 0)
+        if count < MIN_POINTS_PER_CENTROID * 2 ** params["pq_bits"]:
+            print(f"⚠️ {count} vectors are too few to train {params['pq_bits']}-bit PQ codebooks; using ivf_flat")
+            resolved = {"type": "ivf_flat", "nlist": resolved["nlist"], "nprobe": params["nprobe"],
+                        "requested": resolved["requested"]}
+    return resolved
+
+
+def build_ann_index(vectors: np.ndarray, config: dict):
+    """FAISS index over `vectors` (row i gets id i) for a resolved, non-flat `config`."""
+    faiss = _faiss()
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    dim = vectors.shape[1]
+    index_type = config["type"]
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, config["m"])
+        index.hnsw.efConstruction = config["ef_construction"]
+    else:
+        quantizer = faiss.IndexFlatL2(dim)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, config["nlist"])
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, config["nlist"], config["pq_m"], config["pq_bits"])
+        # Train the coarse centroids (and PQ codebooks) on a sample of the corpus
+        sample_size = min(len(vectors), config["nlist"] * MAX_TRAINING_POINTS_PER_LIST)
+        if index_type == "ivf_pq":
+            sample_size = max(sample_size, min(len(vectors), MAX_TRAINING_POINTS_PER_LIST * 2 ** config["pq_bits"]))
+        rng = np.random.default_rng(TRAINING_SEED)
+        sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+        index.train(sample)
+    index.add(vectors)
+    return index
+
+
+def write_ann_index(path: str, vectors: np.ndarray, config: dict):
+    faiss = _faiss()
+    faiss.write_index(build_ann_index(vectors, config), os.path.join(path, ANN_FILE))
+
+
+class AnnIndex:
+    """
+    Read side of ann.faiss. `ef_search` (HNSW) and `nprobe` (IVF) override
+    the defaults stored at build time: higher is slower and more accurate.
+    """
+
+    def __init__(self, path: str, config: dict, ef_search: int = None, nprobe: int = None):
+        faiss = _faiss()
+        self.config = config
+        self.type = config["type"]
+        self.ef_search = ef_search or config.get("ef_search")
+        self.nprobe = nprobe or config.get("nprobe")
+        self.refine = config.get("refine", 1)
+        file = os.path.join(path, ANN_FILE)
+        try:
+            # IVF lists can stay on disk, shared between workers like vectors.npy
+            self.index = faiss.read_index(file, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            self.index = faiss.read_index(file)
+        self._faiss = faiss
+
+    def _params(self, start: int, end: int):
+        """(search parameters, row-range selector); the caller keeps the selector alive during the search."""
+        selector = None
+        if start > 0 or end < self.index.ntotal:
+            selector = self._faiss.IDSelectorRange(start, end)
+        if self.type == "hnsw":
+            return self._faiss.SearchParametersHNSW(efSearch=self.ef_search, sel=selector), selector
+        return self._faiss.SearchParametersIVF(nprobe=min(self.nprobe, self.config["nlist"]), sel=selector), selector
+
+    def search(self, queries: np.ndarray, k: int, start: int, end: int) -> list:
+        """Approximate nearest rows in [start, end) for each query, best first (k * refine candidates)."""
+        k = min(k * self.refine, end - start)
+        if k <= 0:
+            return [[] for _ in range(len(queries))]
+        params, _selector = self._params(start, end)
+        _, ids = self.index.search(np.ascontiguousarray(queries, dtype=np.float32), k, params=params)
+        return [[int(row) for row in found if row >= 0] for found in ids]
@@ -0,0 +1,560 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from backend.shared_state import SHARED_STATE_DEFAULT_TTL_SECONDS, BufferedCounters, get_shared_store
+
+
+# CONFIGURATION
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "512"))
+ANSWER_CACHE_MAX_BYTES = int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+# Cosine similarity above which two questions are treated as the same question
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+# question text -> float32 query vector (~1.5 KB each), bounded by memory
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "8192"))
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# (question, product, k, keyword weight) -> ranked chunk rows + distances, bounded by count and age
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "4096"))
+RETRIEVAL_CACHE_TTL_SECONDS = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "3600"))
+# Shared answer cache: how long a worker reuses its list of cached questions for
+# semantic lookups (exact-question hits from other workers are seen immediately)
+ANSWER_CACHE_SYNC_SECONDS = float(os.getenv("ANSWER_CACHE_SYNC_SECONDS", "2"))
+
+
+def normalize_question(question: str) -> str:
+    """
+    Canonical form used as the exact-match cache key:
+    lowercase, punctuation stripped, whitespace collapsed.
+    """
+    text = re.sub(r"[^\w\s.]", " ", question.lower())
+    text = re.sub(r"\.(?!\d)", " ", text)  # keep dots inside version numbers like 7.2
+    return " ".join(text.split())
+
+
+def _sizeof(value) -> int:
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by entry count and approximate memory,
+    with a per-entry TTL. Expired entries are dropped lazily on access and
+    when making room for new entries.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int = 0, ttl_seconds: float = 0, on_evict=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        # Called with the key of every entry dropped by expiry or eviction (not by clear())
+        self.on_evict = on_evict
+        self._data = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            value, _, expires_at = item
+            if expires_at and expires_at < time.monotonic():
+                self._remove(key)
+                self._evicted(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size: int = None):
+        if size is None:
+            size = _sizeof(key) + _sizeof(value)
+        if self.max_bytes and size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else 0
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, expires_at)
+            self._bytes += size
+            self._evict()
+
+    def pop(self, key):
+        with self._lock:
+            if key in self._data:
+                return self._remove(key)
+            return None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def items(self):
+        """Snapshot of live (key, value) pairs, least recently used first."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value) for key, (value, _, expires_at) in self._data.items()
+                if not expires_at or expires_at >= now
+            ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _remove(self, key):
+        value, size, _ = self._data.pop(key)
+        self._bytes -= size
+        return value
+
+    def _evicted(self, key):
+        if self.on_evict is not None:
+            self.on_evict(key)
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [k for k, (_, _, exp) in self._data.items() if exp and exp < now]
+        for key in expired:
+            self._remove(key)
+            self._evicted(key)
+            self.evictions += 1
+
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            key, (_, size, _) = self._data.popitem(last=False)
+            self._bytes -= size
+            self._evicted(key)
+            self.evictions += 1
+
+
+class VersionedLRUCache(LRUCache):
+    """LRUCache that drops every entry when the vector store version changes."""
+
+    def __init__(self, max_entries: int, max_bytes: int = 0, ttl_seconds: float = 0):
+        super().__init__(max_entries, max_bytes, ttl_seconds)
+        self._index_version = None
+        self.invalidations = 0
+
+    def ensure_version(self, index_version):
+        with self._lock:
+            if index_version != self._index_version:
+                if self._index_version is not None:
+                    self.invalidations += 1
+                self.clear()
+                self._index_version = index_version
+
+    def put_for_version(self, index_version, key, value):
+        """Store only if the cache still belongs to `index_version` (not a concurrently swapped-in index)."""
+        with self._lock:
+            if index_version == self._index_version:
+                self.put(key, value)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = super().stats()
+            stats.update(invalidations=self.invalidations, index_version=self._index_version)
+            return stats
+
+
+class _ScopeVectors:
+    """
+    Unit question vectors of one cache scope, stacked in a growable matrix
+    so a semantic lookup is a single matrix-vector product.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.rows = {}  # key -> row in matrix
+        self.matrix = None
+
+    def add(self, key, vector: np.ndarray):
+        row = self.rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            if self.matrix is None:
+                self.matrix = np.empty((16, len(vector)), dtype=np.float32)
+            elif row == len(self.matrix):
+                self.matrix = np.concatenate([self.matrix, np.empty_like(self.matrix)])
+            self.keys.append(key)
+            self.rows[key] = row
+        self.matrix[row] = vector
+
+    def remove(self, key):
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        # Move the last row into the hole
+        last = self.keys.pop()
+        if last != key:
+            self.keys[row] = last
+            self.rows[last] = row
+            self.matrix[row] = self.matrix[len(self.keys)]
+
+    def nearest(self, query: np.ndarray):
+        """(key, cosine similarity) of the closest vector, or (None, -1.0)."""
+        if not self.keys:
+            return None, -1.0
+        scores = self.matrix[:len(self.keys)] @ query
+        best = int(np.argmax(scores))
+        return self.keys[best], float(scores[best])
+
+
+class SemanticAnswerCache:
+    """
+    Answer cache in front of the RAG pipeline.
+
+    Lookups first try the normalized question text, then fall back to the
+    nearest cached question embedding above `similarity_threshold`. Entries are
+    keyed by (scope, normalized question), where the scope is the detected
+    product / release, so "what is HyWorks" never serves the cached "what is
+    HySecure" answer and hyworks@3.4 never overwrites hyworks@3.6. The whole
+    cache is dropped whenever the vector store version changes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        max_bytes: int = ANSWER_CACHE_MAX_BYTES,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        similarity_threshold: float = ANSWER_CACHE_SIMILARITY,
+    ):
+        self.similarity_threshold = similarity_threshold
+        # Keys dropped by the LRU, removed from the scope matrices on the next access
+        self._dropped = deque()
+        self._entries = LRUCache(max_entries, max_bytes, ttl_seconds, on_evict=self._dropped.append)
+        self._scopes = {}  # scope -> _ScopeVectors
+        self._index_version = None
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def ensure_version(self, index_version):
+        """Drop every entry if the vector store was rebuilt since they were cached."""
+        with self._lock:
+            if index_version != self._index_version:
+                if self._index_version is not None:
+                    self.invalidations += 1
+                self._clear()
+                self._index_version = index_version
+
+    def get(self, question: str, product=None):
+        entry = self._entries.get((product, normalize_question(question)))
+        if entry is not None:
+            with self._lock:
+                self.exact_hits += 1
+            return entry["result"]
+        return None
+
+    def get_similar(self, query_vector, product=None):
+        """Return the cached result of the closest question, or None (counts as a miss)."""
+        query = _unit(query_vector)
+        with self._lock:
+            self._sync()
+            vectors = self._scopes.get(product)
+            key, score = vectors.nearest(query) if vectors is not None else (None, -1.0)
+        # Also refreshes recency of the matched entry; None if it expired meanwhile
+        entry = self._entries.get(key) if score >= self.similarity_threshold else None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.semantic_hits += 1
+        return entry["result"]
+
+    def put(self, question: str, query_vector, product, result):
+        with self._lock:
+            self._put(question, query_vector, product, result)
+
+    def put_for_version(self, index_version, question: str, query_vector, product, result):
+        """Store only if the cache still belongs to `index_version` (not a concurrently swapped-in index)."""
+        with self._lock:
+            if index_version == self._index_version:
+                self._put(question, query_vector, product, result)
+
+    def _put(self, question: str, query_vector, product, result):
+        key = (product, normalize_question(question))
+        vector = _unit(query_vector)
+        self._entries.put(key, {"vector": vector, "result": result})
+        self._sync()
+        if key in self._entries:  # not rejected as too large
+            self._scopes.setdefault(product, _ScopeVectors()).add(key, vector)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self._dropped.clear()
+        self._scopes = {}
+
+    def _sync(self):
+        while self._dropped:
+            key = self._dropped.popleft()
+            if key[0] in self._scopes:
+                self._scopes[key[0]].remove(key)
+
+    def stats(self) -> dict:
+        storage = self._entries.stats()
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "entries": storage["entries"],
+                "bytes": storage["bytes"],
+                "evictions": storage["evictions"],
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "index_version": self._index_version,
+            }
+
+
+class SharedVersionedCache:
+    """
+    VersionedLRUCache kept in a shared store (backend/shared_state.py), so
+    every worker sees the others' fills. Keys carry the index version:
+    entries of a superseded index are never served and age out with their
+    TTL. Hit/miss/fill counters are shared too (buffered per worker); stats
+    are cluster-wide.
+    """
+
+    def __init__(self, store, name: str, ttl_seconds: float = 0):
+        self.store = store
+        self.name = name
+        self.ttl_seconds = ttl_seconds or SHARED_STATE_DEFAULT_TTL_SECONDS
+        self.counters = BufferedCounters(store)
+        self._index_version = None
+        self.invalidations = 0
+
+    def _key(self, key, index_version=None) -> str:
+        text = key if isinstance(key, str) else json.dumps(key, separators=(",", ":"))
+        return f"{self.name}:{index_version or self._index_version}:{text}"
+
+    def ensure_version(self, index_version):
+        if index_version != self._index_version:
+            if self._index_version is not None:
+                self.invalidations += 1
+            self._index_version = index_version
+
+    def get(self, key, default=None):
+        value = self.store.get(self._key(key))
+        self.counters.incr(f"{self.name}:{'misses' if value is None else 'hits'}")
+        return default if value is None else value
+
+    def put(self, key, value):
+        self.put_for_version(self._index_version, key, value)
+
+    def put_for_version(self, index_version, key, value):
+        self.store.set(self._key(key, index_version), value, self.ttl_seconds)
+        self.counters.incr(f"{self.name}:fills:{index_version}")
+
+    def clear(self):
+        self.store.clear(f"{self.name}:")
+
+    def stats(self) -> dict:
+        hits, misses, fills = self.counters.read(
+            [f"{self.name}:hits", f"{self.name}:misses", f"{self.name}:fills:{self._index_version}"]
+        )
+        lookups = hits + misses
+        return {
+            "shared": True,
+            "fills": fills,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "index_version": self._index_version,
+        }
+
+
+class SharedAnswerCache:
+    """
+    SemanticAnswerCache kept in a shared store. Results and unit question
+    vectors are stored per (index version, product scope, normalized
+    question); each worker only keeps a copy of the vectors for semantic
+    lookups, refreshed from the store at most every ANSWER_CACHE_SYNC_SECONDS.
+    """
+
+    def __init__(
+        self,
+        store,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        similarity_threshold: float = ANSWER_CACHE_SIMILARITY,
+    ):
+        self.store = store
+        self.ttl_seconds = ttl_seconds or SHARED_STATE_DEFAULT_TTL_SECONDS
+        self.similarity_threshold = similarity_threshold
+        self.counters = BufferedCounters(store)
+        self._index_version = None
+        self._lock = threading.Lock()
+        self._vectors = {}  # scope -> (synced at, {question key: unit vector})
+        self.invalidations = 0
+
+    def _prefix(self, kind: str, product, index_version=None) -> str:
+        return f"{kind}:{index_version or self._index_version}:{product}:"
+
+    def ensure_version(self, index_version):
+        with self._lock:
+            if index_version != self._index_version:
+                if self._index_version is not None:
+                    self.invalidations += 1
+                self._vectors = {}
+                self._index_version = index_version
+
+    def get(self, question: str, product=None):
+        result = self.store.get(self._prefix("answer", product) + normalize_question(question))
+        if result is not None:
+            self.counters.incr("answer:exact_hits")
+        return result
+
+    def _scope_vectors(self, product) -> dict:
+        with self._lock:
+            synced_at, vectors = self._vectors.get(product, (0.0, {}))
+        if time.monotonic() - synced_at < ANSWER_CACHE_SYNC_SECONDS:
+            return vectors
+        prefix = self._prefix("answer-vector", product)
+        keys = [key[len(prefix):] for key in self.store.keys(prefix)]
+        missing = [key for key in keys if key not in vectors]
+        fetched = dict(zip(missing, self.store.get_many([prefix + key for key in missing])))
+        vectors = {key: vectors.get(key, fetched.get(key)) for key in keys}
+        vectors = {key: vector for key, vector in vectors.items() if vector is not None}
+        with self._lock:
+            self._vectors[product] = (time.monotonic(), vectors)
+        return vectors
+
+    def get_similar(self, query_vector, product=None):
+        """Return the cached result of the closest question, or None (counts as a miss)."""
+        vectors = self._scope_vectors(product)
+        result = None
+        if vectors:
+            keys = list(vectors)
+            scores = np.stack([vectors[key] for key in keys]) @ _unit(query_vector)
+            best = int(np.argmax(scores))
+            if scores[best] >= self.similarity_threshold:
+                result = self.store.get(self._prefix("answer", product) + keys[best])
+        self.counters.incr("answer:semantic_hits" if result is not None else "answer:misses")
+        return result
+
+    def put(self, question: str, query_vector, product, result):
+        self.put_for_version(self._index_version, question, query_vector, product, result)
+
+    def put_for_version(self, index_version, question: str, query_vector, product, result):
+        """Store only if this worker still serves `index_version` (not a concurrently swapped-in index)."""
+        if index_version != self._index_version:
+            return
+        key = normalize_question(question)
+        vector = _unit(query_vector)
+        self.store.set(self._prefix("answer-vector", product, index_version) + key, vector, self.ttl_seconds)
+        self.store.set(self._prefix("answer", product, index_version) + key, result, self.ttl_seconds)
+        self.counters.incr(f"answer:fills:{index_version}")
+        with self._lock:
+            if product in self._vectors and index_version == self._index_version:
+                self._vectors[product][1][key] = vector
+
+    def clear(self):
+        self.store.clear("answer:")
+        self.store.clear("answer-vector:")
+        with self._lock:
+            self._vectors = {}
+
+    def stats(self) -> dict:
+        exact, semantic, misses, fills = self.counters.read(
+            ["answer:exact_hits", "answer:semantic_hits", "answer:misses", f"answer:fills:{self._index_version}"]
+        )
+        lookups = exact + semantic + misses
+        return {
+            "shared": True,
+            "fills": fills,
+            "exact_hits": exact,
+            "semantic_hits": semantic,
+            "misses": misses,
+            "hit_rate": round((exact + semantic) / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "index_version": self._index_version,
+        }
+
+
+def _unit(vector) -> np.ndarray:
+    vec = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+_answer_cache = None
+
+
+def get_answer_cache():
+    """SemanticAnswerCache, or its shared counterpart when SHARED_STATE_BACKEND is sqlite / redis."""
+    global _answer_cache
+    if _answer_cache is None:
+        store = get_shared_store()
+        _answer_cache = SemanticAnswerCache() if store is None else SharedAnswerCache(store)
+    return _answer_cache
+
+
+_embedding_cache = None
+_retrieval_cache = None
+
+
+def get_embedding_cache():
+    global _embedding_cache
+    if _embedding_cache is None:
+        store = get_shared_store()
+        if store is None:
+            _embedding_cache = VersionedLRUCache(EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_CACHE_MAX_BYTES)
+        else:
+            _embedding_cache = SharedVersionedCache(store, "query-embedding")
+    return _embedding_cache
+
+
+def get_retrieval_cache():
+    global _retrieval_cache
+    if _retrieval_cache is None:
+        store = get_shared_store()
+        if store is None:
+            _retrieval_cache = VersionedLRUCache(RETRIEVAL_CACHE_MAX_ENTRIES, ttl_seconds=RETRIEVAL_CACHE_TTL_SECONDS)
+        else:
+            _retrieval_cache = SharedVersionedCache(store, "retrieval", RETRIEVAL_CACHE_TTL_SECONDS)
+    return _retrieval_cache
@@ -0,0 +1,150 @@
+import asyncio
+import os
+
+
+# CONFIGURATION
+RAG_MAX_CONCURRENCY = int(os.getenv("RAG_MAX_CONCURRENCY", "16"))
+RAG_MAX_QUEUE = int(os.getenv("RAG_MAX_QUEUE", "64"))
+RAG_QUEUE_TIMEOUT_SECONDS = float(os.getenv("RAG_QUEUE_TIMEOUT_SECONDS", "10"))
+# Concurrent /ask calls with the same normalized question share one RAG run
+RAG_COALESCE = os.getenv("RAG_COALESCE", "1") == "1"
+
+
+class OverloadedError(Exception):
+    """Raised when a request cannot get a slot; the API maps it to HTTP 503."""
+
+
+class ConcurrencyLimiter:
+    """
+    Async semaphore with a bounded wait queue.
+
+    At most `max_concurrent` holders run at once and at most `max_queue`
+    callers wait for a slot. Callers beyond that, or callers that wait longer
+    than `queue_timeout` seconds, are rejected immediately with OverloadedError
+    instead of piling up behind a slow upstream.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        if self.active + self.waiting >= self.max_concurrent + self.max_queue:
+            self.rejected += 1
+            raise OverloadedError("Too many requests waiting")
+
+        self.waiting += 1
+        # Not asyncio.wait_for: it can swallow a cancellation that races with
+        # the semaphore being granted, leaving a disconnected caller holding a slot
+        acquiring = asyncio.ensure_future(self._semaphore.acquire())
+        try:
+            done, _ = await asyncio.wait((acquiring,), timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(acquiring)
+            raise
+        finally:
+            self.waiting -= 1
+        if not done:
+            self._abandon(acquiring)
+            self.rejected += 1
+            raise OverloadedError("Timed out waiting for a free slot")
+        self.active += 1
+
+    def _abandon(self, acquiring):
+        if not acquiring.done():
+            acquiring.cancel()  # Semaphore.acquire hands back a slot granted meanwhile
+        elif not acquiring.cancelled():
+            self._semaphore.release()
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller starts
+    the work as a task, callers arriving while it runs await the same task.
+
+    The task is shielded, so a caller that disconnects (is cancelled) does
+    not cancel the work the others are waiting on; if it fails, every
+    waiter gets the exception. The key is released as soon as the task
+    finishes, so later calls (and retries after an error) start fresh.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._inflight = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn) -> tuple:
+        """(result of `fn()`, True if it was shared with an earlier caller)."""
+        if not self.enabled:
+            return await fn(), False
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finished(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved when every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "inflight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+
+_rag_limiter = None
+_ask_flight = None
+
+
+def get_rag_limiter() -> ConcurrencyLimiter:
+    global _rag_limiter
+    if _rag_limiter is None:
+        _rag_limiter = ConcurrencyLimiter(
+            RAG_MAX_CONCURRENCY, RAG_MAX_QUEUE, RAG_QUEUE_TIMEOUT_SECONDS
+        )
+    return _rag_limiter
+
+
+def get_ask_flight() -> SingleFlight:
+    global _ask_flight
+    if _ask_flight is None:
+        _ask_flight = SingleFlight(RAG_COALESCE)
+    return _ask_flight
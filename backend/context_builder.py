@@ -0,0 +1,161 @@
+import os
+import re
+import threading
+
+
+# CONFIGURATION
+# Total prompt tokens spent on retrieved documentation
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "900"))
+# Passage cap per chunk it was merged from, so one long chunk cannot take the whole budget
+CONTEXT_MAX_PASSAGE_TOKENS = int(os.getenv("CONTEXT_MAX_PASSAGE_TOKENS", "300"))
+# Word-shingle Jaccard similarity above which a passage counts as a duplicate
+CONTEXT_DUPLICATE_SIMILARITY = float(os.getenv("CONTEXT_DUPLICATE_SIMILARITY", "0.8"))
+TOKENIZER_MODEL = "gpt-4o-mini"
+# Longest text shared by neighbouring chunks (ingest CHUNK_OVERLAP is 150 chars)
+MAX_OVERLAP_CHARS = 400
+MIN_OVERLAP_CHARS = 20
+# Don't start a truncated passage in the last few tokens of the budget
+MIN_PASSAGE_TOKENS = 40
+# Previous behaviour, used to report tokens saved
+NAIVE_CHARS_PER_CHUNK = 800
+
+SENTENCE_END = re.compile(r"[.!?](?=\s|$)")
+
+_encoding = None
+_encoding_loaded = False
+_encoding_error = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """tiktoken encoding of the answer model, or None (chars/4 estimate) if unavailable."""
+    global _encoding, _encoding_loaded, _encoding_error
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+
+                    # Downloads the BPE file on first use unless it is in TIKTOKEN_CACHE_DIR
+                    _encoding = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+                except Exception as e:
+                    _encoding_error = str(e)
+                    print(f"⚠️ tiktoken unavailable, estimating tokens as chars/4: {e}")
+                _encoding_loaded = True
+    return _encoding
+
+
+def load_encoding() -> str:
+    """Load the tokenizer now (startup warm-up); returns how prompt tokens are counted."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return f"chars/4 estimate (tiktoken unavailable: {_encoding_error})"
+    return f"tiktoken {encoding.name}"
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix within `max_tokens`, cut at a sentence end (else a word boundary)."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding is None:
+        prefix = text[:max_tokens * 4]
+    else:
+        prefix = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+    ends = [m.end() for m in SENTENCE_END.finditer(prefix)]
+    if ends and ends[-1] >= len(prefix) // 2:
+        return prefix[:ends[-1]]
+    space = prefix.rfind(" ")
+    return prefix[:space] if space > 0 else prefix
+
+
+def _merge_overlapping(a: str, b: str):
+    """`a` and `b` joined on their shared overlap (either order), or None if they don't overlap."""
+    if b in a:
+        return a
+    if a in b:
+        return b
+    for first, second in ((a, b), (b, a)):
+        for size in range(min(len(first), len(second), MAX_OVERLAP_CHARS), MIN_OVERLAP_CHARS - 1, -1):
+            if first.endswith(second[:size]):
+                return first + second[size:]
+    return None
+
+
+def _shingles(text: str) -> set:
+    words = text.lower().split()
+    return {" ".join(words[i:i + 3]) for i in range(max(len(words) - 2, 1))}
+
+
+def build_context(docs: list, budget: int = CONTEXT_TOKEN_BUDGET) -> tuple:
+    """
+    Prompt context from `docs` (LangChain Documents, most relevant first).
+
+    Overlapping chunks of the same source are merged into one passage,
+    near-duplicate passages are dropped, and passages are added in relevance
+    order until `budget` tokens are used, the last one cut at a sentence
+    boundary. Returns (context, stats).
+    """
+    # Merge chunks of the same page that overlap (ingest splits with CHUNK_OVERLAP)
+    passages = []  # {"source", "text", "chunks"} in order of their best-ranked chunk
+    merged = 0
+    for doc in docs:
+        source = doc.metadata.get("source")
+        text = doc.page_content.strip()
+        for passage in passages:
+            if passage["source"] != source:
+                continue
+            joined = _merge_overlapping(passage["text"], text)
+            if joined is not None:
+                passage["text"] = joined
+                passage["chunks"] += 1
+                merged += 1
+                break
+        else:
+            passages.append({"source": source, "text": text, "chunks": 1})
+
+    # Drop passages that repeat an earlier (more relevant) one
+    kept, seen = [], []
+    for passage in passages:
+        shingles = _shingles(passage["text"])
+        if any(len(shingles & other) / len(shingles | other) >= CONTEXT_DUPLICATE_SIMILARITY for other in seen):
+            continue
+        seen.append(shingles)
+        kept.append(passage)
+    duplicates = len(passages) - len(kept)
+
+    # Fill the token budget in relevance order
+    parts, used = [], 0
+    separator_tokens = count_tokens("\n\n")
+    for passage in kept:
+        remaining = budget - used - (separator_tokens if parts else 0)
+        if remaining < MIN_PASSAGE_TOKENS:
+            break
+        cap = CONTEXT_MAX_PASSAGE_TOKENS * passage["chunks"]
+        text = truncate_to_tokens(passage["text"], min(remaining, cap))
+        if not text:
+            continue
+        used += count_tokens(text) + (separator_tokens if parts else 0)
+        parts.append(text)
+
+    context = "\n\n".join(parts)
+    tokens = count_tokens(context)
+    naive_tokens = count_tokens("\n\n".join(doc.page_content[:NAIVE_CHARS_PER_CHUNK] for doc in docs))
+    stats = {
+        "tokens": tokens,
+        "naive_tokens": naive_tokens,
+        "tokens_saved": naive_tokens - tokens,
+        "chunks": len(docs),
+        "passages": len(parts),
+        "merged": merged,
+        "duplicates": duplicates,
+    }
+    return context, stats
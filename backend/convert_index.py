@@ -0,0 +1,27 @@
+import os
+import sys
+
+# Allow `python backend/convert_index.py` as well as `python -m backend.convert_index`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.vector_index import convert_legacy_index
+
+
+#CONFIGURATION
+INDEX_DIR = "vector_store/accops_docs"
+
+
+def main():
+    """
+    One-time conversion of a pickled FAISS index (index.faiss + index.pkl)
+    to the memory-mapped store format. Vectors are copied as-is, so no
+    embedding model or network access is needed.
+    """
+    index_dir = sys.argv[1] if len(sys.argv) > 1 else INDEX_DIR
+    print(f"🔁 Converting vector database at {index_dir}")
+    generation = convert_legacy_index(index_dir)
+    print(f"🎉 Live generation: {generation}")
+    print("   The old index.faiss / index.pkl files are no longer read and can be deleted.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# CONFIGURATION
+CRAWL_DIR = "vector_store/crawl"
+MANIFEST_FILE = os.path.join(CRAWL_DIR, "manifest.json")
+PAGES_DIR = os.path.join(CRAWL_DIR, "pages")
+
+CRAWL_WORKERS = int(os.getenv("CRAWL_WORKERS", "8"))
+# Politeness: max requests per second to any single host
+CRAWL_RATE_PER_HOST = float(os.getenv("CRAWL_RATE_PER_HOST", "5"))
+CRAWL_TIMEOUT = 15
+CRAWL_RETRIES = 3
+USER_AGENT = "AccopsAssist-Ingest/1.0"
+
+
+def make_session(pool_size: int = CRAWL_WORKERS, retries: int = CRAWL_RETRIES) -> requests.Session:
+    """
+    HTTP session with a connection pool sized for the worker count and
+    exponential-backoff retries on transient failures.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+class HostRateLimiter:
+    """Spaces requests to the same host at least 1/rate seconds apart, across threads."""
+
+    def __init__(self, rate_per_host: float):
+        self.interval = 1.0 / rate_per_host if rate_per_host > 0 else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Crawler:
+    """
+    Concurrent, incremental page fetcher.
+
+    Every fetched URL is recorded in a persisted manifest (ETag, Last-Modified,
+    content hash) together with the processed result of the page. On the next
+    run pages are requested conditionally; a 304 or an identical content hash
+    marks the page "unchanged" and its cached result is reused without
+    re-processing. `process(url, html)` turns a page into any JSON-serializable
+    result (extracted text, list of links, ...); `kind` namespaces manifest
+    entries so the same URL can be crawled for different results.
+    """
+
+    def __init__(
+        self,
+        manifest_file: str = MANIFEST_FILE,
+        pages_dir: str = PAGES_DIR,
+        workers: int = CRAWL_WORKERS,
+        rate_per_host: float = CRAWL_RATE_PER_HOST,
+        session: requests.Session = None,
+    ):
+        self.manifest_file = manifest_file
+        self.pages_dir = pages_dir
+        self.workers = workers
+        self.session = session or make_session(workers)
+        self.rate_limiter = HostRateLimiter(rate_per_host)
+        self.manifest = self._load_manifest()
+        self._lock = threading.Lock()
+        self.stats = {"new": 0, "changed": 0, "unchanged": 0, "failed": 0, "resumed": 0}
+
+    def crawl(self, urls, process, kind: str = "page") -> list:
+        """
+        Fetch and process `urls` with a pool of workers.
+        Returns one dict per URL: {"url", "status", "result", "error"} where
+        status is "new", "changed", "unchanged" or "failed" (a failed page
+        carries its previously cached result, or None).
+        """
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="crawler") as pool:
+            return list(pool.map(lambda url: self.fetch(url, process, kind), urls))
+
+    def fetch(self, url: str, process, kind: str = "page") -> dict:
+        key = f"{kind}|{url}"
+        entry = self.manifest.get(key)
+        cached = self._read_cached(key) if entry else None
+        headers = {}
+        if cached is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            self.rate_limiter.wait(url)
+            res = self.session.get(url, headers=headers, timeout=CRAWL_TIMEOUT)
+
+            if res.status_code == 304 and cached is not None:
+                return self._record(url, "unchanged", cached)
+            res.raise_for_status()
+
+            content_hash = hashlib.sha256(res.content).hexdigest()
+            if cached is not None and entry.get("content_hash") == content_hash:
+                status = "unchanged"
+                result = cached
+            else:
+                status = "changed" if entry else "new"
+                result = process(url, res.text)
+                self._write_cached(key, result)
+
+            with self._lock:
+                self.manifest[key] = {
+                    "etag": res.headers.get("ETag"),
+                    "last_modified": res.headers.get("Last-Modified"),
+                    "content_hash": content_hash,
+                    "fetched_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                }
+            return self._record(url, status, result)
+        except Exception as e:
+            # Keep serving the last good result (if any) rather than dropping the page
+            print(f"⚠️ Failed to fetch {url}: {e}")
+            return self._record(url, "failed", cached, error=str(e))
+
+    def resume(self, url: str, kind: str = "page"):
+        """
+        Record for a page completed by an interrupted run: its cached result,
+        without a request (status "resumed"), or None if nothing is cached.
+        """
+        key = f"{kind}|{url}"
+        result = self._read_cached(key) if key in self.manifest else None
+        return self._record(url, "resumed", result) if result is not None else None
+
+    def prune(self, keep_urls, kind: str = "page"):
+        """Forget manifest entries (and cached results) of `kind` for pages that no longer exist."""
+        keep_keys = {f"{kind}|{url}" for url in keep_urls}
+        with self._lock:
+            stale = [k for k in self.manifest if k.startswith(f"{kind}|") and k not in keep_keys]
+            for key in stale:
+                del self.manifest[key]
+                path = self._cache_path(key)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def previous_urls(self, kind: str = "page") -> list:
+        """URLs of `kind` recorded in the manifest (from this or earlier runs)."""
+        prefix = f"{kind}|"
+        return [k[len(prefix):] for k in self.manifest if k.startswith(prefix)]
+
+    def save_manifest(self):
+        os.makedirs(os.path.dirname(self.manifest_file) or ".", exist_ok=True)
+        tmp_file = f"{self.manifest_file}.tmp"
+        with self._lock:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(self.manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_file, self.manifest_file)
+
+    def _record(self, url, status, result, error=None) -> dict:
+        with self._lock:
+            self.stats[status] += 1
+        return {"url": url, "status": status, "result": result, "error": error}
+
+    def _load_manifest(self) -> dict:
+        if not os.path.exists(self.manifest_file):
+            return {}
+        with open(self.manifest_file, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.pages_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+    def _read_cached(self, key: str):
+        path = self._cache_path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_cached(self, key: str, result):
+        os.makedirs(self.pages_dir, exist_ok=True)
+        path = self._cache_path(key)
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        os.replace(tmp_file, path)
@@ -0,0 +1,193 @@
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+# CONFIGURATION
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_CACHE_FILE = "vector_store/embedding_cache.sqlite"
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# Worker processes for embedding; 1 embeds in-process with the given embeddings object
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))
+
+
+class EmbeddingCache:
+    """
+    On-disk vector cache keyed by sha256(model name + chunk text), so
+    re-ingestion only embeds text it has never seen. Vectors are stored as
+    raw float32 bytes in SQLite.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_FILE, model_name: str = EMBEDDING_MODEL_NAME):
+        self.model_name = model_name
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\n{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: list) -> dict:
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                part,
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: list):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vec, dtype=np.float32).tobytes()) for key, vec in items],
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+# PROCESS POOL WORKERS
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int):
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # Split the cores between workers instead of every process using all of them
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+
+def _embed_batch(texts: list) -> np.ndarray:
+    return _worker_model.encode(texts, batch_size=len(texts), convert_to_numpy=True).astype(np.float32)
+
+
+def _batches(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def start_pool(workers: int = EMBED_WORKERS, model_name: str = EMBEDDING_MODEL_NAME) -> ProcessPoolExecutor:
+    """Worker processes that each load `model_name` once; reuse it across embed_texts() calls with `pool=`."""
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_name, threads),
+    )
+
+
+class EmbeddingThroughput:
+    """
+    Totals of several embed_texts() calls (e.g. one per ingest batch, from
+    several threads), reported as one throughput line per run.
+    """
+
+    def __init__(self):
+        self.chunks = 0
+        self.computed = 0
+        self.started = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def add(self, chunks: int, computed: int, started: float, finished: float):
+        with self._lock:
+            self.chunks += chunks
+            self.computed += computed
+            self.started = started if self.started is None else min(self.started, started)
+            self.finished = finished if self.finished is None else max(self.finished, finished)
+
+    def report(self):
+        if not self.chunks:
+            print("⚡ No new chunks to embed")
+            return
+        _print_throughput(self.chunks, self.computed, self.finished - self.started)
+
+
+def _print_throughput(chunks: int, computed: int, elapsed: float):
+    rate = chunks / elapsed if elapsed > 0 else float("inf")
+    print(
+        f"⚡ Embedded {chunks} chunks ({chunks - computed} from cache, "
+        f"{computed} computed) in {elapsed:.1f}s — {rate:.0f} chunks/sec"
+    )
+
+
+def embed_texts(
+    texts: list,
+    embeddings=None,
+    batch_size: int = EMBED_BATCH_SIZE,
+    workers: int = EMBED_WORKERS,
+    cache: EmbeddingCache = None,
+    model_name: str = EMBEDDING_MODEL_NAME,
+    verbose: bool = True,
+    pool: ProcessPoolExecutor = None,
+    throughput: EmbeddingThroughput = None,
+) -> np.ndarray:
+    """
+    Embed `texts` in batches and return a float32 array (len(texts), dim).
+
+    Vectors already in the on-disk cache are reused. The rest are embedded in
+    `batch_size` batches, fanned out over `workers` processes (each loading
+    its own copy of the model), or in-process through `embeddings`
+    (a LangChain Embeddings object) when workers <= 1. A long-lived `pool`
+    from start_pool() is used instead of starting one per call. Prints
+    throughput unless `verbose` is False; `throughput` collects it across
+    calls instead.
+    """
+    started = time.perf_counter()
+    own_cache = cache is None
+    cache = cache or EmbeddingCache(model_name=model_name)
+
+    keys = [cache.key(text) for text in texts]
+    vectors = cache.get_many(list(set(keys)))
+
+    # Embed each distinct uncached text once
+    missing = list(dict.fromkeys(t for t, k in zip(texts, keys) if k not in vectors))
+    if missing:
+        batches = list(_batches(missing, batch_size))
+        if pool is not None:
+            results = list(pool.map(_embed_batch, batches))
+        elif workers > 1 and len(batches) > 1:
+            with start_pool(min(workers, len(batches)), model_name) as own_pool:
+                results = list(own_pool.map(_embed_batch, batches))
+        else:
+            if embeddings is None:
+                raise ValueError("embed_texts needs an embeddings object when running in-process")
+            results = [np.asarray(embeddings.embed_documents(batch), dtype=np.float32) for batch in batches]
+
+        new_items = []
+        for batch, batch_vectors in zip(batches, results):
+            for text, vec in zip(batch, batch_vectors):
+                new_items.append((cache.key(text), vec))
+        cache.put_many(new_items)
+        vectors.update(new_items)
+
+    if own_cache:
+        cache.close()
+
+    finished = time.perf_counter()
+    if throughput is not None:
+        throughput.add(len(texts), len(missing), started, finished)
+    if verbose:
+        _print_throughput(len(texts), len(missing), finished - started)
+
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack([vectors[key] for key in keys])
@@ -0,0 +1,222 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from backend.cache import normalize_question
+from backend.keyword_index import tokenize
+from backend.product_definitions import PRODUCT_DEFINITIONS
+
+
+# CONFIGURATION
+# Curated and auto-promoted answers (see backend/promote_faq.py):
+#   {"entries": [{"questions": [...], "answer": "...", "sources": [...],
+#                 "product": "hysecure", "origin": "curated" | "promoted"}]}
+# Promoted entries also carry the "index_version" (and release "version") they
+# were generated from and are only served while that index is live.
+FAQ_FILE = os.getenv("FAQ_FILE", os.path.join("data", "faq.json"))
+# Cosine similarity to the closest FAQ phrasing needed to serve its answer
+FAQ_MIN_SIMILARITY = float(os.getenv("FAQ_MIN_SIMILARITY", "0.85"))
+# Share of the question's content words that must appear in the FAQ entry,
+# so "what is HyWorks" is routed but "what is HyWorks load balancing" is not
+FAQ_MIN_KEYWORD_COVERAGE = float(os.getenv("FAQ_MIN_KEYWORD_COVERAGE", "1.0"))
+FAQ_CONFIDENCE = 0.95
+
+# Words that carry no topic of their own in a definitional question
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "what", "whats", "which", "who", "me", "tell", "about",
+    "explain", "define", "definition", "of", "do", "does", "used", "for", "please", "can", "you",
+    "i", "mean", "means", "meant", "by", "overview", "give", "to", "it", "s",
+}
+DEFINITION_QUESTIONS = (
+    "what is {name}",
+    "tell me about {name}",
+    "what does {name} do",
+    "what is {name} used for",
+    "define {name}",
+    "{name} overview",
+)
+
+
+def content_words(text: str) -> set:
+    return {token for token in tokenize(normalize_question(text)) if token not in STOPWORDS}
+
+
+def definition_entries() -> list:
+    """FAQ entries for the canned product answers in PRODUCT_DEFINITIONS."""
+    entries = []
+    for key, definition in PRODUCT_DEFINITIONS.items():
+        if not definition.get("answer"):
+            continue
+        names = {definition.get("name", key), key}
+        entries.append({
+            "questions": [template.format(name=name) for name in sorted(names) for template in DEFINITION_QUESTIONS],
+            "answer": definition["answer"],
+            "sources": [definition["source"]] if definition.get("source") else [],
+            "product": key,
+            "origin": "definition",
+        })
+    return entries
+
+
+def load_entries(path: str = FAQ_FILE) -> list:
+    entries = definition_entries()
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            entries.extend(json.load(f).get("entries", []))
+    return entries
+
+
+class FaqRouter:
+    """
+    Precomputed answers for definitional / frequently asked questions,
+    served without retrieval or an LLM call.
+
+    A question is routed when its normalized text equals a FAQ phrasing
+    (`match_exact`, no embedding needed), or when its embedding is within
+    FAQ_MIN_SIMILARITY of one and its content words are covered by that
+    entry (`match_similar`; the keyword guard rejects paraphrases that ask
+    something more specific). Phrasings are embedded by `warm()` (or else
+    on the first semantic lookup); the FAQ file is reloaded when it changes,
+    and once warmed a reloaded index is embedded before it is swapped in.
+    """
+
+    def __init__(self, path: str = FAQ_FILE, embed_documents=None):
+        self.path = path
+        self.embed_documents = embed_documents
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._mtime = None
+        self._warm = False
+        self.lookups = 0
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.stale_skips = 0
+        self._load()
+
+    def _file_mtime(self):
+        return os.path.getmtime(self.path) if os.path.exists(self.path) else None
+
+    @property
+    def entries(self) -> list:
+        return self._state["entries"]
+
+    def _load(self):
+        # Built aside and swapped in one assignment, so lookups never see a half-loaded index
+        entries = load_entries(self.path)
+        state = {"entries": entries, "exact": {}, "phrasings": [], "words": [], "vectors": None}
+        for i, entry in enumerate(entries):
+            state["words"].append(set().union(*(content_words(q) for q in entry["questions"])))
+            for question in entry["questions"]:
+                state["exact"].setdefault(normalize_question(question), i)
+                state["phrasings"].append((i, question))  # (entry index, phrasing)
+        if self._warm:
+            state["vectors"] = self._embed_phrasings(state)
+        self._mtime = self._file_mtime()
+        self._state = state
+
+    def warm(self) -> int:
+        """Embed the phrasings now (startup warm-up) and keep reloads warm; returns their count."""
+        self._phrasing_vectors(self._state)
+        self._warm = True
+        return len(self._state["phrasings"])
+
+    def refresh(self):
+        """Reload if the FAQ file was edited or (re)written by promote_faq.py."""
+        if self._file_mtime() != self._mtime:
+            with self._lock:
+                if self._file_mtime() != self._mtime:
+                    self._load()
+                    print(f"🔄 Reloaded FAQ index ({len(self.entries)} entries)")
+
+    def _phrasing_vectors(self, state: dict) -> np.ndarray:
+        if state["vectors"] is None:
+            with self._lock:
+                if state["vectors"] is None:
+                    state["vectors"] = self._embed_phrasings(state)
+        return state["vectors"]
+
+    def _embed_phrasings(self, state: dict) -> np.ndarray:
+        if self.embed_documents is None or not state["phrasings"]:
+            return np.zeros((0, 0), dtype=np.float32)
+        vectors = np.asarray(self.embed_documents([q for _, q in state["phrasings"]]), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    def match_exact(self, question: str, product=None, index_version=None, release=None):
+        """FAQ entry with a phrasing equal to `question` after normalization, or None."""
+        with self._stats_lock:
+            self.lookups += 1
+        state = self._state
+        index = state["exact"].get(normalize_question(question))
+        if index is None or not self._usable(state["entries"][index], product, index_version, release):
+            return None
+        with self._stats_lock:
+            self.exact_hits += 1
+        return state["entries"][index]
+
+    def match_similar(self, question: str, query_vector, product=None, index_version=None, release=None):
+        """
+        FAQ entry whose phrasing is closest to `query_vector` (above
+        FAQ_MIN_SIMILARITY) and covers the question's content words, or None.
+        Entries of another product than `product` (when given) never match,
+        nor do entries generated from another index version or release.
+        """
+        state = self._state
+        words = content_words(question)
+        if not words or self.embed_documents is None or not state["phrasings"]:
+            return None
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = self._phrasing_vectors(state) @ query
+        for best in np.argsort(-scores):
+            if scores[best] < FAQ_MIN_SIMILARITY:
+                break
+            index = state["phrasings"][best][0]
+            coverage = len(words & state["words"][index]) / len(words)
+            if coverage >= FAQ_MIN_KEYWORD_COVERAGE and self._usable(state["entries"][index], product, index_version, release):
+                with self._stats_lock:
+                    self.semantic_hits += 1
+                return state["entries"][index]
+        return None
+
+    def _usable(self, entry: dict, product, index_version, release) -> bool:
+        if not _product_matches(entry, product):
+            return False
+        if _is_stale(entry, index_version, release):
+            with self._stats_lock:
+                self.stale_skips += 1
+            return False
+        return True
+
+    def stats(self) -> dict:
+        origins = {}
+        for entry in self.entries:
+            origin = entry.get("origin", "curated")
+            origins[origin] = origins.get(origin, 0) + 1
+        with self._stats_lock:
+            routed = self.exact_hits + self.semantic_hits
+            return {
+                "entries": len(self.entries),
+                "by_origin": origins,
+                "lookups": self.lookups,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "stale_skips": self.stale_skips,
+                "routed_ratio": round(routed / self.lookups, 4) if self.lookups else 0.0,
+            }
+
+
+def _product_matches(entry: dict, product) -> bool:
+    return product is None or entry.get("product") is None or entry["product"] == product
+
+
+def _is_stale(entry: dict, index_version=None, release=None) -> bool:
+    """
+    A promoted answer was generated from one index (and release): after a
+    re-ingest or for another release its answer and sources may be wrong.
+    """
+    if index_version is not None and entry.get("index_version") not in (None, index_version):
+        return True
+    return release is not None and entry.get("version") not in (None, release)
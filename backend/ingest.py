@@ -1,27 +1,62 @@
+import argparse
 import os
-import requests
+import sys
+import threading
+import time
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 
+# Allow `python backend/ingest.py` as well as `python -m backend.ingest`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.crawler import CRAWL_WORKERS, Crawler
+from backend.ingest_pipeline import Checkpoint, Pipeline, Stage
+from backend.product_definitions import PRODUCT_DEFINITIONS, release_for_url, seed_urls
+from backend.vector_index import IndexUpdate, chunk_ids
+from backend.embedding_pipeline import (
+    EMBED_BATCH_SIZE, EMBED_WORKERS, EMBEDDING_MODEL_NAME, EmbeddingCache, EmbeddingThroughput, embed_texts, start_pool
+)
 
-#CONFIGURATION
 
-SEED_URLS = [
-    "https://docs.accops.com/HyWorks36/index.html",
-    "https://docs.accops.com/hysecure_7_2/index.html"
-]
+#CONFIGURATION
 
+# Documentation roots are the releases in PRODUCT_DEFINITIONS ("versions"), so
+# new products and releases are picked up automatically
 BASE_DOMAIN = "docs.accops.com"
 OUTPUT_DIR = "vector_store/accops_docs"
 
 CHUNK_SIZE = 1200
 CHUNK_OVERLAP = 150
 
+# Streaming pipeline: threads per stage (fetching uses CRAWL_WORKERS). With
+# EMBED_WORKERS > 1 the embed threads hand their batches to that many model
+# processes (one thread per process keeps them all busy); with 1 they share one
+# in-process model. Batches waiting for them are few, so fetched text never
+# piles up in memory.
+DISCOVER_WORKERS = 4
+CHUNK_WORKERS = int(os.getenv("INGEST_CHUNK_WORKERS", "2"))
+EMBED_STAGE_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", str(EMBED_WORKERS)))
+EMBED_QUEUE_SIZE = 4
+# Progress of an interrupted run (pages discovered / embedded), resumed by the next run
+CHECKPOINT_FILE = "vector_store/ingest_checkpoint.json"
+CHECKPOINT_SECONDS = float(os.getenv("INGEST_CHECKPOINT_SECONDS", "30"))
+
+# Vector index: flat (exact, default), hnsw, ivf_flat or ivf_pq. Approximate
+# indexes only pay off for large corpora; compare them with
+# `python benchmarks/ann_tradeoff.py`. ANN_EF_SEARCH / ANN_NPROBE in rag.py tune search.
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+ANN_CONFIG = {
+    "type": INDEX_TYPE,
+    "m": int(os.getenv("HNSW_M", "32")),
+    "ef_construction": int(os.getenv("HNSW_EF_CONSTRUCTION", "200")),
+    "nlist": int(os.getenv("IVF_NLIST", "0")),  # 0 = 4 * sqrt(chunks)
+    "pq_m": int(os.getenv("PQ_M", "48")),  # sub-quantizers (bytes per vector at 8 bits)
+    "pq_bits": int(os.getenv("PQ_BITS", "8")),
+}
+
 
 #HELPERS
 def is_valid_doc_link(url: str) -> bool:
@@ -36,13 +71,12 @@ def is_valid_doc_link(url: str) -> bool:
     return True
 
 
-def extract_links(page_url: str) -> set:
+def extract_links(page_url: str, html: str) -> list:
     """
     Extract all internal documentation links from a page.
     """
     print(f"🔍 Crawling links from: {page_url}")
-    res = requests.get(page_url, timeout=15)
-    soup = BeautifulSoup(res.text, "html.parser")
+    soup = BeautifulSoup(html, "html.parser")
 
     links = set()
     for a in soup.find_all("a", href=True):
@@ -52,16 +86,15 @@ def extract_links(page_url: str) -> set:
         if is_valid_doc_link(full_url):
             links.add(full_url)
 
-    return links
+    return sorted(links)
 
 
-def scrape_page(url: str) -> str:
+def scrape_page(url: str, html: str) -> str:
     """
     Extract clean readable text from a documentation page.
     """
     print(f"📄 Scraping: {url}")
-    res = requests.get(url, timeout=15)
-    soup = BeautifulSoup(res.text, "html.parser")
+    soup = BeautifulSoup(html, "html.parser")
 
     # Remove unwanted elements
     for tag in soup(["script", "style", "nav", "footer", "header"]):
@@ -70,59 +103,192 @@ def scrape_page(url: str) -> str:
     text = soup.get_text(separator=" ")
     return " ".join(text.split())
 
+def selected_releases(product: str = None, version: str = None):
+    """(product, version) pairs to ingest, or None for every release."""
+    if product is None:
+        return None
+    if product not in PRODUCT_DEFINITIONS:
+        sys.exit(f"Unknown product '{product}' (expected one of {', '.join(PRODUCT_DEFINITIONS)})")
+    versions = PRODUCT_DEFINITIONS[product]["versions"]
+    if version is not None and version not in versions:
+        sys.exit(f"Unknown {product} version '{version}' (expected one of {', '.join(versions)})")
+    return {(product, v) for v in versions if version is None or v == version}
+
+
 # MAIN INGESTION PIPELINE
-def main():
-    #Discover all documentation pages
-    all_urls = set()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl the Accops docs and update the vector index.")
+    parser.add_argument("--product", help="only re-crawl this product (PRODUCT_DEFINITIONS key); other chunks are kept")
+    parser.add_argument("--version", help="with --product: only this release, e.g. \"3.6\"")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint of an interrupted run")
+    args = parser.parse_args(argv)
+    releases = selected_releases(args.product, args.version)
 
-    for seed in SEED_URLS:
-        discovered = extract_links(seed)
-        all_urls.update(discovered)
+    def in_scope(url: str) -> bool:
+        return releases is None or release_for_url(url) in releases
 
-    print(f"\n✅ Discovered {len(all_urls)} documentation pages\n")
+    started = time.perf_counter()
+    # Conditional, concurrent fetches; unchanged pages reuse their cached text
+    crawler = Crawler()
+    checkpoint = Checkpoint(CHECKPOINT_FILE, [args.product, args.version])
+    if not args.restart and checkpoint.load():
+        print(f"⏯️ Resuming from {CHECKPOINT_FILE}: {len(checkpoint.done)} of "
+              f"{len(checkpoint.discovered)} pages already embedded")
 
-    #Scrape + chunk pages with metadata
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=CHUNK_SIZE,
         chunk_overlap=CHUNK_OVERLAP
     )
+    # Create embeddings (LOCAL, NO API COST): EMBED_WORKERS processes that each
+    # load the model once for the whole run, or the model in this process
+    pool = start_pool(EMBED_WORKERS) if EMBED_WORKERS > 1 else None
+    embeddings = None if pool is not None else HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME
+    )
+    throughput = EmbeddingThroughput()
+    # Pages are written to a new index generation as they are embedded; chunks
+    # already in the live index keep their vectors, only new text is embedded
+    update = IndexUpdate(OUTPUT_DIR, EMBEDDING_MODEL_NAME, ANN_CONFIG)
+    embedding_caches = threading.local()
+
+    lock = threading.Lock()
+    discovered = set(checkpoint.discovered)
+    seeds_ok = []
+    total_chunks = [0]
+    # Pages we could not fetch (and have no cached copy of) keep their indexed chunks
+    keep_sources = set()
+    last_checkpoint = [time.monotonic()]
 
-    documents = []
+    # Stages: discover -> fetch (+ extract) -> chunk -> batch -> embed -> index
+    def discover(seed, emit):
+        links = crawler.fetch(seed, extract_links, kind="links")
+        seeds_ok.append(links["result"] is not None)
+        for url in links["result"] or []:
+            with lock:
+                new = in_scope(url) and url not in discovered
+                discovered.add(url)
+            if new:
+                emit(url)
 
-    for url in sorted(all_urls):
+    def fetch(url, emit):
+        # Pages finished by an interrupted run are read back from the crawl cache
+        page = crawler.resume(url) if url in checkpoint.done else None
+        page = page or crawler.fetch(url, scrape_page)
+        if page["result"] is None:
+            with lock:
+                keep_sources.add(url)
+            return
+        emit((url, page["result"]))
+
+    def chunk(page, emit):
+        url, text = page
         try:
-            text = scrape_page(url)
-            chunks = splitter.split_text(text)
-
-            for chunk in chunks:
-                documents.append(
-                    Document(
-                        page_content=chunk,
-                        metadata={
-                            "source": url,
-                            "module": "HySecure" if "hysecure" in url.lower() else "HyWorks"
-                        }
-                    )
-                )
+            product, version = release_for_url(url)
+            module = PRODUCT_DEFINITIONS[product]["name"] if product else "Unknown"
+            documents = [
+                Document(page_content=text_chunk, metadata={"source": url, "module": module, "version": version})
+                for text_chunk in splitter.split_text(text)
+            ]
         except Exception as e:
             print(f"⚠️ Failed to process {url}: {e}")
+            with lock:
+                keep_sources.add(url)
+            return
+        emit((url, documents))
+
+    pending = []
+
+    def batch(page, emit):
+        # Whole pages, at least EMBED_BATCH_SIZE chunks per batch
+        pending.append(page)
+        if sum(len(docs) for _, docs in pending) >= EMBED_BATCH_SIZE:
+            emit(pending[:])
+            pending.clear()
+
+    def flush_batch(emit):
+        if pending:
+            emit(pending[:])
+
+    def embed(pages, emit):
+        if not hasattr(embedding_caches, "cache"):
+            embedding_caches.cache = EmbeddingCache()
+        pages = [(url, docs, chunk_ids(url, [doc.page_content for doc in docs])) for url, docs in pages]
+        new = [(i, doc.page_content) for _, docs, ids in pages for doc, i in zip(docs, ids) if not update.is_indexed(i)]
+        vectors = {}
+        if new:
+            found = embed_texts([text for _, text in new], embeddings, cache=embedding_caches.cache,
+                                verbose=False, pool=pool, throughput=throughput)
+            vectors = dict(zip([i for i, _ in new], found))
+        for url, docs, ids in pages:
+            emit((url, docs, {i: vectors[i] for i in ids if i in vectors}))
+
+    def index(page, emit):
+        url, docs, vectors = page
+        update.add_source(url, docs, vectors)
+        total_chunks[0] += len(docs)
+        checkpoint.mark_done(url)
+        if time.monotonic() - last_checkpoint[0] >= CHECKPOINT_SECONDS:
+            save_checkpoint(False)
+
+    def save_checkpoint(discovery_complete):
+        crawler.save_manifest()
+        with lock:
+            urls = list(discovered)
+        checkpoint.save(urls, discovery_complete)
+        last_checkpoint[0] = time.monotonic()
 
-    print(f"\n✅ Created {len(documents)} document chunks\n")
+    stages = [
+        Stage("discover", discover, workers=DISCOVER_WORKERS),
+        Stage("fetch", fetch, workers=CRAWL_WORKERS),
+        Stage("chunk", chunk, workers=CHUNK_WORKERS),
+        Stage("batch", batch, flush=flush_batch),
+        Stage("embed", embed, workers=EMBED_STAGE_WORKERS, queue_size=EMBED_QUEUE_SIZE),
+        Stage("index", index),
+    ]
+    seeds = seed_urls(releases)
+    items = seeds
+    if checkpoint.discovery_complete:
+        # Discovery finished before the interruption: feed its pages straight to the fetchers
+        seeds_ok.extend([True] * len(seeds))
+        stages, items = stages[1:], sorted(discovered)
+    pipeline = Pipeline(stages)
+    try:
+        pipeline.run(items)
+    except BaseException:
+        update.abort()
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        save_checkpoint(checkpoint.discovery_complete or (len(seeds_ok) == len(seeds) and all(seeds_ok)))
+        for stage in pipeline.stages:
+            print(f"   {stage.name:>8}: {stage.processed} in, {stage.emitted} out")
 
-    # Create embeddings (LOCAL, NO API COST)
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
+    seeds_complete = len(seeds_ok) == len(seeds) and all(seeds_ok)
+    if releases is None and seeds_complete:
+        crawler.prune(discovered)
+    if not seeds_complete:
+        keep_sources.update(crawler.previous_urls())
+    crawler.save_manifest()
+    print(
+        f"\n🌐 Crawl finished in {time.perf_counter() - started:.1f}s: "
+        f"{len(discovered)} pages discovered, {crawler.stats['new']} new, {crawler.stats['changed']} changed, "
+        f"{crawler.stats['unchanged']} unchanged, {crawler.stats['resumed']} resumed, "
+        f"{crawler.stats['failed']} failed\n"
     )
 
-    # Build FAISS vector database
-    db = FAISS.from_documents(documents, embeddings)
+    print(f"\n✅ Created {total_chunks[0]} document chunks\n")
+    throughput.report()
 
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    db.save_local(OUTPUT_DIR)
+    # Keep the chunks of pages not crawled this run and publish the new generation
+    stats = update.finish(keep_sources, in_scope)
+    checkpoint.remove()
 
-    print("🎉 Vector database created successfully!")
+    print("🎉 Vector database updated successfully!")
+    print(f"   {stats['added']} added, {stats['deleted']} deleted, {stats['kept']} unchanged chunks "
+          f"({stats['retagged']} re-tagged)")
     print(f"📦 Saved at: {OUTPUT_DIR}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,218 @@
+import json
+import os
+import queue
+import threading
+import time
+
+
+# CONFIGURATION
+# Items waiting in front of each stage; a full queue blocks the stage feeding it,
+# so a fast stage (fetching) never runs far ahead of a slow one (embedding)
+STAGE_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "64"))
+# Seconds between progress lines while the pipeline runs
+PROGRESS_SECONDS = float(os.getenv("INGEST_PROGRESS_SECONDS", "10"))
+
+_DONE = object()
+
+
+class Stage:
+    """
+    One pipeline step: `workers` threads take items from a bounded input
+    queue and call `fn(item, emit)`, where `emit(result)` hands a result to
+    the next stage (blocking while its queue is full). `flush(emit)` runs
+    once after the last item, e.g. to emit a partial batch.
+    """
+
+    def __init__(self, name: str, fn, workers: int = 1, queue_size: int = STAGE_QUEUE_SIZE, flush=None):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.flush = flush
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.processed = 0
+        self.emitted = 0
+        self.busy = 0
+        self._finished_workers = 0
+        self._lock = threading.Lock()
+
+    def stats(self, elapsed: float) -> dict:
+        with self._lock:
+            return {
+                "processed": self.processed,
+                "emitted": self.emitted,
+                "per_sec": round(self.processed / elapsed, 1) if elapsed > 0 else 0.0,
+                "backlog": self.queue.qsize(),
+                "busy": self.busy,
+            }
+
+
+class Pipeline:
+    """
+    Stages connected by bounded queues, each running its own worker threads.
+    `run(items)` feeds `items` to the first stage and returns once every
+    stage has drained, printing per-stage throughput and backlog every
+    PROGRESS_SECONDS. If a stage raises, it and the stages before it drain
+    their remaining items without processing them; later stages still
+    finish what they already received (so it can be checkpointed). `run`
+    then re-raises the first error.
+    """
+
+    def __init__(self, stages: list, progress_seconds: float = PROGRESS_SECONDS):
+        self.stages = stages
+        self.progress_seconds = progress_seconds
+        self.error = None
+        self.failed_stage = None
+        self.started = None
+        self._lock = threading.Lock()
+
+    def run(self, items):
+        self.started = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._work, args=(i,), name=f"ingest-{stage.name}-{n}", daemon=True)
+            for i, stage in enumerate(self.stages)
+            for n in range(stage.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        stop = threading.Event()
+        reporter = threading.Thread(target=self._report, args=(stop,), name="ingest-progress", daemon=True)
+        reporter.start()
+
+        first = self.stages[0]
+        for item in items:
+            if self.error is not None:
+                break
+            first.queue.put(item)
+        for _ in range(first.workers):
+            first.queue.put(_DONE)
+        for thread in threads:
+            thread.join()
+        stop.set()
+        reporter.join()
+        self.print_progress()
+        if self.error is not None:
+            raise self.error
+
+    def _emitter(self, index: int):
+        if index + 1 == len(self.stages):
+            return lambda result: None
+        stage, target = self.stages[index], self.stages[index + 1].queue
+
+        def emit(result):
+            with stage._lock:
+                stage.emitted += 1
+            target.put(result)
+        return emit
+
+    def _work(self, index: int):
+        stage = self.stages[index]
+        emit = self._emitter(index)
+        while True:
+            item = stage.queue.get()
+            if item is _DONE:
+                break
+            if self.failed_stage is not None and index <= self.failed_stage:
+                continue  # drain, so upstream stages never block on a full queue
+            with stage._lock:
+                stage.busy += 1
+            try:
+                stage.fn(item, emit)
+            except Exception as e:
+                self._fail(index, e)
+            finally:
+                with stage._lock:
+                    stage.busy -= 1
+                    stage.processed += 1
+
+        with stage._lock:
+            stage._finished_workers += 1
+            last = stage._finished_workers == stage.workers
+        if not last:
+            return
+        # Last worker out flushes the stage and closes the next one
+        if stage.flush is not None and self.failed_stage is None:
+            try:
+                stage.flush(emit)
+            except Exception as e:
+                self._fail(index, e)
+        if index + 1 < len(self.stages):
+            following = self.stages[index + 1]
+            for _ in range(following.workers):
+                following.queue.put(_DONE)
+
+    def _fail(self, index: int, error: Exception):
+        print(f"❌ Stage '{self.stages[index].name}' failed: {error}")
+        with self._lock:
+            if self.error is None:
+                self.error = error
+            self.failed_stage = max(index, self.failed_stage if self.failed_stage is not None else index)
+
+    def _report(self, stop: threading.Event):
+        while not stop.wait(self.progress_seconds):
+            self.print_progress()
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {stage.name: stage.stats(elapsed) for stage in self.stages}
+
+    def print_progress(self):
+        elapsed = time.perf_counter() - self.started
+        parts = [
+            f"{name} {s['processed']} ({s['per_sec']}/s, backlog {s['backlog']})"
+            for name, s in self.stats().items()
+        ]
+        print(f"📊 {elapsed:5.0f}s  " + " | ".join(parts))
+
+
+class Checkpoint:
+    """
+    Progress of an ingest run, saved as JSON so an interrupted run resumes
+    where it stopped: the pages discovered and the pages whose chunks are
+    all embedded (their vectors are in the embedding cache). A checkpoint
+    written for another scope (other --product / --version) is ignored.
+    """
+
+    def __init__(self, path: str, scope):
+        self.path = path
+        self.scope = scope
+        self.discovered = []
+        self.discovery_complete = False
+        self.done = set()
+        self._lock = threading.Lock()
+
+    def load(self) -> bool:
+        """Restore a matching checkpoint; True if there was one."""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("scope") != self.scope:
+            print(f"⚠️ Ignoring checkpoint {self.path}: written for scope {data.get('scope')}")
+            return False
+        self.discovered = data.get("discovered", [])
+        self.discovery_complete = data.get("discovery_complete", False)
+        self.done = set(data.get("done", []))
+        return True
+
+    def mark_done(self, url: str):
+        with self._lock:
+            self.done.add(url)
+
+    def save(self, discovered, discovery_complete: bool):
+        with self._lock:
+            data = {
+                "scope": self.scope,
+                "saved_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "discovered": sorted(discovered),
+                "discovery_complete": discovery_complete,
+                "done": sorted(self.done),
+            }
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_file = f"{self.path}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_file, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
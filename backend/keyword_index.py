@@ -0,0 +1,129 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+
+# Files written next to the vector store of a generation (rows match the store's rows):
+#   bm25_terms.json     term -> [postings offset, document frequency], plus BM25 parameters
+#   bm25_postings.npy   int32 row ids, one ascending run per term
+#   bm25_tf.npy         uint16 term frequency for each posting
+#   bm25_doclen.npy     int32 token count of each row
+TERMS_FILE = "bm25_terms.json"
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Keeps exact tokens like "hysecure", "443", "7.2", "error-1020", "max_sessions" whole
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._-][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> list:
+    """Lowercased word tokens; compound tokens are also indexed by their parts."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(re.split(r"[._-]", token))
+    return tokens
+
+
+def has_keyword_index(path: str) -> bool:
+    return os.path.exists(os.path.join(path, TERMS_FILE))
+
+
+def write_keyword_index(path: str, texts):
+    """Build the BM25 inverted index for the iterable `texts` (row i = i-th text) under `path`."""
+    postings = {}
+    doclen = []
+    for row, text in enumerate(texts):
+        counts = Counter(tokenize(text))
+        doclen.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((row, tf))
+    doclen = np.asarray(doclen, dtype=np.int32)
+
+    terms = {}
+    rows, tfs = [], []
+    for term in sorted(postings):
+        entries = postings[term]
+        terms[term] = [len(rows), len(entries)]
+        rows.extend(row for row, _ in entries)
+        tfs.extend(min(tf, 65535) for _, tf in entries)
+
+    np.save(os.path.join(path, "bm25_postings.npy"), np.asarray(rows, dtype=np.int32))
+    np.save(os.path.join(path, "bm25_tf.npy"), np.asarray(tfs, dtype=np.uint16))
+    np.save(os.path.join(path, "bm25_doclen.npy"), doclen)
+    meta = {
+        "k1": BM25_K1,
+        "b": BM25_B,
+        "count": len(doclen),
+        "avgdl": float(doclen.mean()) if len(doclen) else 0.0,
+        "terms": terms,
+    }
+    with open(os.path.join(path, TERMS_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, separators=(",", ":"))
+
+
+class KeywordIndex:
+    """
+    Read-only BM25 index over the rows of a vector store.
+
+    Postings are plain integer arrays (memory-mapped), sorted by row, so
+    restricting a search to a product's contiguous row range is a binary
+    search inside each posting list.
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, TERMS_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.k1 = meta["k1"]
+        self.b = meta["b"]
+        self.count = meta["count"]
+        self.avgdl = meta["avgdl"] or 1.0
+        self.terms = meta["terms"]
+        self.postings = np.load(os.path.join(path, "bm25_postings.npy"), mmap_mode="r")
+        self.tf = np.load(os.path.join(path, "bm25_tf.npy"), mmap_mode="r")
+        # Per-row length normalisation of the BM25 denominator, computed once
+        doclen = np.load(os.path.join(path, "bm25_doclen.npy"))
+        self._norm = (self.k1 * (1 - self.b + self.b * doclen / self.avgdl)).astype(np.float32)
+
+    def search(self, query: str, k: int, start: int = 0, end: int = None):
+        """Top-k rows in [start, end) by BM25 score: (row ids, scores), best first."""
+        end = self.count if end is None else end
+        scores = np.zeros(end - start, dtype=np.float32)
+        for term in set(tokenize(query)):
+            entry = self.terms.get(term)
+            if entry is None:
+                continue
+            offset, df = entry
+            rows = self.postings[offset:offset + df]
+            lo, hi = np.searchsorted(rows, [start, end])
+            if lo == hi:
+                continue
+            rows = rows[lo:hi]
+            tf = self.tf[offset + lo:offset + hi].astype(np.float32)
+            idf = math.log(1 + (self.count - df + 0.5) / (df + 0.5))
+            scores[rows - start] += idf * tf * (self.k1 + 1) / (tf + self._norm[rows])
+
+        hits = np.flatnonzero(scores)
+        if not len(hits):
+            return [], []
+        top = hits[np.argsort(-scores[hits], kind="stable")[:k]]
+        return [int(start + i) for i in top], [float(scores[i]) for i in top]
+
+
+def reciprocal_rank_fusion(rankings: list, weights: list, rrf_k: int = 60) -> list:
+    """
+    Merge ranked lists of row ids: score(row) = sum(weight / (rrf_k + rank)).
+    Returns rows ordered by fused score, best first.
+    """
+    fused = {}
+    for ranking, weight in zip(rankings, weights):
+        if weight <= 0:
+            continue
+        for rank, row in enumerate(ranking, start=1):
+            fused[row] = fused.get(row, 0.0) + weight / (rrf_k + rank)
+    return sorted(fused, key=fused.get, reverse=True)
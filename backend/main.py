@@ -1,18 +1,70 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import json
 import os
+import time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
-from backend.rag import get_rag_answer
+from backend.rag import (
+    aget_rag_answer, astream_rag_answer, detect_product, warm_up,
+    get_batcher_stats, get_faq_stats, get_query_cache_stats,
+)
+from backend.cache import get_answer_cache, normalize_question
+from backend.metrics import get_metrics, inc, observe
+from backend.product_definitions import PRODUCT_DEFINITIONS
+from backend.concurrency import get_ask_flight, get_rag_limiter, OverloadedError
 from admin.admin_api import router as admin_router
 from admin.usage_logger import log_usage, log_feedback
+from admin.log_writer import get_log_writer
+
+
+# Load model + index (and run a warm-up query) at boot; /readyz stays 503 until done
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") == "1"
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "30"))
+
+_readiness = {"ready": not WARMUP_ON_STARTUP, "stages": {}, "error": None}
+
+
+async def _warm_up():
+    """Warm up in a worker thread so the server answers /healthz meanwhile; retry until it succeeds."""
+    while True:
+        started = time.perf_counter()
+        try:
+            stages = await asyncio.to_thread(warm_up)
+        except Exception as e:
+            _readiness["error"] = str(e)
+            print(f"⚠️ Warm-up failed, retrying in {WARMUP_RETRY_SECONDS:.0f}s: {e}")
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+            continue
+        stages["total"] = round(time.perf_counter() - started, 3)
+        _readiness.update(ready=True, stages=stages, error=None)
+        print("🔥 Warm-up complete: " + ", ".join(
+            f"{name} {value:.2f}s" if isinstance(value, float) else f"{name}: {value}" for name, value in stages.items()
+        ))
+        return
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    writer = get_log_writer()
+    writer.start()
+    warmup_task = asyncio.create_task(_warm_up()) if WARMUP_ON_STARTUP else None
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    # Flush queued usage/feedback events before the process exits
+    writer.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,30 +76,31 @@ app.add_middleware(
 
 class Question(BaseModel):
     question: str
+    # Optional PRODUCT_DEFINITIONS key / release, e.g. "hyworks" / "3.6";
+    # default: named in the question, else the product's latest release
+    product: Optional[str] = None
+    version: Optional[str] = None
 
 class Feedback(BaseModel):
     response_id: str
-    feedback: str  
+    feedback: str
 
-@app.post("/ask")
-def ask_question(q: Question, request: Request):
-    try:
-        answer, resolved_product, confidence_score = get_rag_answer(q.question)
-    except Exception as e:
-        # Check for authentication error (string matching since we might not import the specific exception class)
-        error_msg = str(e).lower()
-        if "authentication" in error_msg or "api key" in error_msg or "401" in error_msg:
-             return {"answer": "⚠️ **Authentication Error:** Invalid OpenAI API Key. Please check your `.env` file.", "response_id": "error-auth"}
-        
-        print(f"RAG Error: {e}")
-        return {"answer": "⚠️ **System Error:** An error occurred while processing your request.", "response_id": "error-sys"}
 
+def _error_response(e: Exception) -> dict:
+    # Check for authentication error (string matching since we might not import the specific exception class)
+    error_msg = str(e).lower()
+    if "authentication" in error_msg or "api key" in error_msg or "401" in error_msg:
+         return {"answer": "⚠️ **Authentication Error:** Invalid OpenAI API Key. Please check your `.env` file.", "response_id": "error-auth"}
+
+    print(f"RAG Error: {e}")
+    return {"answer": "⚠️ **System Error:** An error occurred while processing your request.", "response_id": "error-sys"}
+
+
+def _record_usage(question: str, resolved_product, confidence_score, request: Request) -> str:
     #Detect product
-    q_lower = q.question.lower()
-    if "hyworks" in q_lower:
-        product = "HyWorks"
-    elif "hysecure" in q_lower:
-        product = "HySecure"
+    product_key = detect_product(question) or resolved_product
+    if product_key in PRODUCT_DEFINITIONS:
+        product = PRODUCT_DEFINITIONS[product_key]["name"]
     else:
         product = resolved_product.capitalize() if resolved_product else "Unknown"
 
@@ -55,17 +108,184 @@ def ask_question(q: Question, request: Request):
 
     #LOG TO CSV and get response_id
     try:
-        response_id = log_usage(
-            question=q.question,
+        return log_usage(
+            question=question,
             product=product,
             ip=ip,
             confidence_score=confidence_score
         )
     except:
-        response_id = "log-failed"
+        return "log-failed"
+
+
+def _check_release(q: Question):
+    if q.product is not None and q.product.lower() not in PRODUCT_DEFINITIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown product '{q.product}' (expected one of {', '.join(PRODUCT_DEFINITIONS)})",
+        )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _overloaded() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy, please retry shortly.",
+        headers={"Retry-After": "1"},
+    )
+
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: model and index are loaded and the warm-up query has run."""
+    if _readiness["ready"]:
+        return {"status": "ready", "stages": _readiness["stages"]}
+    return JSONResponse(
+        status_code=503,
+        content={"status": "warming_up", "error": _readiness["error"]},
+    )
+
+
+def _metric_gauges() -> list:
+    """Point-in-time values from the limiter, caches, batchers and log writer for /metrics."""
+    limiter = get_rag_limiter().stats()
+    flight = get_ask_flight().stats()
+    writer = get_log_writer().stats()
+    gauges = [
+        ("rag_active_requests", "Requests holding a RAG slot.", {}, limiter["active"]),
+        ("rag_waiting_requests", "Requests queued for a RAG slot.", {}, limiter["waiting"]),
+        ("rag_inflight_questions", "Distinct questions being answered by /ask.", {}, flight["inflight"]),
+        ("log_queue_depth", "Usage events waiting to be written.", {}, writer["queue_depth"]),
+        ("ready", "1 once startup warm-up has completed.", {}, int(_readiness["ready"])),
+    ]
+    caches = {"answer": get_answer_cache().stats(), **get_query_cache_stats()}
+    for name, stats in caches.items():
+        if "entries" in stats:
+            gauges.append(("cache_entries", "Entries per cache.", {"cache": name}, stats["entries"]))
+        else:
+            # Shared caches count writes for the live index version, not live entries
+            gauges.append(("cache_fills", "Fills per shared cache for the live index version.", {"cache": name}, stats["fills"]))
+        gauges.append(("cache_hit_ratio", "Hit rate per cache since start.", {"cache": name}, stats["hit_rate"]))
+    for name, stats in get_batcher_stats().items():
+        gauges.append(("batch_size_avg", "Average micro-batch size.", {"batcher": name}, stats["avg_batch_size"]))
+    faq = get_faq_stats()
+    gauges.append(("faq_entries", "Precomputed FAQ answers.", {}, faq["entries"]))
+    gauges.append(("faq_routed_ratio", "Share of questions answered from the FAQ since start.", {}, faq["routed_ratio"]))
+    return gauges
+
+
+def _metric_counters() -> list:
+    """Totals kept by the limiter and log writer, exported as counters for /metrics."""
+    rejected = get_rag_limiter().stats()["rejected"]
+    writer = get_log_writer().stats()
+    return [
+        ("rag_rejected_requests_total", "Requests rejected as overloaded since start.", {}, rejected),
+        ("log_dropped_events_total", "Usage events dropped because the queue was full.", {}, writer["dropped"]),
+        ("log_failed_events_total", "Usage events lost after every write attempt failed.", {}, writer["failed"]),
+    ]
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of stage latencies, counters and gauges."""
+    return PlainTextResponse(
+        get_metrics().render(_metric_gauges(), _metric_counters()),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@app.post("/ask")
+async def ask_question(q: Question, request: Request):
+    _check_release(q)
+    product = q.product.lower() if q.product else None
+    started = time.perf_counter()
+
+    async def answer_question():
+        async with get_rag_limiter():
+            return await aget_rag_answer(q.question, product, q.version)
+
+    try:
+        # Identical questions in flight share one RAG run (and one slot); each caller still gets its own response_id
+        key = (normalize_question(q.question), product, q.version)
+        (answer, resolved_product, confidence_score), shared = await get_ask_flight().do(key, answer_question)
+        if shared:
+            inc("coalesced_requests_total", endpoint="/ask")
+    except OverloadedError:
+        inc("requests_total", endpoint="/ask", status="overloaded")
+        raise _overloaded()
+    except Exception as e:
+        inc("requests_total", endpoint="/ask", status="error")
+        inc("errors_total", stage="ask")
+        return _error_response(e)
+
+    response_id = _record_usage(q.question, resolved_product, confidence_score, request)
+
+    observe("request_ask", time.perf_counter() - started)
+    inc("requests_total", endpoint="/ask", status="ok")
     return {"answer": answer, "response_id": response_id}
 
+@app.post("/ask/stream")
+async def ask_question_stream(q: Question, request: Request):
+    """
+    Server-sent events variant of /ask.
+    Emits `token` events ({"text": ...}) while the LLM generates, then one
+    `done` event with the final answer, sources, confidence and response_id
+    (or an `error` event shaped like the /ask error response).
+    """
+    _check_release(q)
+    product = q.product.lower() if q.product else None
+    started = time.perf_counter()
+
+    async def events():
+        async with get_rag_limiter():
+            yield ""  # slot acquired; released when the stream ends or is dropped
+            try:
+                result = None
+                async for kind, payload in astream_rag_answer(q.question, product, q.version):
+                    if kind == "token":
+                        yield _sse("token", {"text": payload})
+                    else:
+                        result = payload
+            except Exception as e:
+                inc("requests_total", endpoint="/ask/stream", status="error")
+                inc("errors_total", stage="ask_stream")
+                yield _sse("error", _error_response(e))
+                return
+
+        response_id = _record_usage(q.question, result["product"], result["confidence"], request)
+        yield _sse("done", {
+            "answer": result["answer"],
+            "sources": result["sources"],
+            "version": result.get("version"),
+            "confidence": result["confidence"],
+            "response_id": response_id,
+        })
+        observe("request_ask_stream", time.perf_counter() - started)
+        inc("requests_total", endpoint="/ask/stream", status="ok")
+
+    # Acquire the concurrency slot before the response starts so overload is a plain 503
+    stream = events()
+    try:
+        await stream.__anext__()
+    except OverloadedError:
+        inc("requests_total", endpoint="/ask/stream", status="overloaded")
+        raise _overloaded()
+
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.post("/feedback")
 def submit_feedback(fb: Feedback):
     """Endpoint to receive user feedback"""
@@ -0,0 +1,189 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# CONFIGURATION
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRIC_PREFIX = "accops"
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+COUNTER_HELP = {
+    "requests_total": "Requests by endpoint and outcome.",
+    "coalesced_requests_total": "Requests answered by an identical in-flight request.",
+    "errors_total": "Errors by stage.",
+    "cache_lookups_total": "Cache lookups by cache and result.",
+    "answers_total": "Answers by path (faq, answer_cache, rag, no_docs).",
+    "llm_tokens_total": "OpenAI tokens by kind.",
+    "context_tokens_total": "Documentation tokens sent to the LLM.",
+    "context_tokens_saved_total": "Tokens saved vs. naive 800-char chunks.",
+}
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram (Prometheus semantics). Recording is a
+    bisect plus two increments under a lock; percentiles are interpolated
+    from the buckets.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.count, self.sum
+
+    def percentile(self, q: float, snapshot=None) -> float:
+        counts, count, _ = snapshot or self.snapshot()
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Stage latency histograms and labelled counters, rendered as Prometheus text."""
+
+    def __init__(self):
+        self.histograms = {}  # stage -> Histogram
+        self.counters = {}  # (name, sorted label items) -> value
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, Histogram())
+        histogram.observe(seconds)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+
+    def summary(self) -> dict:
+        """Per-stage count / mean / p50 / p95 / p99 in milliseconds, plus counters."""
+        stages = {}
+        for stage, histogram in sorted(self.histograms.items()):
+            snapshot = histogram.snapshot()
+            _, count, total = snapshot
+            stages[stage] = {
+                "count": count,
+                "mean_ms": round(total / count * 1000, 2) if count else 0.0,
+                "p50_ms": round(histogram.percentile(0.50, snapshot) * 1000, 2),
+                "p95_ms": round(histogram.percentile(0.95, snapshot) * 1000, 2),
+                "p99_ms": round(histogram.percentile(0.99, snapshot) * 1000, 2),
+            }
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+        return {"enabled": METRICS_ENABLED, "stages": stages, "counters": counters}
+
+    def render(self, gauges: list = (), totals: list = ()) -> str:
+        """
+        Prometheus text exposition. `gauges` and `totals` (counters) are extra
+        (name, help, labels, value) samples kept elsewhere, e.g. by the
+        limiter; total names end in `_total`.
+        """
+        lines = []
+        name = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines.append(f"# HELP {name} Time spent per request stage.")
+        lines.append(f"# TYPE {name} histogram")
+        for stage, histogram in sorted(self.histograms.items()):
+            counts, count, total = histogram.snapshot()
+            cumulative = 0
+            for bound, n in zip(list(histogram.buckets) + ["+Inf"], counts):
+                cumulative += n
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+        declared = set()
+        for (counter, labels), value in counters:
+            full = f"{METRIC_PREFIX}_{counter}"
+            if full not in declared:
+                declared.add(full)
+                lines.append(f"# HELP {full} {COUNTER_HELP.get(counter, counter)}")
+                lines.append(f"# TYPE {full} counter")
+            lines.append(f"{full}{_labels(labels)} {value}")
+
+        samples = [(sample, "counter") for sample in totals] + [(sample, "gauge") for sample in gauges]
+        for (metric, help_text, labels, value), kind in samples:
+            full = f"{METRIC_PREFIX}_{metric}"
+            if full not in declared:
+                declared.add(full)
+                lines.append(f"# HELP {full} {help_text}")
+                lines.append(f"# TYPE {full} {kind}")
+            lines.append(f"{full}{_labels(tuple(sorted(labels.items())))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(items) -> str:
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    return _registry
+
+
+@contextmanager
+def timed(stage: str):
+    """Record the duration of the block under `stage`; an exception also counts an error for the stage."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        _registry.inc("errors_total", stage=stage)
+        raise
+    finally:
+        _registry.observe(stage, time.perf_counter() - started)
+
+
+def observe(stage: str, seconds: float):
+    if METRICS_ENABLED:
+        _registry.observe(stage, seconds)
+
+
+def inc(name: str, amount: float = 1, **labels):
+    if METRICS_ENABLED:
+        _registry.inc(name, amount, **labels)
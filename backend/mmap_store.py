@@ -0,0 +1,355 @@
+import json
+import mmap
+import os
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+from backend.ann_index import ANN_FILE, AnnIndex, normalize_config, resolve_config, write_ann_index
+from backend.keyword_index import KeywordIndex, has_keyword_index, reciprocal_rank_fusion, write_keyword_index
+
+
+# On-disk layout of one index generation (no pickle anywhere):
+#   header.json   format name + version, dim, count, metric, model, product / release row ranges
+#   vectors.npy   float32 [count, dim], memory-mapped read-only
+#   norms.npy     float32 [count] squared L2 norms of the vectors
+#   offsets.npy   uint64 [count + 1] byte offsets of each record in chunks.bin
+#   chunks.bin    concatenated UTF-8 JSON records {"id", "text", "metadata"}
+#   bm25_*        keyword index over the same rows (see keyword_index.py)
+#   ann.faiss     optional approximate index over the vectors (see ann_index.py)
+# Rows are grouped by product (metadata "module") and within it by release
+# (metadata "version"), so every product and every "product@version" is one
+# contiguous row range and a product or release search is a search over a slice.
+FORMAT_NAME = "accops-mmap-store"
+FORMAT_VERSION = 1
+HEADER_FILE = "header.json"
+# Hybrid search fuses this many candidates per k from each retriever
+HYBRID_CANDIDATE_FACTOR = 3
+RRF_K = 60
+# Rows are appended to staging files while a store is written, then grouped by
+# partition and copied into vectors.npy / chunks.bin this many rows at a time
+STAGED_VECTORS = "vectors.staging"
+STAGED_CHUNKS = "chunks.staging"
+COPY_BLOCK_ROWS = 4096
+
+
+def is_mmap_store(path: str) -> bool:
+    return os.path.exists(os.path.join(path, HEADER_FILE))
+
+
+def requested_ann_config(path: str) -> dict:
+    """ANN configuration the store at `path` was built with (before fitting it to the corpus)."""
+    with open(os.path.join(path, HEADER_FILE), encoding="utf-8") as f:
+        return json.load(f).get("ann", {}).get("requested", normalize_config(None))
+
+
+class MmapVectorStore:
+    """
+    Read-only vector store backed by memory-mapped files.
+
+    Opening a store only parses the header and maps the files, so load time
+    does not grow with the corpus, and all uvicorn workers share the same
+    physical pages through the OS page cache. Search is exact unless the
+    generation was built with an ANN index (header "ann"); either way the
+    returned distances are exact squared L2, matching FAISS IndexFlatL2.
+    `ef_search` / `nprobe` tune the ANN index, if any.
+    """
+
+    def __init__(self, path: str, ef_search: int = None, nprobe: int = None):
+        self.path = path
+        with open(os.path.join(path, HEADER_FILE), encoding="utf-8") as f:
+            self.header = json.load(f)
+        if self.header.get("format") != FORMAT_NAME:
+            raise ValueError(f"{path} is not an {FORMAT_NAME} directory")
+        if self.header.get("version") != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported {FORMAT_NAME} version {self.header.get('version')} in {path} "
+                f"(expected {FORMAT_VERSION}); re-run `python backend/ingest.py`"
+            )
+
+        self.count = self.header["count"]
+        self.dim = self.header["dim"]
+        self.partitions = {p: tuple(r) for p, r in self.header["partitions"].items()}
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.norms = np.load(os.path.join(path, "norms.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self._chunks_file = open(os.path.join(path, "chunks.bin"), "rb")
+        self._chunks = (
+            mmap.mmap(self._chunks_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.count else b""
+        )
+        # Generations written before the keyword index existed are vector-only
+        self.keywords = KeywordIndex(path) if has_keyword_index(path) else None
+        ann = self.header.get("ann", {})
+        self.ann = AnnIndex(path, ann, ef_search, nprobe) if ann.get("type", "flat") != "flat" else None
+
+    def has_product(self, product) -> bool:
+        return bool(product) and product.lower() in self.partitions
+
+    def record(self, row: int) -> dict:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(self._chunks[start:end].decode("utf-8"))
+
+    def document(self, row: int) -> Document:
+        rec = self.record(row)
+        return Document(page_content=rec["text"], metadata=rec["metadata"], id=rec["id"])
+
+    def search(self, query_vector, k: int, product=None, query_text: str = None, keyword_weight: float = 0.0) -> list:
+        """
+        Top-k (Document, distance) pairs, restricted to `product`'s rows when it has any.
+
+        With `query_text` and a `keyword_weight` > 0, vector and BM25 rankings
+        are merged by weighted reciprocal-rank fusion (vector weight is
+        1 - keyword_weight). Results are in fused order; the distance is
+        always the vector L2 distance of that chunk.
+        """
+        return self.search_batch([{
+            "query_vector": query_vector,
+            "k": k,
+            "product": product,
+            "query_text": query_text,
+            "keyword_weight": keyword_weight,
+        }])[0]
+
+    def search_batch(self, requests: list) -> list:
+        """Several searches (dicts of `search()` arguments); one result list per request."""
+        return [self.documents(rows, distances) for rows, distances in self.search_rows_batch(requests)]
+
+    def search_rows_batch(self, requests: list) -> list:
+        """
+        Run several searches together: one matrix product per product range
+        scores its queries against that range's rows only (or one ANN search
+        per range). Returns (row ids, distances) per request; turn them into
+        Documents with `documents()`.
+        """
+        if not requests:
+            return []
+        queries = np.asarray([r["query_vector"] for r in requests], dtype=np.float32)
+        ranges = [self._row_range(r.get("product")) for r in requests]
+        counts = [self._candidates(**r) for r in requests]
+
+        nearest = [None] * len(requests)
+        if self.ann is None:
+            groups = {}
+            for j in range(len(requests)):
+                groups.setdefault(ranges[j], []).append(j)
+            for (start, end), members in groups.items():
+                products = self.vectors[start:end] @ queries[members].T
+                query_norms = np.einsum("ij,ij->i", queries[members], queries[members])
+                norms = self.norms[start:end]
+                for i, j in enumerate(members):
+                    nearest[j] = _smallest(norms - 2.0 * products[:, i] + query_norms[i], counts[j], start)
+        else:
+            groups = {}
+            for j in range(len(requests)):
+                groups.setdefault((*ranges[j], counts[j]), []).append(j)
+            for (start, end, count), members in groups.items():
+                found = self.ann.search(queries[members], count, start, end)
+                for j, rows in zip(members, found):
+                    nearest[j] = self._rerank(queries[j], rows)[:count]
+
+        return [self._top_k(queries[j], nearest[j], *ranges[j], **r) for j, r in enumerate(requests)]
+
+    def _row_range(self, product) -> tuple:
+        if self.has_product(product):
+            return self.partitions[product.lower()]
+        return 0, self.count
+
+    def _hybrid(self, query_text: str = None, keyword_weight: float = 0.0, **_) -> bool:
+        return bool(query_text) and keyword_weight > 0 and self.keywords is not None
+
+    def _candidates(self, k: int, **request) -> int:
+        return k * HYBRID_CANDIDATE_FACTOR if self._hybrid(**request) else k
+
+    def _distances(self, query, rows) -> np.ndarray:
+        """Exact squared L2 distances from `query` to `rows`."""
+        rows = np.asarray(rows, dtype=np.int64)
+        return self.norms[rows] - 2.0 * (self.vectors[rows] @ query) + float(query @ query)
+
+    def _rerank(self, query, rows) -> list:
+        if len(rows) < 2:
+            return rows
+        return [rows[i] for i in np.argsort(self._distances(query, rows), kind="stable")]
+
+    def _top_k(self, query, rows, start: int, end: int, k: int, query_text: str = None, keyword_weight: float = 0.0, **_) -> tuple:
+        if self._hybrid(query_text, keyword_weight):
+            keyword_rows, _ = self.keywords.search(query_text, k * HYBRID_CANDIDATE_FACTOR, start, end)
+            rows = reciprocal_rank_fusion(
+                [rows, keyword_rows], [1.0 - keyword_weight, keyword_weight], RRF_K
+            )
+        rows = rows[:k]
+        return rows, [max(float(d), 0.0) for d in self._distances(query, rows)] if rows else []
+
+    def documents(self, rows, distances) -> list:
+        return [(self.document(int(row)), float(dist)) for row, dist in zip(rows, distances)]
+
+    def iter_records(self):
+        """(row, record, vector) for every chunk, in row order."""
+        for row in range(self.count):
+            yield row, self.record(row), self.vectors[row]
+
+    def close(self):
+        if self.count:
+            self._chunks.close()
+        self._chunks_file.close()
+
+
+def _smallest(dist, k: int, start: int) -> list:
+    """Rows with the k smallest distances, closest first; dist[i] belongs to row start + i."""
+    k = min(k, len(dist))
+    if k <= 0:
+        return []
+    top = np.argpartition(dist, k - 1)[:k]
+    return [int(start + i) for i in top[np.argsort(dist[top])]]
+
+
+def _partition_keys(metadata: dict) -> tuple:
+    """(product, product@version) partition names of a chunk, e.g. ("hyworks", "hyworks@3.6")."""
+    product = (metadata.get("module", "") or "").lower()
+    return product, f"{product}@{metadata.get('version') or ''}".lower()
+
+
+class StoreWriter:
+    """
+    Builds a store at `path` one record at a time, so the chunk texts and
+    vectors never have to be in memory together: `add()` / `copy()` append
+    each row to staging files, and `close()` groups the staged rows by
+    product (metadata "module") and release (metadata "version"), copying
+    them block by block into the store files. `ann` selects an approximate
+    index ({"type": "hnsw", ...}, see ann_index.py); the default is exact
+    search only.
+    """
+
+    def __init__(self, path: str, model_name: str = None, ann: dict = None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.model_name = model_name
+        self.ann = ann
+        self.count = 0
+        self.dim = None
+        self._vectors = open(os.path.join(path, STAGED_VECTORS), "wb")
+        self._chunks = open(os.path.join(path, STAGED_CHUNKS), "wb")
+        self._offsets = [0]
+        # Partition group of each staged row; groups are (partition keys, has version)
+        self._groups = {}
+        self._rows = []
+
+    def add(self, chunk_id: str, text: str, metadata: dict, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        if self.dim is None:
+            self.dim = len(vector)
+        elif len(vector) != self.dim:
+            raise ValueError(f"Vector of dimension {len(vector)} added to a store of dimension {self.dim}")
+        data = json.dumps({"id": chunk_id, "text": text, "metadata": metadata}, ensure_ascii=False).encode("utf-8")
+        self._vectors.write(vector.tobytes())
+        self._chunks.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+        group = (_partition_keys(metadata), bool(metadata.get("version")))
+        self._rows.append(self._groups.setdefault(group, len(self._groups)))
+        self.count += 1
+
+    def copy(self, store: MmapVectorStore, row: int, metadata: dict = None):
+        """Append row `row` of `store` without re-embedding it, optionally with new `metadata`."""
+        record = store.record(row)
+        self.add(record["id"], record["text"], record["metadata"] if metadata is None else metadata, store.vectors[row])
+
+    def close(self) -> int:
+        """Write the store files and remove the staging files. Returns the number of rows."""
+        self._vectors.close()
+        self._chunks.close()
+        count, dim = self.count, self.dim or 0
+        groups = sorted(self._groups, key=lambda group: group[0])
+        rank = np.zeros(len(groups), dtype=np.int64)
+        for position, group in enumerate(groups):
+            rank[self._groups[group]] = position
+        rows = np.asarray(self._rows, dtype=np.int64)
+        order = np.argsort(rank[rows], kind="stable")
+
+        partitions = {}
+        row = 0
+        for ((product, release), versioned), size in zip(groups, np.bincount(rank[rows], minlength=len(groups))):
+            for partition in (product, release) if versioned else (product,):
+                first, _ = partitions.get(partition, (row, row))
+                partitions[partition] = (first, row + int(size))
+            row += int(size)
+
+        staged_offsets = np.asarray(self._offsets, dtype=np.uint64)
+        offsets = np.zeros(count + 1, dtype=np.uint64)
+        offsets[1:] = np.cumsum(np.diff(staged_offsets)[order])
+        norms = np.zeros(count, dtype=np.float32)
+        if count:
+            staged = np.memmap(os.path.join(self.path, STAGED_VECTORS), dtype=np.float32, mode="r", shape=(count, dim))
+            vectors = np.lib.format.open_memmap(
+                os.path.join(self.path, "vectors.npy"), mode="w+", dtype=np.float32, shape=(count, dim)
+            )
+            for start in range(0, count, COPY_BLOCK_ROWS):
+                end = min(start + COPY_BLOCK_ROWS, count)
+                vectors[start:end] = staged[order[start:end]]
+                norms[start:end] = np.einsum("ij,ij->i", vectors[start:end], vectors[start:end])
+            vectors.flush()
+            del vectors, staged
+        else:
+            np.save(os.path.join(self.path, "vectors.npy"), np.zeros((0, dim), dtype=np.float32))
+        np.save(os.path.join(self.path, "norms.npy"), norms)
+        np.save(os.path.join(self.path, "offsets.npy"), offsets)
+
+        with open(os.path.join(self.path, STAGED_CHUNKS), "rb") as src, \
+                open(os.path.join(self.path, "chunks.bin"), "wb") as dst:
+            staged_chunks = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) if count else b""
+            for row in order:
+                dst.write(staged_chunks[int(staged_offsets[row]):int(staged_offsets[row + 1])])
+            if count:
+                staged_chunks.close()
+        os.remove(os.path.join(self.path, STAGED_VECTORS))
+        os.remove(os.path.join(self.path, STAGED_CHUNKS))
+        self._rows, self._offsets = [], [0]
+
+        write_keyword_index(self.path, self._texts(offsets))
+        ann = resolve_config(self.ann, count, dim)
+        if ann["type"] != "flat":
+            started = time.perf_counter()
+            write_ann_index(self.path, np.load(os.path.join(self.path, "vectors.npy"), mmap_mode="r"), ann)
+            size_mb = os.path.getsize(os.path.join(self.path, ANN_FILE)) / 1e6
+            print(f"🧭 Built {ann['type']} index in {time.perf_counter() - started:.1f}s ({size_mb:.1f} MB)")
+
+        header = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "dim": dim,
+            "count": count,
+            "metric": "l2",
+            "model": self.model_name,
+            "partitions": partitions,
+            "ann": ann,
+        }
+        # Header last: a directory without it is never treated as a complete store
+        with open(os.path.join(self.path, HEADER_FILE), "w", encoding="utf-8") as f:
+            json.dump(header, f, indent=1)
+        return count
+
+    def abort(self):
+        """Stop writing and remove the staging files."""
+        self._vectors.close()
+        self._chunks.close()
+        for name in (STAGED_VECTORS, STAGED_CHUNKS):
+            if os.path.exists(os.path.join(self.path, name)):
+                os.remove(os.path.join(self.path, name))
+
+    def _texts(self, offsets):
+        """Chunk texts of the written store, in row order."""
+        with open(os.path.join(self.path, "chunks.bin"), "rb") as f:
+            if not self.count:
+                return
+            chunks = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            for row in range(self.count):
+                yield json.loads(chunks[int(offsets[row]):int(offsets[row + 1])].decode("utf-8"))["text"]
+            chunks.close()
+
+
+def write_store(path: str, records, model_name: str = None, ann: dict = None):
+    """Write a new store at `path` from (id, text, metadata, vector) records (see StoreWriter)."""
+    writer = StoreWriter(path, model_name, ann)
+    for record in records:
+        writer.add(*record)
+    writer.close()
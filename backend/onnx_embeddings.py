@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from backend.embedding_pipeline import EMBEDDING_MODEL_NAME
+
+
+# CONFIGURATION
+# Query embedding backend used by rag.py: "torch" (sentence-transformers, default) or "onnx"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Exported model: model.onnx (fp32), model_int8.onnx (dynamically quantized), tokenizer.json
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join("vector_store", "onnx", "all-MiniLM-L6-v2"))
+# "int8" (smaller and faster, slightly different vectors) or "fp32" (same vectors as torch)
+ONNX_PRECISION = os.getenv("ONNX_PRECISION", "int8")
+# Intra-op threads per inference; 0 = ONNX Runtime default (all physical cores).
+# With several workers per host, split the cores: cores / workers.
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+ONNX_BATCH_SIZE = 32
+# all-MiniLM-L6-v2 is used by sentence-transformers with 256-token inputs
+MAX_SEQ_LENGTH = 256
+MODEL_FILES = {"fp32": "model.onnx", "int8": "model_int8.onnx"}
+EXPORT_INFO_FILE = "export.json"
+
+
+def export_model(model_name: str = EMBEDDING_MODEL_NAME, output_dir: str = ONNX_MODEL_DIR, quantize: bool = True) -> dict:
+    """
+    Export the transformer of `model_name` from the local Hugging Face cache
+    (no network) to ONNX, plus an int8 dynamically quantized copy. Needs
+    torch and transformers once, at export; serving only needs
+    onnxruntime and tokenizers.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name, local_files_only=True)
+    model = AutoModel.from_pretrained(model_name, local_files_only=True).eval()
+    model.config.return_dict = False  # plain tuple outputs for the exporter
+    tokenizer.save_pretrained(output_dir)  # writes tokenizer.json (fast tokenizer)
+
+    sample = tokenizer(["How do I configure HySecure gateway?"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    axes = {0: "batch", 1: "sequence"}
+    fp32_path = os.path.join(output_dir, MODEL_FILES["fp32"])
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={**{name: axes for name in input_names}, "last_hidden_state": axes},
+            opset_version=14,
+        )
+    print(f"📤 Exported {model_name} to {fp32_path} ({os.path.getsize(fp32_path) / 1e6:.1f} MB)")
+
+    files = {"fp32": MODEL_FILES["fp32"]}
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(output_dir, MODEL_FILES["int8"])
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        files["int8"] = MODEL_FILES["int8"]
+        print(f"🗜️ Quantized to int8: {int8_path} ({os.path.getsize(int8_path) / 1e6:.1f} MB)")
+
+    info = {"model": model_name, "max_seq_length": MAX_SEQ_LENGTH, "inputs": input_names, "files": files}
+    with open(os.path.join(output_dir, EXPORT_INFO_FILE), "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=1)
+    return info
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    all-MiniLM-L6-v2 sentence embeddings on ONNX Runtime, without torch:
+    the same tokenization, mean pooling and L2 normalization as the
+    sentence-transformers model. Loads only from `model_dir` (see
+    `export_model`), so it works offline.
+    """
+
+    def __init__(
+        self,
+        model_dir: str = ONNX_MODEL_DIR,
+        precision: str = ONNX_PRECISION,
+        intra_op_threads: int = ONNX_INTRA_OP_THREADS,
+        batch_size: int = ONNX_BATCH_SIZE,
+    ):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        info_file = os.path.join(model_dir, EXPORT_INFO_FILE)
+        if not os.path.exists(info_file):
+            raise RuntimeError(
+                f"No exported ONNX model in '{model_dir}'. Run `python -m backend.onnx_embeddings export` "
+                "on a machine with the model in its Hugging Face cache."
+            )
+        with open(info_file, encoding="utf-8") as f:
+            info = json.load(f)
+        if precision not in info["files"]:
+            raise ValueError(f"No {precision} model in '{model_dir}' (exported: {', '.join(info['files'])})")
+
+        # Same model, same vector space: the index header keeps the original model name
+        self.model_name = info["model"]
+        self.precision = precision
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=info.get("max_seq_length", MAX_SEQ_LENGTH))
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        # One request at a time per session call; query batching happens upstream (MicroBatcher)
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, info["files"][precision]), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def _embed(self, texts: list) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: inputs[name] for name in self.input_names})[0]
+        # Mean over real tokens, then unit length (the model's Pooling + Normalize modules)
+        mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def embed_documents(self, texts: list) -> list:
+        if not texts:
+            return []
+        vectors = [self._embed(texts[i:i + self.batch_size]) for i in range(0, len(texts), self.batch_size)]
+        return np.vstack(vectors).tolist()
+
+    def embed_query(self, text: str) -> list:
+        return self._embed([text])[0].tolist()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX for EMBEDDING_BACKEND=onnx.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_parser = sub.add_parser("export", help="export (and quantize) the model from the local Hugging Face cache")
+    export_parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    export_parser.add_argument("--output", default=ONNX_MODEL_DIR)
+    export_parser.add_argument("--no-quantize", action="store_true", help="only write the fp32 model")
+    args = parser.parse_args(argv)
+
+    export_model(args.model, args.output, quantize=not args.no_quantize)
+    print("🎉 Done. Check retrieval parity before switching: python benchmarks/embedding_backends.py parity")
+
+
+if __name__ == "__main__":
+    main()
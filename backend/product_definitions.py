@@ -1,5 +1,19 @@
+import re
+
+# One entry per Accops product. The key is matched against questions, "name" is
+# the `module` metadata stored on every indexed chunk, and "versions" maps each
+# documentation release to its root page, crawled by backend/ingest.py. Every
+# chunk is tagged with its release; questions naming no release are answered
+# from "latest". Adding a product or release here is enough for ingestion,
+# product/version detection and per-release retrieval to pick it up.
 PRODUCT_DEFINITIONS = {
     "hyworks": {
+        "name": "HyWorks",
+        "versions": {
+            "3.4 SP2": "https://docs.accops.com/HyWorks34sp2/index.html",
+            "3.6": "https://docs.accops.com/HyWorks36/index.html",
+        },
+        "latest": "3.6",
         "answer": (
             "HyWorks is Accops’ Digital Workspace platform that enables secure access "
             "to applications and desktops, centralized management, and policy-based "
@@ -8,6 +22,11 @@ PRODUCT_DEFINITIONS = {
         "source": "https://docs.accops.com/HyWorks34sp2/content/quickstart/about.html"
     },
     "hysecure": {
+        "name": "HySecure",
+        "versions": {
+            "7.2": "https://docs.accops.com/hysecure_7_2/index.html",
+        },
+        "latest": "7.2",
         "answer": (
             "HySecure is Accops’ Zero Trust Secure Access gateway that provides secure, "
             "policy-based access to applications and desktops using strong authentication "
@@ -16,3 +35,65 @@ PRODUCT_DEFINITIONS = {
         "source": "https://docs.accops.com/hysecure_7_2/index.html"
     }
 }
+
+# "3.4 SP2", "v3.6", "7.2.1" (matched as 7.2); a bare "36" is too ambiguous (ports, error codes)
+VERSION_PATTERN = re.compile(r"(?<![\d.])v?(\d+\.\d+)(?:\s*sp\s*(\d+))?", re.IGNORECASE)
+
+
+def _match_key(match) -> str:
+    return match.group(1) + (f"sp{match.group(2)}" if match.group(2) else "")
+
+
+def _version_key(version: str) -> str:
+    match = VERSION_PATTERN.search(version)
+    return _match_key(match) if match else version.lower().replace(" ", "")
+
+
+def seed_urls(releases=None) -> list:
+    """Documentation roots of every release, or only of the (product, version) pairs in `releases`."""
+    return [
+        url
+        for key, definition in PRODUCT_DEFINITIONS.items()
+        for version, url in definition.get("versions", {}).items()
+        if releases is None or (key, version) in releases
+    ]
+
+
+def latest_version(product):
+    definition = PRODUCT_DEFINITIONS.get(product or "")
+    return definition.get("latest") if definition else None
+
+
+def find_version(product: str, text: str):
+    """Release of `product` named in `text` (e.g. "3.4 sp2" -> "3.4 SP2"), or None."""
+    versions = {_version_key(v): v for v in PRODUCT_DEFINITIONS.get(product or "", {}).get("versions", {})}
+    for match in VERSION_PATTERN.finditer(text):
+        if _match_key(match) in versions:
+            return versions[_match_key(match)]
+    return None
+
+
+def release_for_url(url: str) -> tuple:
+    """
+    (product key, version) for a documentation URL: the release whose root
+    directory contains the URL, else (first product whose key appears in
+    the URL, None), else (None, None).
+    """
+    url_lower = url.lower()
+    for key, definition in PRODUCT_DEFINITIONS.items():
+        for version, seed in definition.get("versions", {}).items():
+            if url_lower.startswith(seed.lower().rsplit("/", 1)[0] + "/"):
+                return key, version
+    for key in PRODUCT_DEFINITIONS:
+        if key in url_lower:
+            return key, None
+    return None, None
+
+
+def product_for_url(url: str):
+    return release_for_url(url)[0]
+
+
+def shard_key(product: str, version: str = None) -> str:
+    """Partition name of a product, or of one of its releases, in the vector store."""
+    return f"{product}@{version}".lower() if version else product.lower()
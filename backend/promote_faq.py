@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+# Allow `python backend/promote_faq.py` as well as `python -m backend.promote_faq`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from admin.usage_store import get_connection, init_store
+from backend.cache import normalize_question
+from backend.faq_router import FAQ_FILE, FaqRouter
+
+
+#CONFIGURATION
+# A question is promoted to the FAQ once it was asked this often, never got a
+# thumbs-down and was answered with at least this average confidence
+FAQ_PROMOTE_MIN_COUNT = int(os.getenv("FAQ_PROMOTE_MIN_COUNT", "10"))
+FAQ_PROMOTE_MIN_CONFIDENCE = float(os.getenv("FAQ_PROMOTE_MIN_CONFIDENCE", "0.8"))
+FAQ_PROMOTE_LIMIT = int(os.getenv("FAQ_PROMOTE_LIMIT", "20"))
+
+
+def frequent_questions(min_count: int, min_confidence: float) -> list:
+    """
+    Questions from the usage store grouped by normalized text, most asked
+    first, that meet the promotion criteria. Each item keeps the most
+    common phrasing as "question" and every phrasing seen as "questions".
+    """
+    init_store()
+    groups = {}
+    rows = get_connection().execute("SELECT question, product, feedback, confidence_score FROM usage_logs")
+    for row in rows:
+        key = normalize_question(row["question"])
+        if not key:
+            continue
+        group = groups.setdefault(key, {"count": 0, "phrasings": {}, "products": {}, "negative": 0, "scores": []})
+        group["count"] += 1
+        group["phrasings"][row["question"]] = group["phrasings"].get(row["question"], 0) + 1
+        product = (row["product"] or "unknown").lower()
+        group["products"][product] = group["products"].get(product, 0) + 1
+        group["negative"] += row["feedback"] == "negative"
+        if row["confidence_score"] is not None:
+            group["scores"].append(row["confidence_score"])
+
+    candidates = []
+    for group in groups.values():
+        confidence = sum(group["scores"]) / len(group["scores"]) if group["scores"] else 0.0
+        if group["count"] < min_count or group["negative"] or confidence < min_confidence:
+            continue
+        phrasings = sorted(group["phrasings"], key=group["phrasings"].get, reverse=True)
+        product = max(group["products"], key=group["products"].get)
+        candidates.append({
+            "question": phrasings[0],
+            "questions": phrasings,
+            "product": None if product == "unknown" else product,
+            "count": group["count"],
+            "avg_confidence": round(confidence, 2),
+        })
+    return sorted(candidates, key=lambda c: c["count"], reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Promote frequent, well-rated questions from the usage log to the FAQ fast path."
+    )
+    parser.add_argument("--min-count", type=int, default=FAQ_PROMOTE_MIN_COUNT)
+    parser.add_argument("--min-confidence", type=float, default=FAQ_PROMOTE_MIN_CONFIDENCE)
+    parser.add_argument("--limit", type=int, default=FAQ_PROMOTE_LIMIT, help="promote at most this many questions")
+    parser.add_argument("--dry-run", action="store_true", help="list candidates without generating answers")
+    args = parser.parse_args(argv)
+
+    # Answers are generated once with the normal RAG pipeline (one LLM call each)
+    from backend import rag
+
+    # Questions whose promoted answer came from an older index are promoted again
+    index_version = rag.get_index_version()
+    router = FaqRouter(FAQ_FILE)
+    candidates = [
+        c for c in frequent_questions(args.min_count, args.min_confidence)
+        if router.match_exact(c["question"], c["product"], index_version) is None
+    ][:args.limit]
+    print(f"📋 {len(candidates)} question(s) to promote (asked ≥ {args.min_count}x, "
+          f"avg confidence ≥ {args.min_confidence}, no negative feedback)")
+    for c in candidates:
+        print(f"   {c['count']:5d}x  {c['question']}")
+    if args.dry_run or not candidates:
+        return
+
+    data = {"entries": []}
+    if os.path.exists(FAQ_FILE):
+        with open(FAQ_FILE, encoding="utf-8") as f:
+            data = json.load(f)
+    # Replace stale promoted answers to the same questions instead of adding duplicates
+    renewed = {normalize_question(q) for c in candidates for q in c["questions"]}
+    data["entries"] = [
+        e for e in data["entries"]
+        if not (e.get("origin") == "promoted" and e.get("index_version") != index_version
+                and renewed & {normalize_question(q) for q in e["questions"]})
+    ]
+
+    promoted = 0
+    for c in candidates:
+        result = rag.get_rag_result(c["question"], c["product"])
+        if not result["sources"]:
+            print(f"⚠️ Skipping '{c['question']}': no documentation found")
+            continue
+        data["entries"].append({
+            "questions": c["questions"],
+            "answer": result["answer"].split(rag.SOURCES_HEADER)[0],
+            "sources": result["sources"],
+            "product": c["product"],
+            "version": result["version"],
+            "confidence": result["confidence"],
+            "origin": "promoted",
+            "count": c["count"],
+            "promoted_at": datetime.now().isoformat(timespec="seconds"),
+            "index_version": index_version,
+        })
+        promoted += 1
+
+    # Written aside and renamed, so a running server never reads a partial file
+    os.makedirs(os.path.dirname(FAQ_FILE) or ".", exist_ok=True)
+    tmp = f"{FAQ_FILE}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, FAQ_FILE)
+    print(f"🎉 Promoted {promoted} question(s) to {FAQ_FILE}; running servers reload it automatically")
+
+
+if __name__ == "__main__":
+    main()
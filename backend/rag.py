@@ -1,21 +1,70 @@
+import asyncio
 import os
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_openai import ChatOpenAI
-from backend.product_definitions import PRODUCT_DEFINITIONS
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from backend.product_definitions import PRODUCT_DEFINITIONS, find_version, latest_version, shard_key
+from backend.cache import get_answer_cache, get_embedding_cache, get_retrieval_cache
+from backend.vector_index import current_generation, current_index_path, load_index
+from backend.batcher import MicroBatcher
+from backend.context_builder import build_context, load_encoding
+from backend.faq_router import FAQ_CONFIDENCE, FAQ_FILE, FaqRouter
+from backend.embedding_pipeline import EMBEDDING_MODEL_NAME
+from backend.onnx_embeddings import EMBEDDING_BACKEND, OnnxEmbeddings
+from backend.metrics import inc, observe, timed
 
 VECTOR_DB_PATH = "vector_store/accops_docs"
+# Threads running the pre-LLM steps on the async path. They mostly wait on
+# the micro-batchers below, so size this like RAG_MAX_CONCURRENCY.
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "16"))
+# How often to look for a newly published index generation
+DB_RELOAD_CHECK_SECONDS = float(os.getenv("DB_RELOAD_CHECK_SECONDS", "30"))
+# Chunks retrieved for general questions / for questions naming a product
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
+PRODUCT_RETRIEVAL_K = int(os.getenv("PRODUCT_RETRIEVAL_K", "8"))
+# Share of the BM25 keyword ranking in hybrid retrieval (0 = vectors only, 1 = keywords only)
+HYBRID_KEYWORD_WEIGHT = float(os.getenv("HYBRID_KEYWORD_WEIGHT", "0.5"))
+# Search effort of an approximate index built with INDEX_TYPE in ingest.py
+# (HNSW candidate list / IVF lists probed; 0 = value stored at build time).
+# Higher is slower and closer to exact; ignored for flat indexes.
+ANN_EF_SEARCH = int(os.getenv("ANN_EF_SEARCH", "0"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "0"))
+# Micro-batching: concurrent questions arriving within QUERY_BATCH_WAIT_MS are
+# embedded in one forward pass and searched with one matrix product
+# (QUERY_BATCH_MAX_SIZE=1 disables batching)
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "16"))
+QUERY_BATCH_WAIT_MS = float(os.getenv("QUERY_BATCH_WAIT_MS", "2"))
+# Question embedded and searched by warm_up() so the first real request is fast
+WARMUP_QUERY = os.getenv("WARMUP_QUERY", "How do I configure HySecure gateway?")
 
 _embeddings = None
 _db = None
+_db_version = None
+_next_reload_check = 0.0
+_db_load_lock = threading.Lock()
+_llm = None
+_faq_router = None
+_retrieval_executor = ThreadPoolExecutor(
+    max_workers=RETRIEVAL_WORKERS, thread_name_prefix="rag-retrieval"
+)
 
 
 def get_embeddings():
     global _embeddings
     if _embeddings is None:
+        if EMBEDDING_BACKEND == "onnx":
+            # ONNX Runtime, no torch import; exported once with `python -m backend.onnx_embeddings export`
+            _embeddings = OnnxEmbeddings()
+            print(f"🧠 Query embeddings: ONNX Runtime ({_embeddings.precision})")
+            return _embeddings
         try:
+            # Imported here: pulls in torch/sentence-transformers, which takes seconds
+            from langchain_huggingface import HuggingFaceEmbeddings
+
             _embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/all-MiniLM-L6-v2"
+                model_name=EMBEDDING_MODEL_NAME
             )
         except Exception as e:
             raise RuntimeError(
@@ -30,62 +79,380 @@ def get_embeddings():
 
 # LOAD VECTOR DATABASE
 def get_db():
-    global _db
-    if _db is None:
-        if not os.path.exists(VECTOR_DB_PATH):
-            raise RuntimeError(
-                f"Vector database not found at '{VECTOR_DB_PATH}'. Run `python backend/ingest.py` to build it."
-            )
-        embeddings = get_embeddings()
-        _db = FAISS.load_local(
-            VECTOR_DB_PATH,
-            embeddings,
-            allow_dangerous_deserialization=True
+    """
+    Live vector index (memory-mapped store, or a legacy FAISS store wrapped
+    in a ProductRetriever). Every DB_RELOAD_CHECK_SECONDS the on-disk version is
+    checked; when ingest has published a new generation it is loaded in the
+    background of the current request and swapped in. Other requests keep
+    using the previous index until the swap, so there is no empty window.
+    """
+    global _db, _db_version, _next_reload_check
+    if _db is not None and time.monotonic() < _next_reload_check:
+        return _db
+
+    if not os.path.exists(VECTOR_DB_PATH):
+        raise RuntimeError(
+            f"Vector database not found at '{VECTOR_DB_PATH}'. Run `python backend/ingest.py` to build it."
         )
+
+    version = get_index_version()
+    _next_reload_check = time.monotonic() + DB_RELOAD_CHECK_SECONDS
+    if _db is not None and version == _db_version:
+        return _db
+
+    # Only one thread loads; the rest keep serving the current index (if any)
+    if not _db_load_lock.acquire(blocking=_db is None):
+        return _db
+    try:
+        if _db is None or version != _db_version:
+            # Mapping the store is near-constant time; pages load on first access
+            db = load_index(current_index_path(VECTOR_DB_PATH), ef_search=ANN_EF_SEARCH, nprobe=ANN_NPROBE)
+            db.index_version = version
+            if _db is not None:
+                print(f"🔄 Reloaded vector database (version {version})")
+            _db, _db_version = db, version
+    finally:
+        _db_load_lock.release()
     return _db
 
+
+def get_retriever():
+    """Product-partitioned search over the live index (the index itself)."""
+    return get_db()
+
+
+def get_index_version():
+    """
+    Version of the on-disk vector store: the live generation name, or for a
+    legacy single-directory index the file mtimes and sizes.
+    Changes whenever `backend/ingest.py` publishes a new index.
+    """
+    generation = current_generation(VECTOR_DB_PATH)
+    if generation is not None:
+        return generation
+
+    version = []
+    for name in ("index.faiss", "index.pkl"):
+        path = os.path.join(VECTOR_DB_PATH, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            version.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+    return "|".join(version) or None
+
+# QUERY MICRO-BATCHING + CACHES
+def _embed_batch(questions: list) -> list:
+    return get_embeddings().embed_documents(questions)
+
+
+def _search_batch(requests: list) -> list:
+    # Requests carry the index they were planned against; during a hot swap
+    # a batch can mix old and new, so search each group on its own index
+    results = [None] * len(requests)
+    groups = {}
+    for i, request in enumerate(requests):
+        groups.setdefault(id(request["store"]), []).append(i)
+    for positions in groups.values():
+        store = requests[positions[0]]["store"]
+        batch = [{k: v for k, v in requests[i].items() if k != "store"} for i in positions]
+        for i, result in zip(positions, store.search_rows_batch(batch)):
+            results[i] = result
+    return results
+
+
+_embed_batcher = MicroBatcher(_embed_batch, QUERY_BATCH_MAX_SIZE, QUERY_BATCH_WAIT_MS, "query-embed-batcher")
+_search_batcher = MicroBatcher(_search_batch, QUERY_BATCH_MAX_SIZE, QUERY_BATCH_WAIT_MS, "query-search-batcher")
+
+
+def _cache_key(question: str) -> str:
+    return " ".join(question.split())
+
+
+def embed_question(question: str) -> np.ndarray:
+    """
+    float32 query vector for `question`: from the embedding cache, else
+    computed in a micro-batch with concurrent callers.
+    """
+    cache = get_embedding_cache()
+    key = _cache_key(question)
+    vector = cache.get(key)
+    if vector is None:
+        inc("cache_lookups_total", cache="query_embedding", result="miss")
+        with timed("embedding"):
+            vector = np.asarray(_embed_batcher.submit(question), dtype=np.float32)
+        cache.put(key, vector)
+    else:
+        inc("cache_lookups_total", cache="query_embedding", result="hit")
+    return vector
+
+
+def search_index(retriever, question: str, query_vector, k: int, product=None) -> list:
+    """
+    Hybrid product-partitioned search on `retriever`. Ranked rows and
+    distances are cached per (question, product, k, keyword weight);
+    misses are searched in a micro-batch with concurrent callers.
+    """
+    cache = get_retrieval_cache()
+    key = (_cache_key(question), product, k, HYBRID_KEYWORD_WEIGHT)
+    hit = cache.get(key)
+    if hit is not None:
+        inc("cache_lookups_total", cache="retrieval", result="hit")
+    else:
+        inc("cache_lookups_total", cache="retrieval", result="miss")
+        started = time.perf_counter()
+        rows, distances = _search_batcher.submit({
+            "store": retriever,
+            "query_vector": query_vector,
+            "k": k,
+            "product": product,
+            "query_text": question,
+            "keyword_weight": HYBRID_KEYWORD_WEIGHT,
+        })
+        observe("search", time.perf_counter() - started)
+        hit = (np.asarray(rows, dtype=np.int64), np.asarray(distances, dtype=np.float32))
+        cache.put_for_version(retriever.index_version, key, hit)
+    return retriever.documents(*hit)
+
+
+def get_query_cache_stats() -> dict:
+    return {
+        "query_embeddings": get_embedding_cache().stats(),
+        "retrieval": get_retrieval_cache().stats(),
+    }
+
+
+def get_batcher_stats() -> dict:
+    return {"embed": _embed_batcher.stats(), "search": _search_batcher.stats()}
+
+
+# FAQ FAST PATH
+def get_faq_router() -> FaqRouter:
+    """Precomputed FAQ answers (product definitions + data/faq.json), reloaded when the file changes."""
+    global _faq_router
+    if _faq_router is None:
+        _faq_router = FaqRouter(FAQ_FILE, lambda texts: get_embeddings().embed_documents(texts))
+    else:
+        _faq_router.refresh()
+    return _faq_router
+
+
+def get_faq_stats() -> dict:
+    return get_faq_router().stats()
+
+
+def _faq_result(entry: dict) -> dict:
+    return {
+        "answer": format_answer(entry["answer"], entry.get("sources", [])),
+        "product": entry.get("product") or "unknown",
+        "version": entry.get("version"),
+        "confidence": entry.get("confidence", FAQ_CONFIDENCE),
+        "sources": entry.get("sources", []),
+    }
+
+
+def warm_up(run_query: bool = True) -> dict:
+    """
+    Load everything the first request would otherwise pay for: the embedding
+    model, the vector index, the LLM client and the prompt tokenizer, then
+    (optionally) embed and search a sample question. The FAQ phrasings are
+    embedded as well. Returns seconds per stage, plus how prompt tokens are
+    counted under "token_counting".
+    """
+    timings = {}
+
+    def stage(name, fn):
+        started = time.perf_counter()
+        result = fn()
+        timings[name] = round(time.perf_counter() - started, 3)
+        return result
+
+    stage("embeddings", get_embeddings)
+    retriever = stage("index", get_retriever)
+    stage("llm_client", get_llm)
+    timings["token_counting"] = stage("tokenizer", load_encoding)
+    stage("faq_index", lambda: get_faq_router().warm())
+    if run_query:
+        stage("warmup_query", lambda: search_index(
+            retriever, WARMUP_QUERY, embed_question(WARMUP_QUERY), RETRIEVAL_K
+        ))
+    return timings
+
 # LLM INITIALIZATION 
 def get_llm():
-    return ChatOpenAI(
-        model="gpt-4o-mini", 
-        temperature=0,
-        max_tokens=300      
-    )
+    """
+    Shared ChatOpenAI client. Built once per process so every request reuses
+    the same keep-alive HTTP connection pool (sync and async).
+    """
+    global _llm
+    if _llm is None:
+        from langchain_openai import ChatOpenAI
 
-# CORE RAG FUNCTION
-def get_rag_answer(question: str):
-    
+        _llm = ChatOpenAI(
+            model="gpt-4o-mini", 
+            temperature=0,
+            max_tokens=300,
+            # Report token usage on the final streamed chunk too
+            stream_usage=True,
+        )
+    return _llm
+
+# PROMPT
+PROMPT_TEMPLATE = """
+You are an Accops documentation assistant. Answer the user's question clearly and concisely.
+
+{product_context}
+
+Rules:
+- Use ONLY the documentation content below
+- If the user asks in a specific language, respond in the SAME language. Otherwise, respond in English.
+- Do NOT repeat the user's question
+- If the question is about a specific product (HySecure or HyWorks), prioritize information from that product's documentation
+- Format the answer clearly with proper line breaks
+- Use **bold** for important terms
+- If the answer is not present, say so clearly
+- Keep the answer under 200 words
+
+Documentation:
+{context}
+
+User Question: {question}
+
+Answer:
+"""
+
+NO_DOCS_ANSWER = "Sorry, I couldn't find relevant information in the Accops documentation."
+SOURCES_HEADER = "\n\n🔗 **Source(s):**\n"
+
+
+def detect_product(question: str):
     question_lower = question.lower()
-    target_product = None
-    
     for product_key in PRODUCT_DEFINITIONS.keys():
         if product_key in question_lower:
-            target_product = product_key
-            break
-    
-    db = get_db()
-    
-    # Get more results initially to filter by product (with scores)
-    all_docs_with_scores = db.similarity_search_with_score(question, k=8)
+            return product_key
+    return None
+
+
+def detect_release(question: str, product=None, version=None) -> tuple:
+    """
+    (product, version) the question is about; either may be None. Explicit
+    `product` / `version` win over what the question names. A version on
+    its own identifies the product when only one product has that release.
+    """
+    product = product or detect_product(question)
+    if product:
+        return product, find_version(product, version or question)
+    matches = {(key, find_version(key, version or question)) for key in PRODUCT_DEFINITIONS}
+    matches = [(key, found) for key, found in matches if found]
+    return matches[0] if len(matches) == 1 else (None, None)
+
+
+def search_shard(retriever, product, version=None) -> tuple:
+    """
+    (partition to search, release it holds) for a product: the requested
+    release if indexed, else the product's latest release, else all of the
+    product's chunks. (None, None) searches the whole index.
+    """
+    if not retriever.has_product(product):
+        return None, None
+    for candidate in (version, latest_version(product)):
+        if candidate and retriever.has_product(shard_key(product, candidate)):
+            if version and candidate != version:
+                print(f"⚠️ {product} {version} is not indexed; answering from {candidate}")
+            return shard_key(product, candidate), candidate
+    return shard_key(product), None
+
+
+def _prepare(question: str, product=None, version=None) -> dict:
+    """
+    Everything before the LLM call: product/release detection, FAQ routing,
+    answer cache lookup, retrieval and prompt building. Shared by the blocking and
+    streaming paths. `product` / `version` override what the question names.
+    If `result` is set the answer is already known and no LLM call is needed.
+    """
+    with timed("product_detection"):
+        target_product, requested_version = detect_release(question, product, version)
+
+    with timed("index_load"):
+        retriever = get_retriever()
+    # One release of one product (latest unless the question names another)
+    shard, target_version = search_shard(retriever, target_product, requested_version)
+    state = {
+        "question": question,
+        "target_product": target_product,
+        "target_version": target_version,
+        "cache_scope": shard or target_product,
+        # Index the answer is built from; it is only cached while that index is live
+        "index_version": retriever.index_version,
+        "result": None,
+        "path": "rag",
+    }
+
+    # Definitional / frequent questions: precomputed answer, no retrieval or LLM call
+    router = get_faq_router()
+    with timed("faq_route"):
+        entry = router.match_exact(question, target_product, retriever.index_version, target_version)
+    if entry is not None:
+        state.update(result=_faq_result(entry), path="faq")
+        return state
+    # Every cache is tied to the index version it was filled from
+    get_embedding_cache().ensure_version(retriever.index_version)
+    get_retrieval_cache().ensure_version(retriever.index_version)
+
+    # Serve repeated / near-duplicate questions from the answer cache
+    cache = get_answer_cache()
+    cache.ensure_version(retriever.index_version)
+    with timed("answer_cache"):
+        cached = cache.get(question, state["cache_scope"])
+    if cached is not None:
+        inc("cache_lookups_total", cache="answer", result="exact_hit")
+        state.update(result=cached, path="answer_cache")
+        return state
+
+    query_vector = embed_question(question)
+    state["query_vector"] = query_vector
+    with timed("faq_route"):
+        entry = router.match_similar(question, query_vector, target_product, retriever.index_version, target_version)
+    if entry is not None:
+        state.update(result=_faq_result(entry), path="faq")
+        return state
+    with timed("answer_cache"):
+        cached = cache.get_similar(query_vector, state["cache_scope"])
+    inc("cache_lookups_total", cache="answer", result="semantic_hit" if cached is not None else "miss")
+    if cached is not None:
+        state.update(result=cached, path="answer_cache")
+        return state
     
-    if target_product:
-        filtered_docs_with_scores = [
-            (doc, score) for doc, score in all_docs_with_scores
-            if doc.metadata.get("module", "").lower() == target_product.lower()
-        ]
-        # Fall back to unfiltered if no product-specific docs found
-        docs_with_scores = filtered_docs_with_scores if filtered_docs_with_scores else all_docs_with_scores[:4]
+    # Search only the named product's release; fall back to the whole index
+    # if that product has nothing indexed. Vector and keyword (BM25) rankings
+    # are fused so exact terms like error codes and ports are not missed.
+    if shard:
+        docs_with_scores = search_index(retriever, question, query_vector, PRODUCT_RETRIEVAL_K, shard)
     else:
-        docs_with_scores = all_docs_with_scores[:4]
+        docs_with_scores = search_index(retriever, question, query_vector, RETRIEVAL_K)
 
     if not docs_with_scores:
-        return "Sorry, I couldn't find relevant information in the Accops documentation.", resolved_product or "unknown", 0.2
+        state["path"] = "no_docs"
+        state["result"] = {
+            "answer": NO_DOCS_ANSWER,
+            "product": target_product or "unknown",
+            "version": target_version,
+            "confidence": 0.2,
+            "sources": [],
+        }
+        return state
 
     # Extract docs from tuples for context building
     docs = [doc for doc, score in docs_with_scores]
-    scores = [score for doc, score in docs_with_scores]
 
-    context = "\n\n".join(doc.page_content[:800] for doc in docs)
+    # Token-budgeted, de-duplicated context (overlapping chunks merged)
+    with timed("context_build"):
+        context, context_stats = build_context(docs)
+    inc("context_tokens_total", context_stats["tokens"])
+    inc("context_tokens_saved_total", context_stats["tokens_saved"])
+    print(
+        f"✂️ Context: {context_stats['tokens']} tokens from {context_stats['chunks']} chunks "
+        f"({context_stats['tokens_saved']} saved, {context_stats['merged']} merged, "
+        f"{context_stats['duplicates']} duplicates dropped)"
+    )
 
     # Collect TOP 1-2 most relevant sources
     sources = []
@@ -101,45 +468,53 @@ def get_rag_answer(question: str):
         if top_module:
             resolved_product = top_module.lower()
 
-    product_context = f"(Question is about: {target_product.upper()})" if target_product else ""
-    
-    prompt = f"""
-You are an Accops documentation assistant. Answer the user's question clearly and concisely.
+    product_context = ""
+    if target_product:
+        release = f" {target_version}" if target_version else ""
+        product_context = f"(Question is about: {target_product.upper()}{release})"
 
-{product_context}
+    state.update(
+        docs_with_scores=docs_with_scores,
+        context_stats=context_stats,
+        sources=sources,
+        resolved_product=resolved_product,
+        prompt=PROMPT_TEMPLATE.format(
+            product_context=product_context,
+            context=context,
+            question=question,
+        ),
+    )
+    return state
 
-Rules:
-- Use ONLY the documentation content below
-- If the user asks in a specific language, respond in the SAME language. Otherwise, respond in English.
-- Do NOT repeat the user's question
-- If the question is about a specific product (HySecure or HyWorks), prioritize information from that product's documentation
-- Format the answer clearly with proper line breaks
-- Use **bold** for important terms
-- If the answer is not present, say so clearly
-- Keep the answer under 200 words
 
-Documentation:
-{context}
+def format_answer(answer: str, sources: list) -> str:
+    """Answer text with its sources (most relevant first) appended as links."""
+    if sources:
+        answer += SOURCES_HEADER
+        for src in sources:
+            answer += f"- {src}\n"
+    return answer
 
-User Question: {question}
 
-Answer:
-"""
+def _record_answer(state: dict, started: float):
+    """Count the answer by path (faq, answer_cache, rag, no_docs) and time it under answer_<path>."""
+    inc("answers_total", path=state["path"])
+    observe(f"answer_{state['path']}", time.perf_counter() - started)
 
-    # Call LLM (responsibly)
-    llm = get_llm()
-    response = llm.invoke(prompt)
-    answer = response.content.strip()
+
+def _finalize(state: dict, llm_answer: str) -> dict:
+    """Append sources, score confidence and cache the finished answer."""
+    answer = llm_answer.strip()
+    sources = state["sources"]
+    docs_with_scores = state["docs_with_scores"]
+    target_product = state["target_product"]
+    scores = [score for doc, score in docs_with_scores]
 
     #Append TOP sources (most relevant first)
-    if sources:
-        answer += "\n\n🔗 **Source(s):**\n"
-        for src in sources:  # Already ordered by relevance
-            answer += f"- {src}\n"
+    answer = format_answer(answer, sources)
 
     #Calculate confidence score based on retrieval quality
     top_score = scores[0] if scores else 1.0
-    avg_score = sum(scores) / len(scores) if scores else 1.0
     
     # Convert FAISS distance to confidence:
     confidence = max(0.2, min(0.95, 1.0 - (top_score * 0.5)))
@@ -156,5 +531,124 @@ Answer:
                                 if doc.metadata.get("module", "").lower() == target_product.lower())
         if product_docs_count > 0:
             confidence = min(0.95, confidence + 0.15)
-    
-    return answer, resolved_product or "unknown", round(confidence, 2)
+
+    result = {
+        "answer": answer,
+        "product": state["resolved_product"] or "unknown",
+        "version": state["target_version"],
+        "confidence": round(float(confidence), 2),
+        "sources": sources,
+    }
+    get_answer_cache().put_for_version(
+        state["index_version"], state["question"], state["query_vector"], state["cache_scope"], result
+    )
+    return result
+
+
+def _record_llm_usage(message):
+    """Count prompt/completion tokens reported by the LLM (if any)."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        inc("llm_tokens_total", usage.get("input_tokens", 0), kind="prompt")
+        inc("llm_tokens_total", usage.get("output_tokens", 0), kind="completion")
+
+
+# CORE RAG FUNCTION
+def get_rag_result(question: str, product=None, version=None) -> dict:
+    """`get_rag_answer` returning the whole result: answer, product, version, confidence and sources."""
+    started = time.perf_counter()
+    state = _prepare(question, product, version)
+    result = state["result"]
+
+    if result is None:
+        # Call LLM (responsibly)
+        llm = get_llm()
+        with timed("llm"):
+            response = llm.invoke(state["prompt"])
+        _record_llm_usage(response)
+        result = _finalize(state, response.content)
+
+    _record_answer(state, started)
+    return result
+
+
+def get_rag_answer(question: str, product=None, version=None):
+    result = get_rag_result(question, product, version)
+    return result["answer"], result["product"], result["confidence"]
+
+
+def stream_rag_answer(question: str, product=None, version=None):
+    """
+    Streaming variant of `get_rag_answer`.
+    Yields ("token", text) as the LLM generates the answer, then a single
+    ("done", result) with the final answer (including sources), product,
+    confidence, release and source list.
+    """
+    answer_started = time.perf_counter()
+    state = _prepare(question, product, version)
+    result = state["result"]
+
+    if result is None:
+        parts = []
+        started = time.perf_counter()
+        for chunk in get_llm().stream(state["prompt"]):
+            _record_llm_usage(chunk)
+            if chunk.content:
+                if not parts:
+                    observe("llm_first_token", time.perf_counter() - started)
+                parts.append(chunk.content)
+                yield "token", chunk.content
+        observe("llm", time.perf_counter() - started)
+        result = _finalize(state, "".join(parts))
+    else:
+        yield "token", result["answer"]
+
+    _record_answer(state, answer_started)
+    yield "done", result
+
+
+# ASYNC RAG FUNCTIONS
+async def _aprepare(question: str, product=None, version=None) -> dict:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_retrieval_executor, _prepare, question, product, version)
+
+
+async def aget_rag_answer(question: str, product=None, version=None):
+    """Async `get_rag_answer`: retrieval runs on the retrieval executor, the LLM call is awaited."""
+    started = time.perf_counter()
+    state = await _aprepare(question, product, version)
+    result = state["result"]
+
+    if result is None:
+        with timed("llm"):
+            response = await get_llm().ainvoke(state["prompt"])
+        _record_llm_usage(response)
+        result = _finalize(state, response.content)
+
+    _record_answer(state, started)
+    return result["answer"], result["product"], result["confidence"]
+
+
+async def astream_rag_answer(question: str, product=None, version=None):
+    """Async `stream_rag_answer`, driven by the LLM's async streaming API."""
+    answer_started = time.perf_counter()
+    state = await _aprepare(question, product, version)
+    result = state["result"]
+
+    if result is None:
+        parts = []
+        started = time.perf_counter()
+        async for chunk in get_llm().astream(state["prompt"]):
+            _record_llm_usage(chunk)
+            if chunk.content:
+                if not parts:
+                    observe("llm_first_token", time.perf_counter() - started)
+                parts.append(chunk.content)
+                yield "token", chunk.content
+        observe("llm", time.perf_counter() - started)
+        result = _finalize(state, "".join(parts))
+    else:
+        yield "token", result["answer"]
+
+    _record_answer(state, answer_started)
+    yield "done", result
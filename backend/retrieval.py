@@ -0,0 +1,77 @@
+import faiss
+import numpy as np
+
+
+class ProductRetriever:
+    """
+    Product-partitioned search over a LangChain FAISS store.
+
+    At load time the FAISS row IDs are grouped by the chunk's `module`
+    metadata (lowercased, i.e. the PRODUCT_DEFINITIONS key), and by
+    "product@version" for chunks tagged with a release. A product search
+    passes an ID selector to FAISS so only that product's vectors are
+    scanned and a full top-k comes back from the requested product, instead
+    of over-fetching a mixed top-k and filtering it in Python.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        rows_by_product = {}
+        for row, doc_id in db.index_to_docstore_id.items():
+            doc = db.docstore.search(doc_id)
+            metadata = doc.metadata if hasattr(doc, "metadata") else {}
+            module = (metadata.get("module", "") or "").lower()
+            rows_by_product.setdefault(module, []).append(row)
+            if metadata.get("version"):
+                rows_by_product.setdefault(f"{module}@{metadata['version']}".lower(), []).append(row)
+
+        self.partitions = {
+            product: np.array(sorted(rows), dtype=np.int64)
+            for product, rows in rows_by_product.items()
+        }
+        self._search_params = {
+            product: faiss.SearchParameters(sel=faiss.IDSelectorBatch(rows))
+            for product, rows in self.partitions.items()
+        }
+
+    def has_product(self, product) -> bool:
+        return bool(product) and product.lower() in self.partitions
+
+    def search(self, query_vector, k: int, product=None, query_text: str = None, keyword_weight: float = 0.0) -> list:
+        """
+        Top-k (Document, distance) pairs, restricted to `product` when it has
+        indexed chunks. Distances are FAISS L2 scores, smaller is closer.
+        Legacy stores have no keyword index, so `query_text` and
+        `keyword_weight` are accepted but unused.
+        """
+        return self.search_batch([{
+            "query_vector": query_vector,
+            "k": k,
+            "product": product,
+        }])[0]
+
+    def search_batch(self, requests: list) -> list:
+        """One result list per request (dicts of `search()` arguments)."""
+        return [self.documents(rows, distances) for rows, distances in self.search_rows_batch(requests)]
+
+    def search_rows_batch(self, requests: list) -> list:
+        """(FAISS row ids, distances) per request; see `documents()`."""
+        return [self._search_rows(r["query_vector"], r["k"], r.get("product")) for r in requests]
+
+    def documents(self, rows, distances) -> list:
+        return [
+            (self.db.docstore.search(self.db.index_to_docstore_id[int(row)]), float(dist))
+            for row, dist in zip(rows, distances)
+        ]
+
+    def _search_rows(self, query_vector, k: int, product=None):
+        query = np.asarray([query_vector], dtype=np.float32)
+        if self.has_product(product):
+            params = self._search_params[product.lower()]
+            k = min(k, len(self.partitions[product.lower()]))
+            distances, rows = self.db.index.search(query, k, params=params)
+        else:
+            distances, rows = self.db.index.search(query, min(k, self.db.index.ntotal))
+
+        found = rows[0] != -1
+        return [int(row) for row in rows[0][found]], [float(d) for d in distances[0][found]]
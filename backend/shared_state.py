@@ -0,0 +1,320 @@
+import atexit
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+
+# CONFIGURATION
+# Where the answer, retrieval and query-embedding caches (and their hit/miss
+# counters) live:
+#   local  - inside each worker process (default; nothing is shared)
+#   sqlite - one SQLite file shared by the workers of a host (SHARED_STATE_PATH)
+#   redis  - a Redis-compatible server shared by every worker and host (SHARED_STATE_URL)
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "local")
+# Created readable and writable by the application user only (0600)
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", os.path.join("data", "shared_state.db"))
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "redis://localhost:6379/0")
+SHARED_STATE_PREFIX = os.getenv("SHARED_STATE_PREFIX", "accops:")
+# SQLite store size bound (oldest writes dropped first); Redis relies on TTLs and maxmemory
+SHARED_STATE_MAX_ENTRIES = int(os.getenv("SHARED_STATE_MAX_ENTRIES", "50000"))
+# Lifetime of entries whose cache has no TTL of its own, so superseded index versions age out
+SHARED_STATE_DEFAULT_TTL_SECONDS = float(os.getenv("SHARED_STATE_DEFAULT_TTL_SECONDS", "86400"))
+# Hit/miss counts are kept per worker and added to the store at most this often,
+# so cache lookups never write to it
+SHARED_STATE_COUNTER_FLUSH_SECONDS = float(os.getenv("SHARED_STATE_COUNTER_FLUSH_SECONDS", "5"))
+# Writes between two expiry / size sweeps of the SQLite store
+SQLITE_PRUNE_EVERY = 256
+# Array types a stored value may contain
+ARRAY_DTYPES = {"float32", "float64", "int64", "int32"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def encode_value(value) -> bytes:
+    """
+    JSON for a cache value: str / number / list / dict, with numpy arrays as
+    base64 (tuples come back as lists). Never pickle: whoever can write the
+    store could otherwise run code in every worker.
+    """
+    return json.dumps(value, default=_encode_default, separators=(",", ":")).encode("utf-8")
+
+
+def decode_value(data):
+    """Value written by `encode_value`; None (a miss) for anything else."""
+    try:
+        return json.loads(data, object_hook=_decode_array)
+    except ValueError:
+        return None
+
+
+def _encode_default(value):
+    if isinstance(value, np.ndarray) and value.dtype.name in ARRAY_DTYPES:
+        data = np.ascontiguousarray(value)
+        return {"__array__": base64.b64encode(data.tobytes()).decode("ascii"),
+                "dtype": data.dtype.name, "shape": list(data.shape)}
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot store a {type(value).__name__} in the shared cache")
+
+
+def _decode_array(obj: dict):
+    if "__array__" not in obj:
+        return obj
+    if obj.get("dtype") not in ARRAY_DTYPES:
+        raise ValueError(f"Unsupported array type {obj.get('dtype')}")
+    array = np.frombuffer(base64.b64decode(obj["__array__"]), dtype=obj["dtype"])
+    return array.reshape(obj["shape"])
+
+
+def _prefix_end(prefix: str) -> str:
+    # Upper bound of a key range: every key starting with `prefix` sorts below it
+    return prefix + "\U0010ffff"
+
+
+class SqliteStore:
+    """
+    Key-value store in one SQLite file shared by the processes of a host.
+    WAL mode lets every worker read while one writes. Values are stored as
+    JSON (`encode_value`); the file is private to the application user.
+    """
+
+    def __init__(self, path: str = SHARED_STATE_PATH, max_entries: int = SHARED_STATE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # SQLite gives its -wal / -shm files the permissions of the database file
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        os.chmod(path, 0o600)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite connections are not thread-safe: one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # a cache: losing the last writes on a crash is fine
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        row = self._connection().execute(
+            "SELECT value FROM entries WHERE key = ? AND (expires_at = 0 OR expires_at > ?)", (key, time.time())
+        ).fetchone()
+        return decode_value(row[0]) if row else None
+
+    def get_many(self, keys: list) -> list:
+        found = {}
+        now = time.time()
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self._connection().execute(
+                f"SELECT key, value FROM entries WHERE key IN ({', '.join('?' * len(chunk))}) "
+                "AND (expires_at = 0 OR expires_at > ?)",
+                (*chunk, now),
+            )
+            found.update((key, decode_value(value)) for key, value in rows)
+        return [found.get(key) for key in keys]
+
+    def set(self, key: str, value, ttl_seconds: float = 0):
+        expires_at = time.time() + ttl_seconds if ttl_seconds else 0
+        conn = self._connection()
+        # REPLACE gives the row a new rowid, so rowid order is write order
+        conn.execute("INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                     (key, encode_value(value), expires_at))
+        self._writes += 1
+        if self._writes % SQLITE_PRUNE_EVERY == 0:
+            self._prune(conn)
+
+    def _prune(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM entries WHERE expires_at != 0 AND expires_at <= ?", (time.time(),))
+        excess = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute("DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY rowid LIMIT ?)", (excess,))
+
+    def delete(self, key: str):
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def keys(self, prefix: str) -> list:
+        """Live keys starting with `prefix`."""
+        rows = self._connection().execute(
+            "SELECT key FROM entries WHERE key >= ? AND key < ? AND (expires_at = 0 OR expires_at > ?)",
+            (prefix, _prefix_end(prefix), time.time()),
+        )
+        return [key for key, in rows]
+
+    def clear(self, prefix: str):
+        """Delete every entry (not counter) whose key starts with `prefix`."""
+        self._connection().execute("DELETE FROM entries WHERE key >= ? AND key < ?", (prefix, _prefix_end(prefix)))
+
+    def incr(self, key: str, amount: int = 1):
+        self.incr_many({key: amount})
+
+    def incr_many(self, amounts: dict):
+        """Add to several counters in one transaction."""
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT INTO counters (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+                list(amounts.items()),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def counters(self, keys: list) -> list:
+        rows = dict(self._connection().execute(
+            f"SELECT key, value FROM counters WHERE key IN ({', '.join('?' * len(keys))})", keys
+        ))
+        return [rows.get(key, 0) for key in keys]
+
+
+class RedisStore:
+    """
+    The same key-value interface on a Redis-compatible server, shared by
+    every worker on every host. `client` is any object with the redis-py
+    API (get, mget, set, delete, scan_iter, incrby, pipeline); by default one is
+    created from `url`. Tests can pass a local stand-in such as fakeredis.
+    """
+
+    def __init__(self, client=None, url: str = SHARED_STATE_URL, prefix: str = SHARED_STATE_PREFIX):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("SHARED_STATE_BACKEND=redis needs the redis client: `pip install redis`") from e
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def _pattern(self, prefix: str) -> str:
+        # Escape glob characters so the key prefix is matched literally
+        escaped = "".join(f"\\{c}" if c in "*?[]\\" else c for c in self.prefix + prefix)
+        return escaped + "*"
+
+    def get(self, key: str):
+        data = self.client.get(self.prefix + key)
+        return decode_value(data) if data is not None else None
+
+    def get_many(self, keys: list) -> list:
+        if not keys:
+            return []
+        values = self.client.mget([self.prefix + key for key in keys])
+        return [decode_value(data) if data is not None else None for data in values]
+
+    def set(self, key: str, value, ttl_seconds: float = 0):
+        data = encode_value(value)
+        self.client.set(self.prefix + key, data, px=int(ttl_seconds * 1000) if ttl_seconds else None)
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def keys(self, prefix: str) -> list:
+        start = len(self.prefix)
+        return [
+            (key.decode() if isinstance(key, bytes) else key)[start:]
+            for key in self.client.scan_iter(match=self._pattern(prefix), count=1000)
+        ]
+
+    def clear(self, prefix: str):
+        keys = [self.prefix + key for key in self.keys(prefix)]
+        for i in range(0, len(keys), 500):
+            self.client.delete(*keys[i:i + 500])
+
+    def incr(self, key: str, amount: int = 1):
+        # Counters share the key space, under "stats:" (never matched by cache prefixes)
+        self.client.incrby(self.prefix + "stats:" + key, amount)
+
+    def incr_many(self, amounts: dict):
+        pipeline = self.client.pipeline(transaction=False)
+        for key, amount in amounts.items():
+            pipeline.incrby(self.prefix + "stats:" + key, amount)
+        pipeline.execute()
+
+    def counters(self, keys: list) -> list:
+        values = self.client.mget([self.prefix + "stats:" + key for key in keys])
+        return [int(value) if value is not None else 0 for value in values]
+
+
+class BufferedCounters:
+    """
+    Counters of a shared store, counted in this process and added to the
+    store (one `incr_many`) at most every `flush_seconds`, and on exit, so
+    the read path of a cache does not write to the store on every lookup.
+    `read()` flushes first, so this worker's own counts are always included.
+    """
+
+    def __init__(self, store, flush_seconds: float = SHARED_STATE_COUNTER_FLUSH_SECONDS):
+        self.store = store
+        self.flush_seconds = flush_seconds
+        self._pending = Counter()
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def incr(self, key: str, amount: int = 1):
+        with self._lock:
+            self._pending[key] += amount
+            due = time.monotonic() - self._flushed_at >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._flushed_at = time.monotonic()
+        if pending:
+            try:
+                self.store.incr_many(dict(pending))
+            except Exception as e:
+                print(f"⚠️ Could not update shared cache counters: {e}")
+
+    def read(self, keys: list) -> list:
+        self.flush()
+        return self.store.counters(keys)
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_shared_store():
+    """Store selected by SHARED_STATE_BACKEND, or None for per-process (local) caches."""
+    global _shared_store
+    if SHARED_STATE_BACKEND == "local":
+        return None
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                if SHARED_STATE_BACKEND == "sqlite":
+                    _shared_store = SqliteStore()
+                    print(f"🗃️ Shared cache: SQLite at {SHARED_STATE_PATH}")
+                elif SHARED_STATE_BACKEND == "redis":
+                    _shared_store = RedisStore()
+                    print(f"🗃️ Shared cache: Redis at {SHARED_STATE_URL}")
+                else:
+                    raise ValueError(
+                        f"Unknown SHARED_STATE_BACKEND '{SHARED_STATE_BACKEND}' (expected local, sqlite or redis)"
+                    )
+    return _shared_store
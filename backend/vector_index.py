@@ -0,0 +1,273 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from backend.ann_index import normalize_config
+from backend.mmap_store import MmapVectorStore, StoreWriter, is_mmap_store, requested_ann_config, write_store
+
+
+# Layout under the index root (e.g. vector_store/accops_docs):
+#   CURRENT                  -> name of the live generation (swapped atomically)
+#   generations/<name>/      -> memory-mapped store files (see mmap_store.py), manifest.json
+# A root without CURRENT is a legacy single-directory index; generations
+# written before the mmap format hold a pickled FAISS store (index.faiss,
+# index.pkl). Both are still readable and converted on the next ingest.
+POINTER_FILE = "CURRENT"
+GENERATIONS_DIR = "generations"
+MANIFEST_FILE = "manifest.json"
+# Generations kept on disk besides the live one, for workers still loading them
+KEEP_OLD_GENERATIONS = 1
+
+
+def current_generation(root: str):
+    pointer = os.path.join(root, POINTER_FILE)
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer, encoding="utf-8") as f:
+        return f.read().strip() or None
+
+
+def current_index_path(root: str) -> str:
+    """Directory holding the live index files (the root itself for legacy indexes)."""
+    generation = current_generation(root)
+    if generation is None:
+        return root
+    return os.path.join(root, GENERATIONS_DIR, generation)
+
+
+def chunk_ids(source: str, texts: list) -> list:
+    """
+    Stable chunk IDs derived from source URL + chunk text, so an unchanged
+    chunk keeps its ID across ingests. Repeated identical chunks on one page
+    get an occurrence suffix.
+    """
+    ids = []
+    seen = {}
+    for text in texts:
+        digest = hashlib.sha1(f"{source}\n{text}".encode("utf-8")).hexdigest()
+        n = seen.get(digest, 0)
+        seen[digest] = n + 1
+        ids.append(digest if n == 0 else f"{digest}-{n}")
+    return ids
+
+
+def load_index(index_path: str, ef_search: int = None, nprobe: int = None):
+    """
+    Searchable index at `index_path` exposing `has_product()` and
+    `search(query_vector, k, product)`: an MmapVectorStore, or a legacy
+    pickled FAISS store wrapped in a ProductRetriever. `ef_search` /
+    `nprobe` tune the store's ANN index, if it has one.
+    """
+    if is_mmap_store(index_path):
+        return MmapVectorStore(index_path, ef_search=ef_search, nprobe=nprobe)
+    # Legacy format only: keep langchain_community/faiss off the normal import path
+    from langchain_community.vectorstores import FAISS
+    from backend.retrieval import ProductRetriever
+
+    db = FAISS.load_local(index_path, None, allow_dangerous_deserialization=True)
+    return ProductRetriever(db)
+
+
+def read_chunks(index_path: str) -> dict:
+    """chunk ID -> (text, metadata, vector) for every chunk of the index at `index_path`."""
+    chunks = {}
+    if is_mmap_store(index_path):
+        store = MmapVectorStore(index_path)
+        for _, record, vector in store.iter_records():
+            chunks[record["id"]] = (record["text"], record["metadata"], np.array(vector))
+        store.close()
+    elif os.path.exists(os.path.join(index_path, "index.faiss")):
+        # Legacy pickle: only ever read here, to convert it to the mmap format
+        from langchain_community.vectorstores import FAISS
+
+        db = FAISS.load_local(index_path, None, allow_dangerous_deserialization=True)
+        vectors = db.index.reconstruct_n(0, db.index.ntotal)
+        for row, doc_id in db.index_to_docstore_id.items():
+            doc = db.docstore.search(doc_id)
+            chunks[doc_id] = (doc.page_content, doc.metadata, vectors[row])
+    return chunks
+
+
+def load_manifest(index_path: str, chunks: dict = None) -> dict:
+    """
+    source URL -> list of chunk IDs in the index at `index_path`.
+    Legacy indexes have no manifest; it is rebuilt from the chunk metadata.
+    """
+    path = os.path.join(index_path, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["sources"]
+
+    manifest = {}
+    for chunk_id, (_, metadata, _) in (chunks or {}).items():
+        manifest.setdefault(metadata.get("source", ""), []).append(chunk_id)
+    return manifest
+
+
+class IndexUpdate:
+    """
+    Incremental update of the index under `root`, written straight into a
+    new generation without re-embedding unchanged chunks:
+
+    - `add_source(source, docs, vectors)` is called once per crawled page, as
+      soon as it is embedded. Chunks already in the live index
+      (`is_indexed()`) are copied from its memory-mapped store with this
+      crawl's metadata; new/changed chunks take their vector from `vectors`
+      (chunk ID -> vector). Chunks whose ID disappeared from the page are
+      deleted.
+    - `finish(keep_sources, in_scope)` copies the chunks of pages that were
+      not crawled this run and should stay: those in `keep_sources` (e.g.
+      pages that failed to fetch) and those for which `in_scope(source)` is
+      False (e.g. other releases when only one release was crawled). Other
+      pages missing from this run are removed. The generation is then
+      published by atomically replacing the CURRENT pointer, so readers
+      always see either the old or the new index.
+
+    Only chunk IDs are kept in memory; texts and vectors go to disk as they
+    arrive. `ann` is the vector index configuration (see ann_index.py);
+    changing it rebuilds the index even without new chunks. A legacy pickled
+    index is converted to the memory-mapped format first.
+    """
+
+    def __init__(self, root: str, model_name: str = None, ann: dict = None):
+        old_path = current_index_path(root)
+        if not is_mmap_store(old_path) and os.path.exists(os.path.join(old_path, "index.faiss")):
+            print("🔄 Converting the legacy FAISS index before updating it")
+            convert_legacy_index(root)
+            old_path = current_index_path(root)
+        self.root = root
+        self.ann = ann
+        self.old_path = old_path
+        self.old_store = MmapVectorStore(old_path) if is_mmap_store(old_path) else None
+        self.old_manifest = load_manifest(old_path)
+        # chunk ID -> row of the live store
+        self.old_rows = {}
+        if self.old_store is not None:
+            for row in range(self.old_store.count):
+                self.old_rows[self.old_store.record(row)["id"]] = row
+        self.manifest = {}
+        self.stats = {"added": 0, "deleted": 0, "kept": 0, "retagged": 0}
+        self.generation, self.path = _new_generation(root)
+        self.writer = StoreWriter(self.path, model_name, ann)
+
+    def is_indexed(self, chunk_id: str) -> bool:
+        """True if the chunk is in the live index, so its vector is reused."""
+        return chunk_id in self.old_rows
+
+    def add_source(self, source: str, docs: list, vectors: dict):
+        ids = chunk_ids(source, [doc.page_content for doc in docs])
+        new_ids = set(ids)
+        self.stats["deleted"] += sum(i not in new_ids for i in self.old_manifest.get(source, []))
+        for doc, doc_id in zip(docs, ids):
+            if self.is_indexed(doc_id):
+                # Same text, same vector; metadata is refreshed from this crawl
+                row = self.old_rows[doc_id]
+                self.stats["retagged"] += doc.metadata != self.old_store.record(row)["metadata"]
+                self.writer.add(doc_id, doc.page_content, doc.metadata, self.old_store.vectors[row])
+                self.stats["kept"] += 1
+            else:
+                self.writer.add(doc_id, doc.page_content, doc.metadata, vectors[doc_id])
+                self.stats["added"] += 1
+        self.manifest[source] = ids
+
+    def finish(self, keep_sources=(), in_scope=None) -> dict:
+        """Add the pages kept from the live index and publish. Returns counts of added/deleted/kept/re-tagged chunks."""
+        keep_sources = set(keep_sources)
+        for source, old_ids in self.old_manifest.items():
+            if source in self.manifest:
+                continue
+            if source in keep_sources or (in_scope is not None and not in_scope(source)):
+                self.manifest[source] = old_ids
+                for i in old_ids:
+                    if i in self.old_rows:
+                        self.writer.copy(self.old_store, self.old_rows[i])
+                        self.stats["kept"] += 1
+            else:
+                self.stats["deleted"] += len(old_ids)
+
+        stats = self.stats
+        up_to_date = (
+            os.path.exists(os.path.join(self.old_path, MANIFEST_FILE))
+            and self.old_store is not None
+            and requested_ann_config(self.old_path) == normalize_config(self.ann)
+        )
+        if up_to_date and not stats["added"] and not stats["deleted"] and not stats["retagged"]:
+            print("✅ Index already up to date; nothing to publish")
+            self.abort()
+        elif not self.writer.count:
+            print("⚠️ No documents to index; leaving the current index untouched")
+            self.abort()
+        else:
+            self.writer.close()
+            self._close_old_store()
+            _activate(self.root, self.generation, self.path, self.manifest)
+        return stats
+
+    def abort(self):
+        """Discard the new generation; the live index is left untouched."""
+        self.writer.abort()
+        self._close_old_store()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def _close_old_store(self):
+        if self.old_store is not None:
+            self.old_store.close()
+            self.old_store = None
+
+
+def convert_legacy_index(root: str) -> str:
+    """
+    Rewrite the live pickled FAISS index under `root` as a memory-mapped
+    generation (same vectors, no re-embedding) and publish it.
+    """
+    old_path = current_index_path(root)
+    if is_mmap_store(old_path):
+        print(f"✅ {old_path} is already in the memory-mapped format")
+        return current_generation(root)
+    chunks = read_chunks(old_path)
+    if not chunks:
+        raise RuntimeError(f"No FAISS index found at '{old_path}'")
+    records = [(chunk_id, *chunk) for chunk_id, chunk in chunks.items()]
+    return publish(root, records, load_manifest(old_path, chunks))
+
+
+def publish(root: str, records: list, manifest: dict, model_name: str = None, ann: dict = None) -> str:
+    """Write (id, text, metadata, vector) `records` as a new generation and atomically make it the live one."""
+    generation, path = _new_generation(root)
+    write_store(path, records, model_name, ann)
+    _activate(root, generation, path, manifest)
+    return generation
+
+
+def _new_generation(root: str) -> tuple:
+    """(name, path) of a new, empty generation directory under `root`."""
+    now = time.time()
+    generation = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f".{int(now * 1e6) % 1000000:06d}-{os.getpid()}"
+    path = os.path.join(root, GENERATIONS_DIR, generation)
+    os.makedirs(path)
+    return generation, path
+
+
+def _activate(root: str, generation: str, path: str, manifest: dict):
+    """Write the manifest of the complete generation at `path` and make it the live one."""
+    with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump({"generation": generation, "sources": manifest}, f)
+
+    pointer = os.path.join(root, POINTER_FILE)
+    tmp_pointer = f"{pointer}.tmp"
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        f.write(generation)
+    os.replace(tmp_pointer, pointer)
+
+    _remove_old_generations(root, generation)
+
+
+def _remove_old_generations(root: str, live: str):
+    generations_dir = os.path.join(root, GENERATIONS_DIR)
+    old = sorted(g for g in os.listdir(generations_dir) if g != live)
+    for name in old[:max(len(old) - KEEP_OLD_GENERATIONS, 0)]:
+        shutil.rmtree(os.path.join(generations_dir, name), ignore_errors=True)
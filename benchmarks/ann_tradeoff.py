@@ -0,0 +1,129 @@
+"""
+Recall / latency / memory trade-off of the vector index types.
+
+Rebuilds the live index's vectors as flat (exact), HNSW, IVF-Flat and IVF-PQ
+stores in a temporary directory and, for each efSearch / nprobe value,
+measures recall@k against exact search, single-query latency, build time
+and index size. No LLM calls; the embedding model is only loaded to embed
+benchmarks/questions.jsonl (otherwise stored chunk vectors are the queries).
+
+    python benchmarks/ann_tradeoff.py --k 10 --ef-search 16,32,64,128 --nprobe 1,4,16,64
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.ann_index import ANN_FILE, INDEX_PARAMS
+from backend.mmap_store import MmapVectorStore, write_store
+from backend.vector_index import current_index_path
+
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+QUESTIONS_FILE = os.path.join(BENCH_DIR, "questions.jsonl")
+QUERY_SEED = 7
+
+
+def load_queries(store: MmapVectorStore, questions_file: str, count: int) -> tuple:
+    """(query vectors, description): embedded benchmark questions, else a sample of stored vectors."""
+    if os.path.exists(questions_file):
+        from backend import rag
+
+        with open(questions_file, encoding="utf-8") as f:
+            questions = [json.loads(line)["question"] for line in f if line.strip()][:count]
+        if questions:
+            vectors = rag.get_embeddings().embed_documents(questions)
+            return np.asarray(vectors, dtype=np.float32), f"{len(questions)} questions from {questions_file}"
+    rng = np.random.default_rng(QUERY_SEED)
+    rows = rng.choice(store.count, min(count, store.count), replace=False)
+    return np.asarray(store.vectors[np.sort(rows)], dtype=np.float32), f"{len(rows)} stored chunk vectors"
+
+
+def measure(store: MmapVectorStore, queries: np.ndarray, k: int, truth: list) -> dict:
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        rows, _ = store.search_rows_batch([{"query_vector": query, "k": k}])[0]
+        latencies.append(time.perf_counter() - started)
+        recalls.append(len(set(rows) & set(expected)) / max(len(expected), 1))
+    ms = np.array(latencies) * 1000
+    return {
+        "recall": float(np.mean(recalls)),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", help="store directory (default: live generation of rag.VECTOR_DB_PATH)")
+    parser.add_argument("--questions", default=QUESTIONS_FILE)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", default="hnsw,ivf_flat,ivf_pq")
+    parser.add_argument("--ef-search", default="16,32,64,128")
+    parser.add_argument("--nprobe", default="1,4,16,64")
+    parser.add_argument("--hnsw-m", type=int, default=INDEX_PARAMS["hnsw"]["m"])
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists (0 = 4 * sqrt(chunks))")
+    parser.add_argument("--pq-m", type=int, default=INDEX_PARAMS["ivf_pq"]["pq_m"])
+    args = parser.parse_args()
+
+    if args.index:
+        index_path = args.index
+    else:
+        from backend.rag import VECTOR_DB_PATH
+
+        index_path = current_index_path(VECTOR_DB_PATH)
+    live = MmapVectorStore(index_path)
+    records = [(r["id"], r["text"], r["metadata"], np.array(v)) for _, r, v in live.iter_records()]
+    queries, source = load_queries(live, args.questions, args.queries)
+    print(f"📦 {len(records)} chunks from {index_path}; queries: {source}; k={args.k}")
+
+    workdir = tempfile.mkdtemp(prefix="ann-tradeoff-")
+    try:
+        flat_path = os.path.join(workdir, "flat")
+        write_store(flat_path, records, live.header.get("model"))
+        flat = MmapVectorStore(flat_path)
+        truth = [rows for rows, _ in flat.search_rows_batch([{"query_vector": q, "k": args.k} for q in queries])]
+        vectors_mb = os.path.getsize(os.path.join(flat_path, "vectors.npy")) / 1e6
+
+        print(f"\n{'index':>10} {'param':>12} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p95 ms':>8} {'build s':>8} {'index MB':>9}")
+        r = measure(flat, queries, args.k, truth)
+        print(f"{'flat':>10} {'exact':>12} {r['recall']:10.3f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {0:8.1f} {vectors_mb:9.1f}")
+        flat.close()
+
+        for index_type in args.types.split(","):
+            config = {"type": index_type, "m": args.hnsw_m, "nlist": args.nlist, "pq_m": args.pq_m}
+            path = os.path.join(workdir, index_type)
+            started = time.perf_counter()
+            write_store(path, records, live.header.get("model"), ann=config)
+            build_seconds = time.perf_counter() - started
+            ann_file = os.path.join(path, ANN_FILE)
+            index_mb = os.path.getsize(ann_file) / 1e6 if os.path.exists(ann_file) else vectors_mb
+
+            name, values = ("efSearch", args.ef_search) if index_type == "hnsw" else ("nprobe", args.nprobe)
+            for value in (int(v) for v in values.split(",")):
+                kwargs = {"ef_search": value} if index_type == "hnsw" else {"nprobe": value}
+                store = MmapVectorStore(path, **kwargs)
+                built = store.header["ann"]["type"]
+                r = measure(store, queries, args.k, truth)
+                store.close()
+                label = index_type if built == index_type else f"{index_type}→{built}"
+                print(f"{label:>10} {f'{name}={value}':>12} {r['recall']:10.3f} {r['p50_ms']:8.2f} "
+                      f"{r['p95_ms']:8.2f} {build_seconds:8.1f} {index_mb:9.1f}")
+    finally:
+        live.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("\nindex MB is the ANN file (flat: vectors.npy). IVF-PQ re-ranks its candidates "
+          "with the memory-mapped vectors, touching only those rows.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+QPS vs. micro-batch window for the query embedding + search path.
+
+Runs CLIENTS threads that each embed a question and search the live index
+through MicroBatchers configured like backend/rag.py, once per batch
+window, and prints throughput, latency and the average batch size.
+No LLM calls are made.
+
+    python benchmarks/batching.py --clients 16 --requests 400 --windows 0,1,2,5,10
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend import rag
+from backend.batcher import MicroBatcher
+
+
+QUESTIONS = [
+    "How do I configure HySecure gateway?",
+    "What port does HyWorks controller use?",
+    "How to enable two factor authentication in HySecure?",
+    "HyWorks session host registration fails",
+    "How do I add a new user to HyWorks?",
+    "What is HyLabs?",
+    "How to configure UEM policies?",
+    "HySecure error 1020 on login",
+]
+
+
+def run(window_ms: float, clients: int, requests: int, max_batch: int) -> dict:
+    embeddings = rag.get_embeddings()
+    retriever = rag.get_retriever()
+    # window < 0 means batching off: every request is processed on its own
+    embed = MicroBatcher(embeddings.embed_documents, max_batch if window_ms >= 0 else 1, window_ms)
+    search = MicroBatcher(retriever.search_batch, max_batch if window_ms >= 0 else 1, window_ms)
+
+    latencies = []
+    lock = threading.Lock()
+    per_client = requests // clients
+
+    def client(n: int):
+        for i in range(per_client):
+            question = QUESTIONS[(n + i) % len(QUESTIONS)]
+            started = time.perf_counter()
+            vector = embed.submit(question)
+            search.submit({
+                "query_vector": vector,
+                "k": rag.RETRIEVAL_K,
+                "query_text": question,
+                "keyword_weight": rag.HYBRID_KEYWORD_WEIGHT,
+            })
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    lat_ms = np.array(latencies) * 1000
+    return {
+        "window_ms": window_ms,
+        "qps": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(lat_ms, 50)),
+        "p95_ms": float(np.percentile(lat_ms, 95)),
+        "avg_batch": embed.stats()["avg_batch_size"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--max-batch", type=int, default=rag.QUERY_BATCH_MAX_SIZE)
+    parser.add_argument("--windows", default="-1,0,1,2,5,10",
+                        help="comma-separated batch windows in ms; -1 = batching off")
+    args = parser.parse_args()
+
+    print("🔥 Loading embeddings and index...")
+    rag.get_embeddings()
+    rag.get_retriever()
+
+    print(f"\n{'window':>10} {'QPS':>8} {'p50 ms':>8} {'p95 ms':>8} {'avg batch':>10}")
+    for window in (float(w) for w in args.windows.split(",")):
+        r = run(window, args.clients, args.requests, args.max_batch)
+        label = "off" if window < 0 else f"{window:g} ms"
+        print(f"{label:>10} {r['qps']:8.1f} {r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['avg_batch']:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
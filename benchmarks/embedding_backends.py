@@ -0,0 +1,208 @@
+"""
+Query-embedding backends: torch (sentence-transformers) vs. ONNX Runtime
+fp32 / int8 (EMBEDDING_BACKEND=onnx, see backend/onnx_embeddings.py).
+
+parity  embeds the benchmark questions with every backend and searches the
+        live index with each; exits with status 1 if an ONNX backend's
+        vectors or top-k rows drift from torch beyond the tolerances.
+bench   loads each backend in a fresh process and reports load time, peak
+        RSS, single-query latency and batch throughput.
+
+Runs offline: the model comes from the local Hugging Face cache / the
+exported ONNX directory. No LLM calls.
+
+    python -m backend.onnx_embeddings export
+    python benchmarks/embedding_backends.py parity --k 5
+    python benchmarks/embedding_backends.py bench --threads 0,1,4
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.embedding_pipeline import EMBEDDING_MODEL_NAME
+from backend.onnx_embeddings import ONNX_MODEL_DIR
+
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+QUESTIONS_FILE = os.path.join(BENCH_DIR, "questions.jsonl")
+# Used when benchmarks/questions.jsonl has not been seeded yet
+SAMPLE_QUESTIONS = [
+    "What is HySecure?",
+    "How do I configure HySecure gateway?",
+    "How to install HyWorks controller",
+    "Configure two factor authentication for HySecure users",
+    "HyWorks 3.4 SP2 session host requirements",
+    "What ports does the HyWorks controller use?",
+    "How to enable SAML single sign-on",
+    "Troubleshoot HySecure client connection error",
+]
+# Parity tolerances against the torch backend
+PARITY_MIN_COSINE = 0.99
+PARITY_MIN_OVERLAP = 0.9
+BACKENDS = ("torch", "onnx-fp32", "onnx-int8")
+
+
+def load_questions(path: str) -> list:
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            questions = [json.loads(line)["question"] for line in f if line.strip()]
+        if questions:
+            return questions
+    return SAMPLE_QUESTIONS
+
+
+def make_backend(name: str, threads: int = 0):
+    if name == "torch":
+        if threads:
+            import torch
+
+            torch.set_num_threads(threads)
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+    from backend.onnx_embeddings import OnnxEmbeddings
+
+    return OnnxEmbeddings(ONNX_MODEL_DIR, precision=name.split("-", 1)[1], intra_op_threads=threads)
+
+
+def available_backends() -> list:
+    info_file = os.path.join(ONNX_MODEL_DIR, "export.json")
+    exported = []
+    if os.path.exists(info_file):
+        with open(info_file, encoding="utf-8") as f:
+            exported = [f"onnx-{precision}" for precision in json.load(f)["files"]]
+    return ["torch"] + [name for name in BACKENDS[1:] if name in exported]
+
+
+def parity(args):
+    from backend.mmap_store import MmapVectorStore
+    from backend.rag import VECTOR_DB_PATH
+    from backend.vector_index import current_index_path
+
+    questions = load_questions(args.questions)
+    backends = available_backends()
+    if len(backends) == 1:
+        sys.exit(f"No exported ONNX model in {ONNX_MODEL_DIR}; run `python -m backend.onnx_embeddings export`")
+    store = MmapVectorStore(current_index_path(VECTOR_DB_PATH))
+    print(f"📦 {len(questions)} questions, k={args.k}, index {store.count} chunks")
+
+    def embed(backend) -> np.ndarray:
+        vectors = np.asarray(backend.embed_documents(questions), dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def search(vectors) -> list:
+        return [rows for rows, _ in store.search_rows_batch([{"query_vector": v, "k": args.k} for v in vectors])]
+
+    reference = embed(make_backend("torch"))
+    expected = search(reference)
+    failed = False
+    print(f"\n{'backend':>10} {'cos min':>8} {'cos mean':>9} {'overlap@' + str(args.k):>10} {'top-1 same':>11}")
+    for name in backends[1:]:
+        vectors = embed(make_backend(name))
+        cosine = np.einsum("ij,ij->i", vectors, reference)
+        found = search(vectors)
+        overlap = np.mean([len(set(a) & set(b)) / max(len(b), 1) for a, b in zip(found, expected)])
+        top1 = np.mean([bool(a) and bool(b) and a[0] == b[0] for a, b in zip(found, expected)])
+        ok = cosine.mean() >= args.min_cosine and overlap >= args.min_overlap
+        failed |= not ok
+        print(f"{name:>10} {cosine.min():8.4f} {cosine.mean():9.4f} {overlap:10.3f} {top1:11.3f}  {'✅' if ok else '❌'}")
+    store.close()
+    if failed:
+        print(f"\n❌ Drift above tolerance (mean cosine < {args.min_cosine} or overlap < {args.min_overlap})")
+        sys.exit(1)
+    print("\n✅ ONNX retrieval matches torch within tolerance")
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+
+
+def measure(args):
+    """One backend in this (fresh) process; prints a JSON line."""
+    questions = load_questions(args.questions)
+    started = time.perf_counter()
+    backend = make_backend(args.backend, args.threads)
+    backend.embed_query(questions[0])
+    load_seconds = time.perf_counter() - started
+
+    latencies = []
+    for i in range(args.queries):
+        started = time.perf_counter()
+        backend.embed_query(questions[i % len(questions)])
+        latencies.append(time.perf_counter() - started)
+
+    # Throughput on micro-batch sized inputs, as the query batcher sends them
+    batch = [questions[i % len(questions)] for i in range(args.batch)]
+    started = time.perf_counter()
+    for _ in range(args.batches):
+        backend.embed_documents(batch)
+    elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    print(json.dumps({
+        "backend": args.backend,
+        "threads": args.threads,
+        "load_s": round(load_seconds, 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "texts_per_s": round(args.batch * args.batches / elapsed, 1),
+        "peak_rss_mb": peak_rss_mb(),
+    }))
+
+
+def bench(args):
+    print(f"{'backend':>10} {'threads':>7} {'load s':>7} {'p50 ms':>7} {'p95 ms':>7} {'texts/s':>8} {'RSS MB':>7}")
+    for name in available_backends():
+        for threads in (int(t) for t in args.threads.split(",")):
+            command = [
+                sys.executable, os.path.abspath(__file__), "--questions", args.questions, "measure",
+                "--backend", name, "--threads", str(threads), "--queries", str(args.queries),
+                "--batch", str(args.batch), "--batches", str(args.batches),
+            ]
+            output = subprocess.run(command, capture_output=True, text=True)
+            if output.returncode != 0:
+                print(f"{name:>10} {threads:>7}  ❌ {output.stderr.strip().splitlines()[-1:]}")
+                continue
+            r = json.loads(output.stdout.strip().splitlines()[-1])
+            print(f"{name:>10} {threads or 'auto':>7} {r['load_s']:7.2f} {r['p50_ms']:7.2f} {r['p95_ms']:7.2f} "
+                  f"{r['texts_per_s']:8.1f} {r['peak_rss_mb']:7.1f}")
+    print("\nload s includes imports and the first query; RSS is the process peak after the run.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", default=QUESTIONS_FILE)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    parity_parser = sub.add_parser("parity", help="compare ONNX vectors and retrieval with torch")
+    parity_parser.add_argument("--k", type=int, default=5)
+    parity_parser.add_argument("--min-cosine", type=float, default=PARITY_MIN_COSINE)
+    parity_parser.add_argument("--min-overlap", type=float, default=PARITY_MIN_OVERLAP)
+
+    for name, help_text in (("bench", "latency / throughput / memory of every backend"),
+                            ("measure", "one backend in this process (used by bench)")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--queries", type=int, default=200)
+        p.add_argument("--batch", type=int, default=16)
+        p.add_argument("--batches", type=int, default=20)
+        if name == "bench":
+            p.add_argument("--threads", default="0", help="comma-separated intra-op thread counts (0 = default)")
+        else:
+            p.add_argument("--backend", choices=BACKENDS, required=True)
+            p.add_argument("--threads", type=int, default=0)
+
+    args = parser.parse_args()
+    {"parity": parity, "bench": bench, "measure": measure}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Offline retrieval / answer benchmark for the RAG path.
+
+The OpenAI client is replaced by a deterministic local stub, so a run needs
+no network (the embedding model must already be in the Hugging Face cache).
+
+    # 1. Build a question set from the usage logs (SQLite store, or an exported CSV)
+    python benchmarks/rag_benchmark.py seed --limit 100
+    python benchmarks/rag_benchmark.py seed --csv data/usage_logs.csv
+
+    #    Then review benchmarks/questions.jsonl: each line is
+    #    {"question": ..., "expected_sources": [urls], "verified": false}
+    #    Seeding pre-fills expected_sources from the current retrieval;
+    #    correct them and set "verified": true.
+
+    # 2. Run, and compare with (or store) a baseline
+    python benchmarks/rag_benchmark.py run --concurrency 8
+    python benchmarks/rag_benchmark.py run --baseline benchmarks/baseline.json
+    python benchmarks/rag_benchmark.py run --save-baseline
+
+Reports (JSON) contain recall@k and MRR of the expected sources, end-to-end
+and per-stage latency percentiles, throughput at the given concurrency and
+peak RSS. With --baseline the run exits non-zero on a quality drop or a
+latency regression beyond the tolerances.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import resource
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# No network: load the embedding model from the local cache only
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend import rag
+from backend.cache import get_answer_cache, get_embedding_cache, get_retrieval_cache
+from backend.metrics import get_metrics
+
+
+#CONFIGURATION
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+QUESTIONS_FILE = os.path.join(BENCH_DIR, "questions.jsonl")
+REPORTS_DIR = os.path.join(BENCH_DIR, "reports")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+RECALL_AT = (1, 3, 5, 10)
+# Regression tolerances used with --baseline
+MAX_QUALITY_DROP = 0.01
+MAX_LATENCY_INCREASE = 0.20
+# Latency changes smaller than this are noise (warm runs are sub-millisecond)
+MIN_LATENCY_DELTA_MS = 2.0
+
+
+class StubMessage:
+    def __init__(self, content: str, usage=None):
+        self.content = content
+        self.usage_metadata = usage
+
+
+class StubLLM:
+    """Deterministic stand-in for ChatOpenAI: the answer depends only on the prompt."""
+
+    def _answer(self, prompt: str) -> str:
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]
+        return f"Stub answer {digest}."
+
+    def _usage(self, prompt: str) -> dict:
+        return {"input_tokens": len(prompt) // 4, "output_tokens": 5}
+
+    def invoke(self, prompt):
+        return StubMessage(self._answer(prompt), self._usage(prompt))
+
+    async def ainvoke(self, prompt):
+        return self.invoke(prompt)
+
+    def stream(self, prompt):
+        for word in self._answer(prompt).split(" "):
+            yield StubMessage(word + " ")
+        yield StubMessage("", self._usage(prompt))
+
+    async def astream(self, prompt):
+        for chunk in self.stream(prompt):
+            yield chunk
+
+
+# QUESTION SET
+def load_questions(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def logged_questions(csv_path: str = None, limit: int = 100) -> list:
+    """Most frequent distinct questions from the usage store, or from an exported/legacy CSV."""
+    counts = Counter()
+    if csv_path:
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                question = (row.get("User Query") or row.get("question") or "").strip()
+                if question:
+                    counts[question] += 1
+    else:
+        from admin import usage_store
+
+        for row in usage_store.query(
+            "SELECT question, COUNT(*) AS n FROM usage_logs WHERE question != '' GROUP BY question"
+        ):
+            counts[row["question"].strip()] += row["n"]
+    return [q for q, _ in counts.most_common(limit)]
+
+
+def seed(args):
+    questions = logged_questions(args.csv, args.limit)
+    if not questions:
+        sys.exit("No logged questions found to seed from.")
+    existing = {}
+    if os.path.exists(args.questions):
+        existing = {item["question"]: item for item in load_questions(args.questions)}
+
+    with open(args.questions, "w", encoding="utf-8") as f:
+        for question in questions:
+            item = existing.get(question)
+            if item is None:
+                sources = ranked_sources(question, k=2)
+                item = {"question": question, "expected_sources": sources, "verified": False}
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+    print(f"📝 Wrote {len(questions)} questions to {args.questions} "
+          f"({sum(q not in existing for q in questions)} new, review expected_sources)")
+
+
+# MEASUREMENTS
+def ranked_sources(question: str, k: int) -> list:
+    """Distinct sources in retrieval order, searched the way _prepare does."""
+    retriever = rag.get_retriever()
+    shard, _ = rag.search_shard(retriever, *rag.detect_release(question))
+    docs = rag.search_index(retriever, question, rag.embed_question(question), k * 3, shard)
+    sources = []
+    for doc, _ in docs:
+        source = doc.metadata.get("source")
+        if source and source not in sources:
+            sources.append(source)
+    return sources[:k]
+
+
+def retrieval_quality(items: list) -> dict:
+    labeled = [item for item in items if item.get("expected_sources")]
+    if not labeled:
+        return {"questions": 0}
+    recalls = {k: [] for k in RECALL_AT}
+    reciprocal_ranks = []
+    for item in labeled:
+        expected = set(item["expected_sources"])
+        ranked = ranked_sources(item["question"], max(RECALL_AT))
+        for k in RECALL_AT:
+            recalls[k].append(len(expected & set(ranked[:k])) / len(expected))
+        rank = next((i for i, source in enumerate(ranked, 1) if source in expected), None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+
+    quality = {f"recall@{k}": round(float(np.mean(v)), 4) for k, v in recalls.items()}
+    quality["mrr"] = round(float(np.mean(reciprocal_ranks)), 4)
+    quality["questions"] = len(labeled)
+    quality["verified"] = sum(1 for item in labeled if item.get("verified"))
+    return quality
+
+
+def clear_caches():
+    get_answer_cache().clear()
+    get_embedding_cache().clear()
+    get_retrieval_cache().clear()
+
+
+def answer_latency(questions: list, repeat: int) -> dict:
+    latencies = []
+    for _ in range(repeat):
+        for question in questions:
+            started = time.perf_counter()
+            rag.get_rag_answer(question)
+            latencies.append(time.perf_counter() - started)
+    ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "mean_ms": round(float(ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+    }
+
+
+def throughput(questions: list, concurrency: int, repeat: int) -> dict:
+    work = questions * repeat
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(rag.get_rag_answer, work))
+    elapsed = time.perf_counter() - started
+    return {"concurrency": concurrency, "requests": len(work), "qps": round(len(work) / elapsed, 2)}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+
+
+# BASELINE COMPARISON
+def compare(report: dict, baseline: dict) -> list:
+    """Human-readable regressions of `report` against `baseline` (empty if none)."""
+    regressions = []
+    for metric, value in baseline.get("quality", {}).items():
+        if metric.startswith("recall@") or metric == "mrr":
+            new = report["quality"].get(metric, 0.0)
+            if new < value - MAX_QUALITY_DROP:
+                regressions.append(f"{metric}: {value:.4f} → {new:.4f}")
+    for section in ("cold", "warm"):
+        old = baseline.get("latency", {}).get(section, {}).get("p95_ms")
+        new = report["latency"][section]["p95_ms"]
+        if old and new > old * (1 + MAX_LATENCY_INCREASE) and new - old > MIN_LATENCY_DELTA_MS:
+            regressions.append(f"{section} p95 latency: {old:.1f}ms → {new:.1f}ms")
+    old_qps = baseline.get("throughput", {}).get("qps")
+    if old_qps and report["throughput"]["qps"] < old_qps * (1 - MAX_LATENCY_INCREASE):
+        regressions.append(f"throughput: {old_qps:.1f} → {report['throughput']['qps']:.1f} QPS")
+    return regressions
+
+
+def run(args):
+    items = load_questions(args.questions)
+    questions = [item["question"] for item in items]
+    print(f"🧪 Benchmarking {len(questions)} questions (stub LLM, no network)")
+
+    rag.get_llm = lambda: StubLLM()
+    started = time.perf_counter()
+    rag.get_embeddings()
+    rag.get_retriever()
+    load_seconds = time.perf_counter() - started
+
+    clear_caches()
+    quality = retrieval_quality(items)
+
+    # Cold: every cache empty; warm: same questions again with caches filled
+    clear_caches()
+    get_metrics().reset()
+    cold = answer_latency(questions, 1)
+    stages = get_metrics().summary()["stages"]
+    warm = answer_latency(questions, args.repeat)
+
+    clear_caches()
+    tput = throughput(questions, args.concurrency, args.repeat)
+
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "index_version": rag.get_index_version(),
+        "questions": len(questions),
+        "startup_seconds": round(load_seconds, 3),
+        "quality": quality,
+        "latency": {"cold": cold, "warm": warm},
+        "stages": stages,
+        "throughput": tput,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    path = args.output or os.path.join(REPORTS_DIR, time.strftime("report-%Y%m%d-%H%M%S.json"))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps({k: report[k] for k in ("quality", "latency", "throughput", "peak_rss_mb")}, indent=2))
+    print(f"📄 Report: {path}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Saved as baseline: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f))
+        if regressions:
+            print("❌ Regressions vs. baseline:")
+            for line in regressions:
+                print(f"   - {line}")
+            sys.exit(1)
+        print("✅ No regressions vs. baseline")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", default=QUESTIONS_FILE)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = sub.add_parser("seed", help="build the question set from usage logs")
+    seed_parser.add_argument("--csv", help="read questions from a usage CSV instead of the SQLite store")
+    seed_parser.add_argument("--limit", type=int, default=100)
+
+    run_parser = sub.add_parser("run", help="run the benchmark and write a JSON report")
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument("--repeat", type=int, default=1, help="passes over the question set for warm latency/throughput")
+    run_parser.add_argument("--output", help="report path (default benchmarks/reports/report-<time>.json)")
+    run_parser.add_argument("--baseline", default=BASELINE_FILE)
+    run_parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+
+    args = parser.parse_args()
+    seed(args) if args.command == "seed" else run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import asyncio
+import itertools
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import backend.main as main
+from backend.concurrency import ConcurrencyLimiter, SingleFlight
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # No lifespan: skips warm-up and the background log writer
+    monkeypatch.setattr(main, "_record_usage", lambda *args: "response-id")
+    flight, limiter = SingleFlight(), ConcurrencyLimiter(max_concurrent=4, max_queue=16, queue_timeout=5)
+    monkeypatch.setattr(main, "get_ask_flight", lambda: flight)
+    monkeypatch.setattr(main, "get_rag_limiter", lambda: limiter)
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def full_limiter(monkeypatch):
+    # No slots and no queue: every request is rejected
+    limiter = ConcurrencyLimiter(max_concurrent=0, max_queue=0, queue_timeout=1)
+    monkeypatch.setattr(main, "get_rag_limiter", lambda: limiter)
+    return limiter
+
+
+def test_ask_returns_503_when_overloaded(client, full_limiter, monkeypatch):
+    async def answer(*args):
+        raise AssertionError("must not run without a slot")
+
+    monkeypatch.setattr(main, "aget_rag_answer", answer)
+    res = client.post("/ask", json={"question": "What is HySecure?"})
+    assert res.status_code == 503
+    assert res.headers["Retry-After"] == "1"
+    assert full_limiter.rejected == 1
+
+
+def test_ask_stream_returns_503_when_overloaded(client, full_limiter, monkeypatch):
+    async def stream(*args):
+        raise AssertionError("must not run without a slot")
+        yield
+
+    monkeypatch.setattr(main, "astream_rag_answer", stream)
+    res = client.post("/ask/stream", json={"question": "What is HySecure?"})
+    assert res.status_code == 503
+    assert res.headers["Retry-After"] == "1"
+    assert full_limiter.rejected == 1
+
+
+def test_identical_concurrent_asks_make_one_rag_call(client, monkeypatch):
+    calls = []
+    response_ids = itertools.count()
+    monkeypatch.setattr(main, "_record_usage", lambda *args: f"response-{next(response_ids)}")
+
+    async def answer(question, product, version):
+        calls.append(question)
+        await asyncio.sleep(0.05)
+        return "HySecure is a secure access gateway.", "hysecure", 0.9
+
+    monkeypatch.setattr(main, "aget_rag_answer", answer)
+
+    async def ask_all():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            questions = ["What is HySecure?", "what is hysecure", "What is HySecure ?"] * 3 + ["What is HySecure?"]
+            return await asyncio.gather(*(http.post("/ask", json={"question": q}) for q in questions))
+
+    responses = asyncio.run(ask_all())
+    assert [r.status_code for r in responses] == [200] * 10
+    assert len(calls) == 1
+    assert {r.json()["answer"] for r in responses} == {"HySecure is a secure access gateway."}
+    # Every caller still gets its own usage record
+    assert len({r.json()["response_id"] for r in responses}) == 10
+
+
+def test_metrics_exports_totals_as_counters(client, full_limiter):
+    client.post("/ask", json={"question": "What is HySecure?"})
+    text = client.get("/metrics").text
+    assert "# TYPE accops_rag_rejected_requests_total counter" in text
+    assert "accops_rag_rejected_requests_total 1" in text
+    for name in ("log_dropped_events_total", "log_failed_events_total"):
+        assert f"# TYPE accops_{name} counter" in text
+    assert "# TYPE accops_rag_waiting_requests gauge" in text
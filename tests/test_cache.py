@@ -0,0 +1,19 @@
+import numpy as np
+
+from backend.cache import SemanticAnswerCache
+
+
+def test_answer_built_before_an_index_swap_is_not_cached():
+    cache = SemanticAnswerCache(similarity_threshold=0.9)
+    vector = np.array([1.0, 0.0, 0.0])
+    cache.ensure_version("gen-1")
+
+    # The request prepared against gen-1; gen-2 is swapped in before its LLM call returns
+    cache.ensure_version("gen-2")
+    cache.put_for_version("gen-1", "What is HyWorks?", vector, "hyworks@3.6", {"answer": "stale"})
+    assert cache.get("what is hyworks", "hyworks@3.6") is None
+    assert cache.get_similar(vector, "hyworks@3.6") is None
+
+    cache.put_for_version("gen-2", "What is HyWorks?", vector, "hyworks@3.6", {"answer": "fresh"})
+    assert cache.get("what is hyworks", "hyworks@3.6") == {"answer": "fresh"}
+    assert cache.get_similar(vector, "hyworks@3.6") == {"answer": "fresh"}
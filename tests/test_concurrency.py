@@ -0,0 +1,220 @@
+import asyncio
+
+import pytest
+
+from backend.concurrency import ConcurrencyLimiter, OverloadedError, SingleFlight
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def settle():
+    """Let every started task run until it blocks."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+# CONCURRENCY LIMITER
+
+def test_limiter_rejects_beyond_queue_bound():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrent=2, max_queue=3, queue_timeout=5)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter:
+                await release.wait()
+
+        # 2 running + 3 queued fill the limiter
+        tasks = [asyncio.create_task(hold()) for _ in range(5)]
+        await settle()
+        assert (limiter.active, limiter.waiting) == (2, 3)
+
+        with pytest.raises(OverloadedError):
+            await limiter.acquire()
+        assert limiter.rejected == 1
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert limiter.stats()["active"] == limiter.stats()["waiting"] == 0
+
+    run(scenario())
+
+
+def test_limiter_times_out_waiters():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, queue_timeout=0.05)
+        await limiter.acquire()
+        with pytest.raises(OverloadedError):
+            await limiter.acquire()
+        assert (limiter.active, limiter.waiting, limiter.rejected) == (1, 0, 1)
+
+    run(scenario())
+
+
+def test_limiter_releases_slot_on_exception():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=0, queue_timeout=1)
+        with pytest.raises(ValueError):
+            async with limiter:
+                raise ValueError("boom")
+        assert limiter.active == 0
+        # The slot is free again
+        async with limiter:
+            assert limiter.active == 1
+
+    run(scenario())
+
+
+def test_limiter_releases_slot_on_cancellation():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, queue_timeout=5)
+        started = asyncio.Event()
+
+        async def hold():
+            async with limiter:
+                started.set()
+                await asyncio.sleep(60)
+
+        holder = asyncio.create_task(hold())
+        await started.wait()
+        waiter = asyncio.create_task(limiter.acquire())
+        await settle()
+        assert limiter.waiting == 1
+
+        # Cancel both the queued caller and the slot holder
+        waiter.cancel()
+        holder.cancel()
+        await asyncio.gather(waiter, holder, return_exceptions=True)
+        assert (limiter.active, limiter.waiting) == (0, 0)
+
+        await asyncio.wait_for(limiter.acquire(), timeout=1)
+        assert limiter.active == 1
+
+    run(scenario())
+
+
+def test_limiter_cancelled_callers_never_keep_a_slot():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrent=2, max_queue=3, queue_timeout=5)
+        entered = []
+
+        async def hold(i):
+            async with limiter:
+                entered.append(i)
+                await asyncio.sleep(60)
+
+        # Cancel while the first callers are being granted their slots
+        tasks = [asyncio.create_task(hold(i)) for i in range(5)]
+        await asyncio.sleep(0)
+        for task in tasks:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        assert all(isinstance(r, asyncio.CancelledError) for r in results)
+        assert (limiter.active, limiter.waiting) == (0, 0)
+        for _ in range(2):
+            await asyncio.wait_for(limiter.acquire(), timeout=1)
+
+    run(scenario())
+
+
+# SINGLE FLIGHT
+
+def test_single_flight_runs_once_for_concurrent_callers():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+        release = asyncio.Event()
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "answer"
+
+        tasks = [asyncio.create_task(flight.do("key", work)) for _ in range(10)]
+        await settle()
+        assert flight.stats()["inflight"] == 1
+        release.set()
+        results = await asyncio.gather(*tasks)
+
+        assert calls == 1
+        assert [result for result, _ in results] == ["answer"] * 10
+        assert sorted(shared for _, shared in results) == [False] + [True] * 9
+        assert flight.stats()["inflight"] == 0
+
+    run(scenario())
+
+
+def test_single_flight_propagates_errors_to_every_waiter():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            raise RuntimeError("upstream failed")
+
+        tasks = [asyncio.create_task(flight.do("key", work)) for _ in range(5)]
+        await settle()
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        # The key is released, so a retry starts fresh
+        assert flight.stats()["inflight"] == 0
+
+        async def retry():
+            return "ok"
+
+        assert await flight.do("key", retry) == ("ok", False)
+
+    run(scenario())
+
+
+def test_single_flight_cancelled_leader_does_not_cancel_followers():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "answer"
+
+        leader = asyncio.create_task(flight.do("key", work))
+        await settle()
+        followers = [asyncio.create_task(flight.do("key", work)) for _ in range(3)]
+        await settle()
+
+        leader.cancel()
+        await settle()
+        release.set()
+        results = await asyncio.gather(*followers)
+
+        assert leader.cancelled()
+        assert calls == 1
+        assert results == [("answer", True)] * 3
+        assert flight.stats()["inflight"] == 0
+
+    run(scenario())
+
+
+def test_single_flight_keys_are_independent():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def work(value):
+            await asyncio.sleep(0)
+            return value
+
+        results = await asyncio.gather(
+            flight.do("a", lambda: work("a")), flight.do("b", lambda: work("b")), flight.do("a", lambda: work("a"))
+        )
+        assert results == [("a", False), ("b", False), ("a", True)]
+
+    run(scenario())
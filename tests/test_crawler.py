@@ -0,0 +1,148 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from backend.crawler import Crawler
+
+
+class Site:
+    """Pages served by the fixture server: path -> (status, body, headers)."""
+
+    def __init__(self):
+        self.pages = {}
+        self.requests = []  # (path, request headers)
+
+    def serve(self, path, body, status=200, **headers):
+        self.pages[path] = (status, body.encode("utf-8"), headers)
+
+
+@pytest.fixture
+def site():
+    site = Site()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            site.requests.append((self.path, dict(self.headers)))
+            status, body, headers = site.pages.get(self.path, (404, b"not found", {}))
+            etag = headers.get("ETag")
+            last_modified = headers.get("Last-Modified")
+            if status == 200 and (
+                (etag and self.headers.get("If-None-Match") == etag)
+                or (last_modified and self.headers.get("If-Modified-Since") == last_modified)
+            ):
+                status, body = 304, b""
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    site.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield site
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def new_crawler(tmp_path):
+    """new_crawler(): a crawler as started by a fresh ingest run, sharing one manifest and page cache."""
+
+    def make():
+        # Plain session: no retry backoff on the failure tests
+        return Crawler(
+            manifest_file=str(tmp_path / "manifest.json"),
+            pages_dir=str(tmp_path / "pages"),
+            workers=2,
+            rate_per_host=0,
+            session=requests.Session(),
+        )
+
+    return make
+
+
+class Processor:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, url, html):
+        self.calls.append(url)
+        return {"text": html}
+
+
+def test_conditional_request_returns_cached_result_on_304(site, new_crawler):
+    site.serve("/a", "v1", ETag='"a1"', **{"Last-Modified": "Mon, 05 Oct 2026 10:00:00 GMT"})
+    crawler = new_crawler()
+    assert crawler.fetch(f"{site.url}/a", Processor())["status"] == "new"
+    crawler.save_manifest()
+
+    crawler, process = new_crawler(), Processor()
+    record = crawler.fetch(f"{site.url}/a", process)
+    assert (record["status"], record["result"]) == ("unchanged", {"text": "v1"})
+    assert process.calls == []
+
+    _, headers = site.requests[-1]
+    assert headers["If-None-Match"] == '"a1"'
+    assert headers["If-Modified-Since"] == "Mon, 05 Oct 2026 10:00:00 GMT"
+
+
+def test_unchanged_content_hash_skips_processing(site, new_crawler):
+    # No validators: the server always answers 200 with the full body
+    site.serve("/a", "same")
+    site.serve("/b", "old")
+    crawler = new_crawler()
+    crawler.crawl([f"{site.url}/a", f"{site.url}/b"], Processor())
+    crawler.save_manifest()
+
+    site.serve("/b", "new")
+    crawler, process = new_crawler(), Processor()
+    records = crawler.crawl([f"{site.url}/a", f"{site.url}/b"], process)
+
+    assert [r["status"] for r in records] == ["unchanged", "changed"]
+    assert [r["result"]["text"] for r in records] == ["same", "new"]
+    assert process.calls == [f"{site.url}/b"]
+    assert crawler.stats["unchanged"] == crawler.stats["changed"] == 1
+
+
+def test_failed_refetch_falls_back_to_cached_result(site, new_crawler):
+    site.serve("/a", "good")
+    crawler = new_crawler()
+    crawler.fetch(f"{site.url}/a", Processor())
+    crawler.save_manifest()
+
+    site.serve("/a", "boom", status=500)
+    crawler = new_crawler()
+    record = crawler.fetch(f"{site.url}/a", Processor())
+    assert (record["status"], record["result"]) == ("failed", {"text": "good"})
+    assert record["error"]
+
+    # A page that never succeeded has nothing to fall back to
+    record = crawler.fetch(f"{site.url}/missing", Processor())
+    assert (record["status"], record["result"]) == ("failed", None)
+
+
+def test_prune_forgets_pages_that_disappeared(site, new_crawler, tmp_path):
+    for path in ("/a", "/b", "/c"):
+        site.serve(path, path)
+    crawler = new_crawler()
+    crawler.crawl([f"{site.url}{p}" for p in ("/a", "/b", "/c")], Processor())
+    crawler.fetch(f"{site.url}/a", Processor(), kind="links")
+
+    crawler.prune([f"{site.url}/a", f"{site.url}/c"])
+    crawler.save_manifest()
+    assert len(list((tmp_path / "pages").iterdir())) == 3
+
+    crawler = new_crawler()
+    assert sorted(crawler.previous_urls()) == [f"{site.url}/a", f"{site.url}/c"]
+    # Other kinds are pruned separately
+    assert crawler.previous_urls("links") == [f"{site.url}/a"]
+    assert crawler.resume(f"{site.url}/b") is None
+    assert crawler.resume(f"{site.url}/c")["result"] == {"text": "/c"}
@@ -0,0 +1,103 @@
+import math
+
+import numpy as np
+import pytest
+
+from backend.keyword_index import BM25_B, BM25_K1, KeywordIndex, reciprocal_rank_fusion, tokenize, write_keyword_index
+from backend.mmap_store import MmapVectorStore, write_store
+
+CORPUS = [
+    "Install the HySecure gateway",
+    "HySecure gateway error-1020 when the gateway certificate expires",
+    "Configure HyWorks session hosts",
+    "HyWorks controller uses port 443",
+]
+
+
+def bm25(query, row, texts=CORPUS):
+    """BM25 of `texts[row]`, straight from the formula."""
+    docs = [tokenize(t) for t in texts]
+    avgdl = sum(len(d) for d in docs) / len(docs)
+    score = 0.0
+    for term in set(tokenize(query)):
+        df = sum(term in d for d in docs)
+        tf = docs[row].count(term)
+        if not tf:
+            continue
+        idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+        score += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(docs[row]) / avgdl))
+    return score
+
+
+@pytest.fixture
+def index(tmp_path):
+    write_keyword_index(str(tmp_path), CORPUS)
+    return KeywordIndex(str(tmp_path))
+
+
+def test_tokenize_keeps_compound_tokens_and_their_parts():
+    assert tokenize("Error-1020 on HySecure 7.2, max_sessions") == [
+        "error-1020", "error", "1020", "on", "hysecure", "7.2", "7", "2", "max_sessions", "max", "sessions",
+    ]
+
+
+def test_bm25_scores_match_the_formula(index):
+    for query in ("hysecure gateway", "gateway certificate", "hyworks 443", "error-1020"):
+        rows, scores = index.search(query, k=10)
+        expected = sorted(
+            ((bm25(query, row), row) for row in range(len(CORPUS)) if bm25(query, row) > 0),
+            key=lambda pair: -pair[0],
+        )
+        assert rows == [row for _, row in expected]
+        assert np.allclose(scores, [score for score, _ in expected], rtol=1e-5)
+
+
+def test_bm25_ranking(index):
+    # Length normalisation: one mention in a short page beats two in a long one
+    assert index.search("gateway", k=2)[0] == [0, 1]
+    # A rare term outweighs one shared by several pages
+    assert index.search("hysecure 443", k=3)[0] == [3, 0, 1]
+    assert index.search("unknown words", k=3) == ([], [])
+
+
+def test_bm25_search_within_row_range(index):
+    rows, _ = index.search("hysecure hyworks", k=10, start=1, end=3)
+    assert sorted(rows) == [1, 2]
+
+
+def test_reciprocal_rank_fusion():
+    # Found by both retrievers beats first place in only one
+    assert reciprocal_rank_fusion([[1, 2, 3], [4, 2]], [1.0, 1.0], rrf_k=60)[0] == 2
+    # Weights decide between the two rankings' leaders
+    assert reciprocal_rank_fusion([[1], [4]], [0.7, 0.3])[0] == 1
+    assert reciprocal_rank_fusion([[1], [4]], [0.3, 0.7])[0] == 4
+    # A zero weight drops that ranking entirely
+    assert reciprocal_rank_fusion([[1, 2], [4]], [1.0, 0.0]) == [1, 2]
+
+
+def test_hybrid_search_ranks_keyword_only_match(tmp_path):
+    # The error code page is far from the query vector; only BM25 finds it
+    rng = np.random.default_rng(0)
+    query = np.ones(8, dtype=np.float32)
+    texts = [f"HySecure gateway setup step {i}" for i in range(12)] + ["Fix error-1020 on login"]
+    vectors = [query + rng.normal(scale=0.1, size=8) for _ in range(12)] + [-query]
+    records = [
+        (f"chunk-{i}", text, {"module": "HySecure"}, vector)
+        for i, (text, vector) in enumerate(zip(texts, vectors))
+    ]
+    write_store(str(tmp_path), records)
+    store = MmapVectorStore(str(tmp_path))
+
+    vector_only = [doc.id for doc, _ in store.search(query, 3, "hysecure", "error-1020", keyword_weight=0.0)]
+    assert "chunk-12" not in vector_only
+
+    # Equal weights: the keyword leader ties with the vector leader and
+    # displaces the vector ranking's last result
+    found = store.search(query, 3, "hysecure", "error-1020", keyword_weight=0.5)
+    assert [doc.id for doc, _ in found] == [vector_only[0], "chunk-12", vector_only[1]]
+    # Distances stay the vector distances of the fused results
+    assert found[1][1] == pytest.approx(float(np.sum((2 * query) ** 2)))
+
+    found = store.search(query, 3, "hysecure", "error-1020", keyword_weight=0.6)
+    assert found[0][0].id == "chunk-12"
+    store.close()
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+# Export needs torch + transformers, serving needs onnxruntime + tokenizers,
+# the reference is the sentence-transformers model used everywhere else.
+pytest.importorskip("onnxruntime")
+pytest.importorskip("tokenizers")
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("langchain_huggingface")
+
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from backend.embedding_pipeline import EMBEDDING_MODEL_NAME
+from backend.onnx_embeddings import OnnxEmbeddings, export_model
+
+# int8 weights drift a little; same tolerance as `benchmarks/embedding_backends.py parity`
+INT8_MIN_COSINE = 0.99
+SAMPLE_TEXTS = [
+    "How do I configure HySecure gateway?",
+    "HyWorks 3.4 SP2 session host requirements",
+    "Troubleshoot HySecure client connection error",
+    # Longer than MAX_SEQ_LENGTH tokens: truncation must match too
+    "HyLabs lab templates " * 150,
+]
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    output_dir = str(tmp_path_factory.mktemp("onnx"))
+    try:
+        export_model(EMBEDDING_MODEL_NAME, output_dir)
+    except OSError as e:
+        pytest.skip(f"{EMBEDDING_MODEL_NAME} is not in the local Hugging Face cache: {e}")
+    return output_dir
+
+
+@pytest.fixture(scope="module")
+def reference():
+    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+    return np.array(embeddings.embed_documents(SAMPLE_TEXTS), dtype=np.float32)
+
+
+def cosines(vectors, reference):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return (vectors * reference).sum(axis=1) / (
+        np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1)
+    )
+
+
+def test_fp32_export_matches_sentence_transformers(model_dir, reference):
+    onnx = OnnxEmbeddings(model_dir, precision="fp32")
+    assert onnx.model_name == EMBEDDING_MODEL_NAME
+    assert cosines(onnx.embed_documents(SAMPLE_TEXTS), reference).min() >= 0.999
+    assert cosines([onnx.embed_query(SAMPLE_TEXTS[0])], reference[:1]).min() >= 0.999
+
+
+def test_int8_export_stays_within_parity_tolerance(model_dir, reference):
+    onnx = OnnxEmbeddings(model_dir, precision="int8")
+    assert cosines(onnx.embed_documents(SAMPLE_TEXTS), reference).min() >= INT8_MIN_COSINE
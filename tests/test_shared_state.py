@@ -0,0 +1,205 @@
+import os
+import pickle
+import re
+import time
+
+import numpy as np
+import pytest
+
+import backend.cache as cache
+from backend.cache import SharedAnswerCache, SharedVersionedCache
+from backend.shared_state import RedisStore, SqliteStore
+
+
+class FakeRedis:
+    """In-memory stand-in for the part of the redis-py client RedisStore uses."""
+
+    def __init__(self):
+        self.data = {}  # key -> (bytes, expires at or None)
+
+    def _live(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self.data[key]
+            return None
+        return value
+
+    def get(self, key):
+        return self._live(key)
+
+    def mget(self, keys):
+        return [self._live(key) for key in keys]
+
+    def set(self, key, value, px=None):
+        data = value if isinstance(value, bytes) else str(value).encode()
+        self.data[key] = (data, time.monotonic() + px / 1000 if px else None)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match, count=None):
+        # Redis glob: `*`, `?` and backslash escapes
+        regex = re.compile("".join(
+            ".*" if token == "*" else "." if token == "?" else re.escape(token[-1])
+            for token in re.findall(r"\\.|.", match, re.S)
+        ))
+        return [key.encode() for key in list(self.data) if regex.fullmatch(key) and self._live(key) is not None]
+
+    def incrby(self, key, amount):
+        value = int(self._live(key) or 0) + amount
+        self.data[key] = (str(value).encode(), None)
+        return value
+
+    def pipeline(self, transaction=True):
+        client = self
+
+        class Pipeline:
+            def __init__(self):
+                self.calls = []
+
+            def incrby(self, key, amount):
+                self.calls.append((key, amount))
+
+            def execute(self):
+                return [client.incrby(key, amount) for key, amount in self.calls]
+
+        return Pipeline()
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "shared_state.db")
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def workers(request, path):
+    """workers(n): one store per simulated worker, all sharing one SQLite file or one Redis server."""
+    if request.param == "sqlite":
+        return lambda n=2: [SqliteStore(path) for _ in range(n)]
+    client = FakeRedis()
+    return lambda n=2: [RedisStore(client, prefix="test:") for _ in range(n)]
+
+
+def test_store_file_is_private(path):
+    SqliteStore(path)
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+
+def test_values_round_trip_as_json(path):
+    store = SqliteStore(path)
+    store.set("vector", np.arange(4, dtype=np.float32))
+    store.set("hit", (np.array([3, 1], dtype=np.int64), np.array([0.5, 0.7], dtype=np.float32)))
+    store.set("answer", {"answer": "text", "confidence": np.float32(0.5), "sources": ["https://docs"]})
+
+    assert store.get("vector").dtype == np.float32
+    rows, distances = store.get("hit")
+    assert rows.tolist() == [3, 1] and distances.dtype == np.float32
+    assert store.get("answer") == {"answer": "text", "confidence": 0.5, "sources": ["https://docs"]}
+
+
+def test_pickled_values_are_never_loaded(path):
+    store = SqliteStore(path)
+    store._connection().execute(
+        "INSERT INTO entries (key, value, expires_at) VALUES ('evil', ?, 0)", (pickle.dumps(["payload"]),)
+    )
+    assert store.get("evil") is None
+
+
+def test_worker_reads_value_written_by_another(workers):
+    a, b = (SharedVersionedCache(store, "retrieval") for store in workers())
+    for c in (a, b):
+        c.ensure_version("gen-1")
+    a.put(("question", "hyworks", 5), np.array([1, 2], dtype=np.int64))
+    assert b.get(("question", "hyworks", 5)).tolist() == [1, 2]
+    assert b.get(("other", "hyworks", 5)) is None
+
+
+def test_entries_expire_after_ttl(workers):
+    a, b = (SharedVersionedCache(store, "retrieval", ttl_seconds=0.05) for store in workers())
+    for c in (a, b):
+        c.ensure_version("gen-1")
+    a.put("key", "value")
+    assert b.get("key") == "value"
+    time.sleep(0.1)
+    assert b.get("key") is None
+
+
+def test_new_index_version_invalidates_entries(workers):
+    a, b = (SharedVersionedCache(store, "query-embedding") for store in workers())
+    a.ensure_version("gen-1")
+    a.put("key", "old")
+
+    b.ensure_version("gen-2")
+    assert b.get("key") is None
+    b.put("key", "new")
+    # A worker still on the old index keeps reading its own version
+    assert a.get("key") == "old"
+    a.ensure_version("gen-2")
+    assert a.get("key") == "new"
+    assert a.invalidations == 1
+
+
+def test_answer_cache_is_shared(workers, monkeypatch):
+    monkeypatch.setattr(cache, "ANSWER_CACHE_SYNC_SECONDS", 0)
+    a, b = (SharedAnswerCache(store) for store in workers())
+    for c in (a, b):
+        c.ensure_version("gen-1")
+    vector = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    a.put("What is HyWorks?", vector, "hyworks@3.6", {"answer": "HyWorks is ..."})
+
+    assert b.get("what is hyworks", "hyworks@3.6") == {"answer": "HyWorks is ..."}
+    assert b.get("what is hyworks", "hyworks@3.4") is None
+    assert b.get_similar(np.array([0.99, 0.05, 0.0]), "hyworks@3.6") == {"answer": "HyWorks is ..."}
+    assert b.get_similar(np.array([0.0, 1.0, 0.0]), "hyworks@3.6") is None
+
+
+def test_lookups_do_not_write_counters_until_flushed(workers):
+    store, other = workers()
+    c = SharedVersionedCache(store, "retrieval")
+    c.counters.flush_seconds = 3600
+    c.ensure_version("gen-1")
+    c.put("key", "value")
+    c.get("key")
+    c.get("missing")
+    assert other.counters(["retrieval:hits", "retrieval:misses"]) == [0, 0]
+
+    stats = c.stats()
+    assert (stats["hits"], stats["misses"], stats["fills"]) == (1, 1, 1)
+    assert other.counters(["retrieval:hits", "retrieval:misses"]) == [1, 1]
+
+
+def test_answer_built_before_an_index_swap_is_not_shared(workers, monkeypatch):
+    monkeypatch.setattr(cache, "ANSWER_CACHE_SYNC_SECONDS", 0)
+    a, b = (SharedAnswerCache(store) for store in workers())
+    a.ensure_version("gen-1")
+    a.ensure_version("gen-2")
+    b.ensure_version("gen-2")
+    vector = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    a.put_for_version("gen-1", "What is HyWorks?", vector, "hyworks@3.6", {"answer": "stale"})
+
+    assert b.get("what is hyworks", "hyworks@3.6") is None
+    assert b.get_similar(vector, "hyworks@3.6") is None
+
+
+def test_store_interface(workers):
+    store, other = workers()
+    store.set("answer:gen-1:a", {"answer": "A"})
+    store.set("answer:gen-1:b", np.arange(3, dtype=np.float32))
+    store.set("answer:gen-2:c", "C")
+    store.set("retrieval:gen-1:[x*]", "literal")
+
+    assert other.get("answer:gen-1:a") == {"answer": "A"}
+    assert other.get_many(["answer:gen-1:a", "missing"]) == [{"answer": "A"}, None]
+    assert sorted(other.keys("answer:gen-1:")) == ["answer:gen-1:a", "answer:gen-1:b"]
+    # Glob characters in a prefix match literally
+    assert other.keys("retrieval:gen-1:[x*") == ["retrieval:gen-1:[x*]"]
+
+    other.delete("answer:gen-1:a")
+    assert store.get("answer:gen-1:a") is None
+    store.clear("answer:")
+    assert store.keys("answer:") == [] and store.get("retrieval:gen-1:[x*]") == "literal"
+
+    store.incr("hits")
+    other.incr_many({"hits": 2, "misses": 1})
+    assert store.counters(["hits", "misses", "never"]) == [3, 1, 0]
@@ -0,0 +1,149 @@
+import os
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from backend import vector_index
+from backend.mmap_store import MmapVectorStore, write_store
+from backend.vector_index import (
+    GENERATIONS_DIR,
+    IndexUpdate,
+    chunk_ids,
+    current_generation,
+    current_index_path,
+    load_manifest,
+    publish,
+)
+
+DIM = 8
+# (module, version) of the test chunks; HySecure pages carry no release
+RELEASES = [("HyWorks", "3.4"), ("HyWorks", "3.6"), ("HySecure", ""), ("HyWorks", "3.6")]
+
+
+def make_records(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    records = []
+    for i in range(n):
+        module, version = RELEASES[i % len(RELEASES)]
+        metadata = {"source": f"https://docs/{i % 7}", "module": module, "version": version}
+        records.append((f"chunk-{i}", f"text {i}", metadata, rng.normal(size=DIM).astype(np.float32)))
+    return records
+
+
+def brute_force(records, query, k, product=None):
+    def in_product(metadata):
+        if product is None:
+            return True
+        release = f"{metadata['module']}@{metadata['version']}".lower()
+        return product.lower() in (metadata["module"].lower(), release)
+
+    scored = [
+        (float(np.sum((vector - query) ** 2)), chunk_id)
+        for chunk_id, _, metadata, vector in records
+        if in_product(metadata)
+    ]
+    return sorted(scored)[:k]
+
+
+def docs_for(source, texts, module="HyWorks", version="3.6"):
+    return [Document(page_content=t, metadata={"source": source, "module": module, "version": version}) for t in texts]
+
+
+def vectors_for(source, docs, seed):
+    rng = np.random.default_rng(seed)
+    ids = chunk_ids(source, [d.page_content for d in docs])
+    return {i: rng.normal(size=DIM).astype(np.float32) for i in ids}
+
+
+def test_partitioned_search_matches_brute_force(tmp_path):
+    records = make_records()
+    write_store(str(tmp_path), records, "test-model")
+    store = MmapVectorStore(str(tmp_path))
+
+    assert store.count == len(records)
+    assert set(store.partitions) == {"hyworks", "hyworks@3.4", "hyworks@3.6", "hysecure"}
+    # Every release range lies inside its product's range
+    for release in ("hyworks@3.4", "hyworks@3.6"):
+        first, last = store.partitions[release]
+        assert store.partitions["hyworks"][0] <= first < last <= store.partitions["hyworks"][1]
+
+    queries = np.random.default_rng(1).normal(size=(5, DIM)).astype(np.float32)
+    for product in (None, "HyWorks", "hyworks@3.6", "hysecure", "unknown-product"):
+        for query in queries:
+            expected = brute_force(records, query, 5, None if product == "unknown-product" else product)
+            found = store.search(query, 5, product)
+            assert [doc.id for doc, _ in found] == [chunk_id for _, chunk_id in expected]
+            assert np.allclose([d for _, d in found], [d for d, _ in expected], atol=1e-4)
+
+    # Batched searches over different ranges give the same answers
+    requests = [{"query_vector": q, "k": 3, "product": p} for q, p in zip(queries, ("hyworks", None, "hysecure"))]
+    assert store.search_batch(requests) == [store.search(r["query_vector"], 3, r["product"]) for r in requests]
+    store.close()
+
+
+def test_index_update_publishes_generations_and_prunes_old_ones(tmp_path):
+    root = str(tmp_path / "index")
+    a_docs = docs_for("https://docs/a", ["install", "upgrade"])
+    b_docs = docs_for("https://docs/b", ["gateway"], module="HySecure", version="")
+
+    update = IndexUpdate(root, "test-model")
+    update.add_source("https://docs/a", a_docs, vectors_for("https://docs/a", a_docs, 1))
+    update.add_source("https://docs/b", b_docs, vectors_for("https://docs/b", b_docs, 2))
+    assert update.finish() == {"added": 3, "deleted": 0, "kept": 0, "retagged": 0}
+    first = current_generation(root)
+    assert current_index_path(root) == os.path.join(root, GENERATIONS_DIR, first)
+    live = MmapVectorStore(current_index_path(root))
+    old_vectors = {live.record(row)["id"]: np.array(live.vectors[row]) for row in range(live.count)}
+
+    # Second run: page a gains a chunk, page b is gone
+    a_docs = docs_for("https://docs/a", ["install", "upgrade", "licensing"])
+    update = IndexUpdate(root, "test-model")
+    ids = chunk_ids("https://docs/a", [d.page_content for d in a_docs])
+    assert [update.is_indexed(i) for i in ids] == [True, True, False]
+    update.add_source("https://docs/a", a_docs, {ids[2]: np.ones(DIM, dtype=np.float32)})
+    assert update.finish() == {"added": 1, "deleted": 1, "kept": 2, "retagged": 0}
+
+    second = current_generation(root)
+    assert second != first
+    store = MmapVectorStore(current_index_path(root))
+    assert load_manifest(current_index_path(root)) == {"https://docs/a": ids}
+    assert sorted(store.record(row)["id"] for row in range(store.count)) == sorted(ids)
+    # Unchanged chunks keep their vectors, without re-embedding
+    for row in range(store.count):
+        chunk_id = store.record(row)["id"]
+        if chunk_id in old_vectors:
+            assert np.array_equal(store.vectors[row], old_vectors[chunk_id])
+    # A reader that opened the previous generation before the swap keeps working
+    assert live.search(np.zeros(DIM), 3)[0][0].metadata["source"] in {"https://docs/a", "https://docs/b"}
+    live.close()
+    store.close()
+
+    # Live generation + KEEP_OLD_GENERATIONS old one stay on disk
+    assert vector_index.KEEP_OLD_GENERATIONS == 1
+    assert sorted(os.listdir(os.path.join(root, GENERATIONS_DIR))) == [first, second]
+    third = publish(root, make_records(4), {"https://docs/0": ["chunk-0"]}, "test-model")
+    assert current_generation(root) == third
+    assert sorted(os.listdir(os.path.join(root, GENERATIONS_DIR))) == [second, third]
+
+
+def test_unchanged_crawl_does_not_publish(tmp_path):
+    root = str(tmp_path / "index")
+    docs = docs_for("https://docs/a", ["install"])
+    update = IndexUpdate(root, "test-model")
+    update.add_source("https://docs/a", docs, vectors_for("https://docs/a", docs, 1))
+    update.finish()
+    live = current_generation(root)
+
+    update = IndexUpdate(root, "test-model")
+    update.add_source("https://docs/a", docs, {})
+    assert update.finish()["kept"] == 1
+    assert current_generation(root) == live
+    assert os.listdir(os.path.join(root, GENERATIONS_DIR)) == [live]
+
+
+def test_store_rejects_vectors_of_another_dimension(tmp_path):
+    records = make_records(2)
+    records.append(("bad", "text", {"module": "HyWorks"}, np.zeros(DIM + 1)))
+    with pytest.raises(ValueError):
+        write_store(str(tmp_path), records)